@@ -0,0 +1,73 @@
+"""
+bench_logging.py
+Per-call overhead of @log_to_file: the previous decorator (three f-string INFO records
+per call, written inline) vs. the current one with call tracing disabled, sampled, and
+fully traced with argument capture. Records go to a temp file through the real LogKCld
+handlers, so the async (queue) path is what gets measured.
+
+  python -m logpkg.bench_logging [iterations]
+"""
+
+import sys
+import time
+import logging
+import tempfile
+import functools
+
+from logpkg.log_kcld import _LogKCld, log_to_file
+
+
+def _legacy_log_to_file(log: logging.Logger):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                log.info(f"Calling Class & function : {func.__qualname__}")
+                log.info(f"Arguments: {args}, {kwargs}")
+                result = func(*args, **kwargs)
+                log.info(f"Function returned: {func.__name__} {result}")
+                return result
+            except Exception as e:
+                log.error(f"Error in function {func.__name__}: {e}")
+                raise
+        return wrapper
+    return decorator
+
+
+def _payload(pod: dict, n: int) -> int:
+    return n + len(pod)
+
+
+def _time(fn, n: int) -> float:
+    t0 = time.perf_counter()
+    for i in range(n):
+        fn({"name": "bench-pod", "labels": {"app": "x", "tier": "web"}}, i)
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+def main(n: int = 50000) -> None:
+    with tempfile.NamedTemporaryFile(suffix=".log") as f:
+        kc = _LogKCld(name="dibba-bench", log_file=f.name, level=logging.INFO)
+        kc.console_handler.setLevel(logging.CRITICAL)  # keep the terminal quiet; the file still gets everything
+        log = kc.logger
+
+        cases = [
+            ("undecorated", _payload),
+            ("legacy (INFO, inline format)", _legacy_log_to_file(log)(_payload)),
+            ("call level disabled", log_to_file(log, level=logging.DEBUG)(_payload)),
+            ("traced, 1% sampled", log_to_file(log, sample=0.01, level=logging.INFO)(_payload)),
+            ("traced, every call", log_to_file(log, sample=1.0, level=logging.INFO)(_payload)),
+            ("traced + args captured", log_to_file(log, sample=1.0, capture=True, level=logging.INFO)(_payload)),
+        ]
+        base = None
+        print(f"iterations: {n}")
+        for label, fn in cases:
+            _time(fn, min(n, 1000))  # warm up
+            us = _time(fn, n)
+            base = us if base is None else base
+            print(f"{label:30s} {us:8.2f} us/call  (+{us - base:.2f})")
+        kc._stop_queue()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
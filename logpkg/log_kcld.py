@@ -1,11 +1,52 @@
 import logging
+import logging.handlers
 import functools
+import inspect
+import queue
+import random
+import reprlib
+import atexit
 from utils.ReadConfig import ReadConfig as rc
 from utils.singleton import Singleton
 import os
 #print(os.getcwd())
 #PATH=os.getcwd()
 
+# Call tracing done by @log_to_file (errors are always logged at ERROR):
+#   LOG_ASYNC          1 = handlers run on a background QueueListener thread (default), 0 = inline
+#   LOG_CALL_LEVEL     level of the "calling/returned" records (default: DEBUG, so INFO loggers skip them)
+#   LOG_CALL_SAMPLE    fraction of calls traced, 0.0-1.0 (default: 1.0); per function: log_to_file(logger, sample=...)
+#   LOG_CAPTURE_ARGS   1 = include arguments and return values (default: 0); per function: capture=True
+#   LOG_ARG_MAXLEN     max characters of each captured repr (default: 200)
+LOG_ASYNC = os.environ.get("LOG_ASYNC", "1") != "0"
+LOG_CALL_LEVEL = logging.getLevelName(os.environ.get("LOG_CALL_LEVEL", "DEBUG").upper())
+LOG_CALL_SAMPLE = float(os.environ.get("LOG_CALL_SAMPLE", "1.0"))
+LOG_CAPTURE_ARGS = os.environ.get("LOG_CAPTURE_ARGS", "0") == "1"
+LOG_ARG_MAXLEN = int(os.environ.get("LOG_ARG_MAXLEN", "200"))
+
+_repr = reprlib.Repr()
+_repr.maxstring = _repr.maxother = LOG_ARG_MAXLEN
+_repr.maxlist = _repr.maxdict = _repr.maxtuple = _repr.maxset = 10
+
+
+class _LazyRepr:
+    """
+    Defers repr() of arguments/results until the record's message is built, so calls the
+    level/sample gate drops never pay for it. A traced call still does: with LOG_ASYNC the
+    QueueHandler builds the message in prepare() on the calling thread, which is wanted,
+    since the arguments may be mutated once the call returns.
+    """
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        try:
+            return _repr.repr(self.value)
+        except Exception as e:
+            return f"<unrepresentable {type(self.value).__name__}: {e}>"
+
 
 class _LogKCld(object):
     read_config = rc()
@@ -25,6 +66,8 @@ class _LogKCld(object):
         :param level: The logging level. Defaults to None.
         :type level: int
 
+        With LOG_ASYNC (default) callers only enqueue records; console and file writes
+        happen on a QueueListener thread, restarted in forked children (Celery prefork).
         """
         self.logger = logging.getLogger(name)
         self.logger.setLevel(level)
@@ -34,15 +77,50 @@ class _LogKCld(object):
         # Console handler
         self.console_handler = logging.StreamHandler()
         self.console_handler.setFormatter(self.formatter)
-        self.logger.addHandler(self.console_handler)
+        self.handlers = [self.console_handler]
 
         # File handler (optional)
         if log_file:
             self.file_handler = logging.FileHandler(log_file)
             self.file_handler.setFormatter(self.formatter)
-            self.logger.addHandler(self.file_handler)
+            self.handlers.append(self.file_handler)
+
+        self.listener = None
+        self.queue_handler = None
+        if LOG_ASYNC:
+            self._start_queue()
+            atexit.register(self._stop_queue)
+            if hasattr(os, "register_at_fork"):
+                # the listener thread doesn't survive fork(); give the child its own
+                os.register_at_fork(after_in_child=self._start_queue)
+        else:
+            for h in self.handlers:
+                self.logger.addHandler(h)
         print("initializing Logger once")
 
+    def _start_queue(self) -> None:
+        if self.queue_handler is not None:
+            self.logger.removeHandler(self.queue_handler)
+        q = queue.SimpleQueue()
+        self.queue_handler = logging.handlers.QueueHandler(q)
+        self.logger.addHandler(self.queue_handler)
+        self.listener = logging.handlers.QueueListener(q, *self.handlers, respect_handler_level=True)
+        self.listener.start()
+
+    def _stop_queue(self) -> None:
+        if self.listener is not None:
+            try:
+                self.listener.stop()  # drains what is queued
+            except Exception:
+                pass
+            self.listener = None
+
+    def isEnabledFor(self, level) -> bool:
+        return self.logger.isEnabledFor(level)
+
+    def log(self, level, msg, *args, extra=None):
+        self.logger.log(level, msg, *args, extra=extra)
+
     def info(self, msg, extra=None):
         self.logger.info(msg, extra=extra)
 
@@ -53,28 +131,75 @@ class _LogKCld(object):
         self.logger.debug(msg, extra=extra)
 
     def warn(self, msg, extra=None):
-        self.logger.warn(msg, extra=extra)
-
+        self.logger.warning(msg, extra=extra)
+
+    def warning(self, msg, *args, extra=None):
+        self.logger.warning(msg, *args, extra=extra)
+
+
+def log_to_file(logger, sample=None, capture=None, level=None):
+    """
+    Trace calls of the decorated function: "Calling"/"Function returned" records at
+    LOG_CALL_LEVEL for a `sample` fraction of calls, with args/result only if `capture`.
+    Exceptions are always logged at ERROR. When the call level is disabled (or the call
+    isn't sampled) the wrapper is one level check plus the call itself; nothing is
+    formatted. Traced calls format their message, including captured reprs, on the
+    calling thread, also with LOG_ASYNC (only the I/O moves to the listener thread).
+    """
+    rate = LOG_CALL_SAMPLE if sample is None else sample
+    with_args = LOG_CAPTURE_ARGS if capture is None else capture
+    call_level = LOG_CALL_LEVEL if level is None else level
+    log = getattr(logger, "logger", logger)  # LogKCld wraps a logging.Logger
 
-def log_to_file(logger):
     def decorator(func):
+        name = func.__qualname__
+
+        def _traced() -> bool:
+            return log.isEnabledFor(call_level) and (rate >= 1.0 or random.random() < rate)
+
+        def _enter(args, kwargs):
+            if with_args:
+                log.log(call_level, "Calling %s args=%s kwargs=%s", name, _LazyRepr(args), _LazyRepr(kwargs))
+            else:
+                log.log(call_level, "Calling %s", name)
+
+        def _exit(result):
+            if with_args:
+                log.log(call_level, "Function returned: %s %s", name, _LazyRepr(result))
+            else:
+                log.log(call_level, "Function returned: %s", name)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                traced = _traced()
+                try:
+                    if traced:
+                        _enter(args, kwargs)
+                    # Await the original coroutine so the result/exception is the real one
+                    result = await func(*args, **kwargs)
+                    if traced:
+                        _exit(result)
+                    return result
+                except Exception as e:
+                    log.error("Error in function %s: %s", name, e)
+                    raise
+
+            return async_wrapper
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
+            traced = _traced()
             try:
-                # Log function call details
-                logger.info(f"Calling Class & function: {func.__name__}")
-                logger.info(f"Arguments: {args}, {kwargs}")
-
-                # Execute the original function
+                if traced:
+                    _enter(args, kwargs)
                 result = func(*args, **kwargs)
-
-                # Log the return value
-                logger.info(f"Function returned: {func.__name__} {result}")
-
+                if traced:
+                    _exit(result)
                 return result
             except Exception as e:
                 # Log any exceptions that occur during function execution
-                logger.error(f"Error in function {func.__name__}: {str(e)}")
+                log.error("Error in function %s: %s", name, e)
                 raise
 
         return wrapper
@@ -84,4 +209,3 @@ def log_to_file(logger):
 
 class LogKCld(_LogKCld, metaclass=Singleton):
     pass
-
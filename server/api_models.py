@@ -70,8 +70,30 @@ class ContainerSpec(BaseModel):
     resources: ResourceSpec = Field(default_factory=ResourceSpec)
     mounts: Optional[List[Dict[str, str]]] = None  # adjust to your mount model
 
+class PodSpec(BaseModel):
+    name: Optional[str] = None
+    containers: List[ContainerSpec]
+
 class CreatePodsRequest(BaseModel):
     model_config = ConfigDict(extra="allow")  # allow extra fields
     host_name: str
     namespace: str = "k8s.io"
-    containers: List[ContainerSpec]
+    containers: List[ContainerSpec] = Field(default_factory=list)
+    # batch: `replicas` copies of `containers`, or an explicit list of pods
+    replicas: int = Field(default=1, ge=1)
+    pods: Optional[List[PodSpec]] = None
+    max_concurrency: Optional[int] = Field(default=None, ge=1)
+
+class NodeInventoryRequest(BaseModel):
+    host_name: str
+    namespace: str = "k8s.io"
+    pod_name: Optional[str] = None
+
+class DeletePodsRequest(BaseModel):
+    host_name: str
+    namespace: str = "k8s.io"
+    pods: List[str] = Field(default_factory=list)
+    labels: Dict[str, str] = Field(default_factory=dict)
+    drain: bool = False           # delete every dibba pod/container in the namespace
+    include_unlabelled: bool = False  # drain also deletes containers dibba didn't create
+    grace_seconds: Optional[float] = Field(default=None, ge=0)
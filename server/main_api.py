@@ -1,13 +1,15 @@
 from fastapi import FastAPI, HTTPException, Depends
+from fastapi.responses import PlainTextResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import BaseModel, Extra,ConfigDict
-from server.api_models import CreatePodsRequest
+from server.api_models import CreatePodsRequest, NodeInventoryRequest, DeletePodsRequest
 from utils.celery.tasks.worker_node_tasks import *
 from utils.celery.tasks.containerd_tasks import *
 from utils.celery.tasks.aws_tasks import get_ec2_instances, create_worker_nodes, terminate_worker_node
 from utils.extensions.utilities_extention import UtilitiesExtension
 from kombu import Exchange
 from utils.redis.redis_interface import RedisInterface
+from utils.containerd.phase_metrics import render_prometheus
 import logging
 import jwt
 from datetime import datetime, timedelta,UTC
@@ -165,6 +167,26 @@ async def create_pods(request: CreatePodsRequest,user: str = Depends(get_current
     #containers_payload  =  containers_payload.to_dict()
     namespace = request.namespace
 
+    if not containers_payload and not request.pods:
+        raise HTTPException(status_code=422, detail="containers or pods is required")
+
+    if request.replicas > 1 or request.pods:
+        try:
+            task = create_pods_batch_task.apply_async(
+                args=(containers_payload, namespace),
+                kwargs={
+                    "replicas": request.replicas,
+                    "pod_specs": [p.model_dump() for p in request.pods] if request.pods else None,
+                    "max_concurrency": request.max_concurrency,
+                    "host_name": request.host_name,
+                },
+                **host_queue_info
+            )
+            return {"message": "Task submitted successfully", "task_id": task.id}
+        except Exception as e:
+            logger.error(f"Error submitting create_pods_batch task: {e}")
+            raise HTTPException(status_code=500, detail="Failed to submit task") from e
+
     try:
         task = create_pod_task.apply_async(
             args=(containers_payload, namespace),
@@ -348,6 +370,84 @@ async def get_worker_usage_data(request: HostName, user: str = Depends(get_curre
         raise HTTPException(status_code=500, detail="Failed to submit task") from e
 
 
+@log_to_file(logger)
+@app.get("/node-inventory/")
+async def node_inventory(request: NodeInventoryRequest, user: str = Depends(get_current_user)):
+    host_queue_info = {
+        'exchange': Exchange('secure_exchange', type='direct'),
+        'queue': ue.encode_hostname_with_key(request.host_name),
+        'routing_key': ue.encode_hostname_with_key(request.host_name),
+        'delivery_mode': 2
+    }
+    try:
+        task = node_inventory_task.apply_async(
+            args=(request.namespace, request.pod_name),
+            **host_queue_info
+        )
+        return {"message": "Task submitted successfully", "task_id": task.id}
+    except Exception as e:
+        logger.error(f"Error submitting node_inventory task: {e}")
+        raise HTTPException(status_code=500, detail="Failed to submit task") from e
+
+
+@log_to_file(logger)
+@app.post("/delete-pods/")
+async def delete_pods(request: DeletePodsRequest, user: str = Depends(get_current_user)):
+    if not (request.pods or request.labels or request.drain):
+        raise HTTPException(status_code=422, detail="Provide pods, labels or drain=true")
+    host_queue_info = {
+        'exchange': Exchange('secure_exchange', type='direct'),
+        'queue': ue.encode_hostname_with_key(request.host_name),
+        'routing_key': ue.encode_hostname_with_key(request.host_name),
+        'delivery_mode': 2
+    }
+    try:
+        task = delete_pods_task.apply_async(
+            kwargs={
+                "app_namespace": request.namespace,
+                "pod_names": request.pods,
+                "labels": request.labels,
+                "drain": request.drain,
+                "include_unlabelled": request.include_unlabelled,
+                "grace": request.grace_seconds,
+            },
+            **host_queue_info
+        )
+        return {"message": "Task submitted successfully", "task_id": task.id}
+    except Exception as e:
+        logger.error(f"Error submitting delete_pods task: {e}")
+        raise HTTPException(status_code=500, detail="Failed to submit task") from e
+
+
+@app.get("/events/{namespace}")
+def lifecycle_events(namespace: str, after: str = "0", count: int = 100, block_ms: int = 0,
+                     user: str = Depends(get_current_user)):
+    """
+    Pod lifecycle events of a namespace after stream id `after` ("$" = only new ones), waiting
+    up to block_ms (0..5000, below the Redis socket timeout) for some to arrive. Pass the
+    returned last_id as `after` to follow the log.
+    """
+    try:
+        entries = rd.read_lifecycle_events(namespace, after_id=after, count=max(1, min(count, 1000)),
+                                           block_ms=max(0, min(block_ms, 5000)) or None)
+    except Exception as e:
+        logger.error(f"Error reading lifecycle events for {namespace}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to read events") from e
+    return {"namespace": namespace,
+            "events": [{"id": entry_id, **fields} for entry_id, fields in entries],
+            "last_id": entries[-1][0] if entries else after}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Per-node pod lifecycle phase histograms (Prometheus text format), aggregated in Redis by the workers."""
+    try:
+        return render_prometheus(rd.get_phase_histograms())
+    except Exception as e:
+        logger.error(f"Error reading phase metrics: {e}")
+        raise HTTPException(status_code=500, detail="Failed to read metrics") from e
+
+
 if __name__ == "__main__":
     import uvicorn
 
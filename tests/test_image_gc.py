@@ -0,0 +1,57 @@
+"""
+ImageGC.collect: which images an eviction pass deletes.
+
+  python -m unittest discover -s tests
+"""
+
+import contextlib
+import unittest
+from unittest import mock
+
+from utils.containerd.image_gc import ImageGC, ImageEntry
+
+
+def _gc(entries) -> ImageGC:
+    pods = mock.Mock()
+    pods.c.namespace = "k8s.io"
+    pods._snapshotter_name.return_value = "overlayfs"
+    gc = ImageGC(pods, high_pct=85, low_pct=75, min_age=0)
+    gc.disk_usage = mock.Mock(return_value=(90, 100))
+    gc.images = mock.Mock(return_value=entries)
+    gc.snapshot_usage = mock.Mock(return_value=5)
+    return gc
+
+
+class CollectTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch("utils.containerd.image_gc.node_lock",
+                             side_effect=lambda *a, **k: contextlib.nullcontext(True))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_all_shared_chains_keep_the_image(self):
+        # a tag and its sha256:<id> alias: same chains, neither frees anything alone
+        gc = _gc([ImageEntry(name="docker.io/library/nginx:latest", last_used=1.0, chains=["c1", "c2"]),
+                  ImageEntry(name="sha256:4f3c", last_used=2.0, chains=["c1", "c2"])])
+
+        report = gc.collect()
+
+        gc.c.images.Delete.assert_not_called()
+        gc.c.snapshots.Remove.assert_not_called()
+        self.assertEqual(report["evicted"], [])
+        self.assertEqual(report["freed_bytes"], 0)
+
+    def test_unshared_top_chains_are_evicted(self):
+        gc = _gc([ImageEntry(name="docker.io/library/app:1", last_used=1.0, chains=["c1", "c3"]),
+                  ImageEntry(name="docker.io/library/base:1", last_used=9.0, chains=["c1"], referenced=True)])
+
+        report = gc.collect()
+
+        removed = [call.args[0].key for call in gc.c.snapshots.Remove.call_args_list]
+        self.assertEqual(removed, ["c3"])
+        gc.c.images.Delete.assert_called_once()
+        self.assertEqual(report["evicted"], [{"image": "docker.io/library/app:1", "chains": 1, "bytes": 5}])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+"""
+Janitor.scan_containers: which containers a cleanup pass may remove.
+
+  python -m unittest discover -s tests
+"""
+
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from utils.containerd.containerd_interface import PodManager, MANAGED_LABEL
+from utils.containerd.janitor import Janitor
+
+
+def _container(cid: str, labels: dict, age: float = 3600.0):
+    return SimpleNamespace(id=cid, labels=labels, snapshot_key=f"{cid}-rootfs-0123abcd",
+                           snapshotter="overlayfs",
+                           created_at=SimpleNamespace(seconds=int(time.time() - age)))
+
+
+def _janitor() -> Janitor:
+    pods = mock.Mock(spec=PodManager)
+    pods.c = mock.Mock(namespace="k8s.io")
+    return Janitor(pods, interval=0, min_age=600)
+
+
+class ScanContainersTest(unittest.TestCase):
+    def setUp(self):
+        self.janitor = _janitor()
+
+    def test_leaves_cri_containers_alone(self):
+        # kubelet sandboxes/containers carry pod labels (app=...) but no dibba labels
+        containers = [_container("8f3c9d", {"app": "x"}),
+                      _container("1a2b3c", {"app": "x", "io.kubernetes.pod.name": "x-7d9f"})]
+        self.assertEqual(self.janitor.scan_containers(containers, {}), [])
+
+    def test_removes_loose_managed_app(self):
+        loose = _container("web-1-app", {"pod": "web-1", "app": "app", MANAGED_LABEL: "true"})
+        targets = self.janitor.scan_containers([loose], {})
+        self.assertEqual(targets, [(None, [{"cid": "web-1-app", "snapshot_key": loose.snapshot_key,
+                                            "snapshotter": "overlayfs"}])])
+
+    def test_managed_app_of_live_pod_is_kept(self):
+        pause = _container("web-1", {"pod": "web-1", "role": "pause", MANAGED_LABEL: "true"})
+        app = _container("web-1-app", {"pod": "web-1", "app": "app", MANAGED_LABEL: "true"})
+        tasks = {"web-1": {"pid": 42, "status": "running"}}
+        self.assertEqual(self.janitor.scan_containers([pause, app], tasks), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+"""
+PodManager.create_pod_dag cleanup after a failed stage.
+
+  python -m unittest discover -s tests
+"""
+
+import contextlib
+import unittest
+from unittest import mock
+
+from utils.containerd.containerd_interface import PodManager
+from utils.containerd.schemas import ContainerSpec, ResourceSpec
+
+
+def _pod_manager() -> PodManager:
+    pods = PodManager.__new__(PodManager)  # no containerd connection needed
+    pods.snaps = mock.Mock()
+    pods.snaps.lease.return_value = contextlib.nullcontext("lease-1")
+    pods._prepare_rootfs = mock.Mock(side_effect=lambda image, key, *a: ([], key, {}))
+    pods._start_app = mock.Mock(side_effect=RuntimeError("task start failed"))
+    pods.delete_pods = mock.Mock()
+    return pods
+
+
+def _claimed_pod() -> dict:
+    # shape of WarmPool.claim()
+    return {"name": "web-1",
+            "pause": {"cid": "warm-0123456789ab", "pid": 4242},
+            "ns": {k: f"/proc/4242/ns/{k}" for k in ["pid", "net", "ipc", "uts"]},
+            "cni": {"network": "calico", "ifname": "eth0", "attached": True},
+            "snapshot_key": "warm-0123456789ab-pause-rootfs",
+            "warm": True}
+
+
+class CreatePodDagCleanupTest(unittest.TestCase):
+    specs = [ContainerSpec(name="app", image="nginx:latest",
+                           resources=ResourceSpec(cpu_millicores=100, memory="64Mi"))]
+
+    @mock.patch("utils.containerd.containerd_interface.emit")
+    def test_app_failure_after_claim_tears_down_sandbox(self, _emit):
+        pods = _pod_manager()
+        pod = _claimed_pod()
+
+        with self.assertRaises(RuntimeError):
+            pods.create_pod_dag(name="web-1", specs=self.specs, pod=pod)
+
+        pods.delete_pods.assert_called_once()
+        (targets,), _ = pods.delete_pods.call_args
+        self.assertEqual(targets, [(pod, [{"snapshot_key": "web-1-app-rootfs"}])])
+
+    @mock.patch("utils.containerd.containerd_interface.emit")
+    def test_app_failure_keeps_caller_owned_pod(self, _emit):
+        pods = _pod_manager()
+        pod = dict(_claimed_pod(), warm=False)
+
+        with self.assertRaises(RuntimeError):
+            pods.create_pod_dag(name="web-1", specs=self.specs, pod=pod)
+
+        (targets,), _ = pods.delete_pods.call_args
+        self.assertEqual(targets, [(None, [{"snapshot_key": "web-1-app-rootfs"}])])
+
+
+if __name__ == "__main__":
+    unittest.main()
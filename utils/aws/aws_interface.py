@@ -5,7 +5,15 @@ import json
 from utils.redis.redis_interface import RedisInterface
 
 logger = LogKCld()
-rd=RedisInterface()
+_rd = None
+
+
+def _redis() -> RedisInterface:
+    # created on first use, not at import
+    global _rd
+    if _rd is None:
+        _rd = RedisInterface()
+    return _rd
 
 
 class AwsInterface:
@@ -65,7 +73,7 @@ class AwsInterface:
         }
         # Save instances to Redis
         for k, v in instances.items():
-            rd.save_node(k, v)
+            _redis().save_node(k, v)
 
         # instance_id = response['Instances'][0]['InstanceId']
         # print(f"EC2 instance created with ID: {instance_id}")
@@ -119,7 +127,7 @@ class AwsInterface:
             for instance in response['TerminatingInstances']:
                 print(f"Instance {instance['InstanceId']} is in {instance['CurrentState']['Name']} state.")
             if response:
-                rd.delete_instance_ids(instance_ids)
+                _redis().delete_instance_ids(instance_ids)
             return response
         except Exception as e:
             print(f"An error occurred: {e}")
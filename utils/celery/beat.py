@@ -33,20 +33,7 @@ health_check_queue_name = encode_util.encode_hostname_with_key('health_check')
 secure_exchange = Exchange('secure_exchange', type='direct')
 celery_app.conf.update(
     beat_schedule={
-        'run-health-check-every-5-seconds': {
-            'task': 'utils.celery.tasks.health_check_tasks.health_check_task',
-            'schedule': 5.0,
-            'args': ['cluster_1'],
-            'options': {
-                'queue': health_check_queue_name,
-                'exchange': secure_exchange,
-                'routing_key': health_check_queue_name,
-                'delivery_mode': 2,
-                # ensure we don't accumulate a huge backlog of these if the workers are down
-                'expires': 5
-            }
-
-        },
+        # URL health checks run continuously in the health_check worker (utils.redis.hc_engine)
 
     'refresh-health-check-args-every-30-seconds': {
         'task': 'utils.celery.tasks.refresh_health_check_arguments',
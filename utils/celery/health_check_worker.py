@@ -1,5 +1,6 @@
 from utils.celery.celery_config import celery_app
 from kombu import Queue,Exchange
+from celery.signals import worker_process_init
 from socket import gethostname
 from utils.ReadConfig import ReadConfig as rc
 from utils.extensions.utilities_extention import UtilitiesExtension
@@ -21,3 +22,14 @@ celery_app.conf.task_queues = [
 
 
 celery_app.autodiscover_tasks(['utils.celery.tasks.health_check_tasks'])
+
+
+@worker_process_init.connect
+def _init_health_check_engine(**kwargs):
+    # every process starts one; a node lock and a Redis lease keep it to one active checker cluster-wide
+    from utils.redis.hc_engine import get_health_check_engine
+
+    try:
+        get_health_check_engine().start()
+    except Exception as e:
+        print(f"[hc] engine init skipped: {e}")
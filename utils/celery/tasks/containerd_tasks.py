@@ -1,13 +1,18 @@
 from utils.celery.celery_config import celery_app
-from utils.containerd.containerd_interface import ContainerdClient, PodManager
+from utils.containerd.containerd_interface import ContainerdClient, PodManager, POD_DAG_WORKERS
 from typing import Optional, Dict, List, Any,Tuple
 from logpkg.log_kcld import LogKCld, log_to_file
 from utils.ReadConfig import ReadConfig as rc
 import uuid
+import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 #from utils.containerd.models import ResourceSpec
 
 from utils.containerd.schemas import ContainerSpec, ResourceSpec
 from utils.containerd.adapters import linux_resources_from_spec
+from utils.containerd.phase_metrics import phase_trace, flush_phase_metrics
 from utils.extensions.utilities_extention import UtilitiesExtension
 from utils.singleton import Singleton
 import os
@@ -21,6 +26,9 @@ CNI_BIN_DIR = os.environ.get("CNI_PATH", "/opt/cni/bin")
 CNI_CONF_DIR = os.environ.get("CNI_CONF_DIR", "/etc/cni/net.d")
 DEFAULT_CNI_NET_NAME = os.environ.get("CNI_NET_NAME", "calico")
 DEFAULT_IFNAME = os.environ.get("CNI_IFNAME", "eth0")
+PAUSE_IMAGE = os.environ.get("PAUSE_IMAGE", "registry.k8s.io/pause:3.9")
+POD_BATCH_CONCURRENCY = int(os.environ.get("POD_BATCH_CONCURRENCY", "8"))
+POD_BATCH_MAX = int(os.environ.get("POD_BATCH_MAX", "256"))
 
 # parser = argparse.ArgumentParser(description='A Python CLI application')
 # parser.add_argument('--configDir', type=str, help='Please specify ConfigDir')
@@ -30,6 +38,38 @@ key_read = read_config.encryption_config
 
 logger = LogKCld()
 
+# (socket, namespace) -> PodManager, reused across tasks in this worker process
+_pod_managers: Dict[Tuple[str, str], PodManager] = {}
+
+
+def _pod_manager(sock: str, ns: str) -> PodManager:
+    """
+    PodManager on the pooled ContainerdClient for (sock, ns). Rebuilt whenever the pool
+    hands out a new client (e.g. after a fork), so it never holds stale channels.
+    """
+    client = ContainerdClient.shared(socket=sock, namespace=ns)
+    pods = _pod_managers.get((sock, ns))
+    if pods is None or pods.c is not client:
+        pods = PodManager(client)
+        _pod_managers[(sock, ns)] = pods
+    return pods
+
+
+# (socket, namespace, cni network, ifname) -> WarmPool
+_warm_pools: Dict[Tuple[str, str, str, str], Any] = {}
+
+
+def _warm_pool(sock: str, ns: str, cni_net: str = DEFAULT_CNI_NET_NAME, cni_dev: str = DEFAULT_IFNAME):
+    from utils.containerd.warm_pool import WarmPool
+
+    pods = _pod_manager(sock, ns)
+    key = (sock, ns, cni_net, cni_dev)
+    pool = _warm_pools.get(key)
+    if pool is None or pool.pods is not pods:
+        pool = WarmPool(pods, cni_network=cni_net, cni_ifname=cni_dev)
+        _warm_pools[key] = pool
+    return pool
+
 
 def _rehydrate_containers(containers_json):
     """
@@ -58,11 +98,31 @@ def _rehydrate_containers(containers_json):
     return specs
 
 
+def _pull_progress_reporter(task, min_interval: float = 1.0):
+    """
+    Build a progress_cb for PodManager that publishes image pull progress as Celery
+    PROGRESS state (visible via GET /task/{task_id}), throttled to one update per interval.
+    """
+    last = {"t": 0.0}
+    # pulls report from helper threads, where task.request (thread-local) is empty
+    task_id = task.request.id
+
+    def _report(progress):
+        now = time.monotonic()
+        if now - last["t"] < min_interval:
+            return
+        last["t"] = now
+        try:
+            task.update_state(task_id=task_id, state="PROGRESS", meta={"phase": "pull", **progress.to_dict()})
+        except Exception as e:
+            print(f"[progress] update_state warning: {e}")
 
+    return _report
 
-@celery_app.task
+
+@celery_app.task(bind=True)
 @log_to_file(logger)
-def create_pod_task(
+def create_pod_task(self,
                     containers,
                     app_namespace: Optional[str] = None,
                     **extra_kwargs):
@@ -82,34 +142,307 @@ def create_pod_task(
     # app_cpuset = app_cpu_limit
 
     try:
-        client = ContainerdClient(socket=sock, namespace=ns)
-        pods = PodManager(client)
+        pods = _pod_manager(sock, ns)
+        progress_cb = _pull_progress_reporter(self)
+        container_specs = _rehydrate_containers(containers)
+        with phase_trace() as trace:
+            res = _create_one_pod(pods, sock, ns, cni_net, cni_dev, container_specs, progress_cb)
+
+        # Return simple, JSON-serializable data for Celery
+        return {
+            "namespace": ns,
+            "socket": sock,
+            "cni": {"network": cni_net, "ifname": cni_dev},
+            **res,
+            "phases": trace.summary(),
+        }
+
+    except Exception as err:
+        # Let decorator log; still return a structured error for callers
+        return {"error": str(err), "namespace": ns, "socket": sock}
+    finally:
+        flush_phase_metrics()
+
+
+def _create_one_pod(pods: PodManager, sock: str, ns: str, cni_net: str, cni_dev: str,
+                    container_specs, progress_cb=None, pod_name: Optional[str] = None,
+                    max_workers: int = POD_DAG_WORKERS) -> Dict:
+    # Claim a warm sandbox if the node keeps a pool, else create the pause sandbox (pod)
+    # App images unpack concurrently with sandbox start + CNI ADD (see PodManager.create_pod_dag)
+    pod_name = pod_name or f"{uuid.uuid4().hex[:16]}"
+    pod = _warm_pool(sock, ns, cni_net, cni_dev).claim(pod_name)
+    return pods.create_pod_dag(
+        name=pod_name,
+        specs=container_specs,
+        pause_image=PAUSE_IMAGE,
+        resources=ResourceSpec(cpu_millicores=100, memory="64Mi"),
+        cni_network=cni_net,
+        cni_ifname=cni_dev,
+        progress_cb=progress_cb,
+        pod=pod,
+        max_workers=max_workers,
+    )
 
-        # Create the pause sandbox (pod)
-        pause_resources = ResourceSpec(cpu_millicores=100, memory="64Mi")
-        pod = pods.create_pod(
+
+def _batch_pod_specs(containers=None, replicas: int = 1, pod_specs=None) -> List[Dict]:
+    """
+    Normalize a batch request to [{"name": optional name, "containers": [ContainerSpec]}]:
+    either explicit pod_specs ([{"name"?, "containers": [...]}, ...]) or `replicas`
+    copies of one container list. Raises ValueError for an empty or oversized batch
+    (more than POD_BATCH_MAX pods).
+    """
+    count = len(pod_specs) if pod_specs else int(replicas)
+    if count < 1:
+        raise ValueError(f"replicas must be at least 1, got {count}")
+    if count > POD_BATCH_MAX:
+        raise ValueError(f"batch of {count} pods exceeds POD_BATCH_MAX={POD_BATCH_MAX}")
+    if pod_specs:
+        return [{"name": p.get("name"), "containers": _rehydrate_containers(p.get("containers") or [])}
+                for p in pod_specs]
+    specs = _rehydrate_containers(containers or [])
+    return [{"name": None, "containers": specs} for _ in range(count)]
+
+
+@celery_app.task(bind=True)
+@log_to_file(logger)
+def create_pods_batch_task(self,
+                           containers=None,
+                           app_namespace: Optional[str] = None,
+                           replicas: int = 1,
+                           pod_specs: Optional[List[Dict]] = None,
+                           max_concurrency: Optional[int] = None,
+                           **extra_kwargs):
+    """
+    Create many pods in one message. Every distinct image (pause + apps) is resolved and
+    unpacked once up front; replicas then run on a bounded thread pool sharing one
+    PodManager, so each one only pays for sandbox + container create/start.
+    Returns one result per replica (pod/apps or error), in request order; a replica whose
+    app image failed to pull/unpack gets that error without being attempted.
+    """
+    ns = app_namespace or DEFAULT_NAMESPACE
+    sock = DEFAULT_CONTAINERD_SOCKET
+    cni_net = DEFAULT_CNI_NET_NAME
+    cni_dev = DEFAULT_IFNAME
+
+    try:
+        pods = _pod_manager(sock, ns)
+        batch = _batch_pod_specs(containers, replicas, pod_specs)
+        progress_cb = _pull_progress_reporter(self)
+
+        images = {PAUSE_IMAGE} | {c.image for p in batch for c in p["containers"]}
+        unpack_errors: Dict[str, str] = {}
+
+        def _unpack(img: str) -> None:
+            try:
+                pods._ensure_unpacked(img, progress_cb)
+            except Exception as e:
+                unpack_errors[img] = str(e)
+
+        with phase_trace() as unpack_trace, \
+                ThreadPoolExecutor(max_workers=min(len(images), POD_BATCH_CONCURRENCY)) as ex:
+            ctxs = {img: contextvars.copy_context() for img in images}
+            list(ex.map(lambda img: ctxs[img].run(_unpack, img), images))
+        for img, err in unpack_errors.items():
+            print(f"[batch] unpack failed for {img}: {err}")
+
+        results: List[Optional[Dict]] = [None] * len(batch)
+        done = {"n": 0}
+        done_lock = threading.Lock()
+        task_id = self.request.id
+
+        workers = max(1, min(len(batch), max_concurrency or POD_BATCH_CONCURRENCY, POD_BATCH_CONCURRENCY))
+        # replicas share the POD_DAG_WORKERS budget instead of each getting a full stage pool
+        dag_workers = max(2, POD_DAG_WORKERS // workers)
+
+        def _one(i: int) -> None:
+            with phase_trace() as trace:
+                # the pause image is not checked: a claimed warm sandbox doesn't need it
+                failed = [f"{c.image}: {unpack_errors[c.image]}" for c in batch[i]["containers"]
+                          if c.image in unpack_errors]
+                try:
+                    if failed:
+                        raise RuntimeError(f"image unpack failed: {'; '.join(failed)}")
+                    results[i] = _create_one_pod(pods, sock, ns, cni_net, cni_dev, batch[i]["containers"],
+                                                 pod_name=batch[i]["name"], max_workers=dag_workers)
+                except Exception as e:
+                    results[i] = {"error": str(e)}
+            results[i]["phases"] = trace.summary()
+            with done_lock:
+                done["n"] += 1
+                meta = {"phase": "create", "done": done["n"], "total": len(batch)}
+            try:
+                self.update_state(task_id=task_id, state="PROGRESS", meta=meta)
+            except Exception:
+                pass
+
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            list(ex.map(_one, range(len(batch))))
+
+        return {
+            "namespace": ns,
+            "socket": sock,
+            "cni": {"network": cni_net, "ifname": cni_dev},
+            "replicas": results,
+            "failed": sum(1 for r in results if "error" in r),
+            "phases": unpack_trace.summary(),
+        }
+    except Exception as err:
+        return {"error": str(err), "namespace": ns, "socket": sock}
+    finally:
+        flush_phase_metrics()
+
+
+async def _create_pod_async(sock: str, ns: str, containers, cni_net: str, cni_dev: str, progress_cb) -> Dict:
+    from utils.containerd.aio_containerd_interface import get_async_pod_manager
+
+    pods = await get_async_pod_manager(sock, ns)
+    pause_resources = ResourceSpec(cpu_millicores=100, memory="64Mi")
+    # the trace lives in this coroutine's context (the loop thread doesn't see the caller's)
+    with phase_trace() as trace:
+        pod = await pods.create_pod(
             name=f"{uuid.uuid4().hex[:16]}",
-            pause_image="registry.k8s.io/pause:3.9",
+            pause_image=PAUSE_IMAGE,
             resources=pause_resources,
             cni_network=cni_net,
             cni_ifname=cni_dev,
+            progress_cb=progress_cb,
         )
+        apps = await pods.add_containers(pod, _rehydrate_containers(containers), progress_cb=progress_cb)
+    return {"pod": pod, "apps": apps, "phases": trace.summary()}
 
 
-        container_specs = _rehydrate_containers(containers)
-        # Create the application container in the pod
-        apps = pods.add_containers(pod, container_specs)
+@celery_app.task(bind=True)
+@log_to_file(logger)
+def create_pod_async_task(self,
+                          containers,
+                          app_namespace: Optional[str] = None,
+                          **extra_kwargs):
+    """
+    Same contract as create_pod_task, but driven by the grpc.aio PodManager on the
+    worker's shared event loop. Run the worker with `--pool threads` (or gevent) so
+    many of these tasks multiplex over one loop / one containerd connection.
+    """
+    from utils.containerd.aio_containerd_interface import run_async
 
-        # Return simple, JSON-serializable data for Celery
+    ns = app_namespace or DEFAULT_NAMESPACE
+    sock = DEFAULT_CONTAINERD_SOCKET
+    cni_net = DEFAULT_CNI_NET_NAME
+    cni_dev = DEFAULT_IFNAME
+
+    try:
+        res = run_async(_create_pod_async(sock, ns, containers, cni_net, cni_dev,
+                                          _pull_progress_reporter(self)))
         return {
             "namespace": ns,
             "socket": sock,
             "cni": {"network": cni_net, "ifname": cni_dev},
-            "pod": pod,
-            "apps": apps
+            **res,
         }
+    except Exception as err:
+        return {"error": str(err), "namespace": ns, "socket": sock}
+    finally:
+        flush_phase_metrics()
 
+
+@celery_app.task
+@log_to_file(logger)
+def refill_warm_pool_task(app_namespace: Optional[str] = None, **extra_kwargs):
+    """Top up this node's warm sandbox pool for a namespace (no-op when its pool size is 0)."""
+    ns = app_namespace or DEFAULT_NAMESPACE
+    try:
+        return {"namespace": ns, "added": _warm_pool(DEFAULT_CONTAINERD_SOCKET, ns).fill()}
+    except Exception as err:
+        return {"error": str(err), "namespace": ns}
+
+
+@celery_app.task
+@log_to_file(logger)
+def get_container_state_task(container_id: str, app_namespace: Optional[str] = None):
+    """
+    Container state from the node's event tracker (Redis read, no containerd RPCs).
+    Falls back to querying containerd when the tracker has no entry yet.
+    """
+    from socket import gethostname
+    from utils.redis.redis_interface import RedisInterface
+
+    ns = app_namespace or DEFAULT_NAMESPACE
+    try:
+        state = RedisInterface().get_container_state(gethostname(), ns, container_id)
+        if state is not None:
+            return state
+    except Exception as e:
+        print(f"[state] redis read warning: {e}")
+
+    return _pod_manager(DEFAULT_CONTAINERD_SOCKET, ns).runtime.get_container_info(container_id)
+
+
+@celery_app.task
+@log_to_file(logger)
+def node_inventory_task(app_namespace: Optional[str] = None, pod_name: Optional[str] = None, **extra_kwargs):
+    """All pods/apps on this node with pids and statuses (Containers.List + Tasks.List)."""
+    ns = app_namespace or DEFAULT_NAMESPACE
+    sock = DEFAULT_CONTAINERD_SOCKET
+    try:
+        return _pod_manager(sock, ns).inventory(pod_name=pod_name)
+    except Exception as err:
+        return {"error": str(err), "namespace": ns, "socket": sock}
+
+
+@celery_app.task
+@log_to_file(logger)
+def delete_pods_task(app_namespace: Optional[str] = None,
+                     pod_names: Optional[List[str]] = None,
+                     labels: Optional[Dict[str, str]] = None,
+                     drain: bool = False,
+                     grace: Optional[float] = None,
+                     include_unlabelled: bool = False,
+                     **extra_kwargs):
+    """
+    Bulk pod teardown on this node under one shared grace deadline (see teardown.py):
+    by pod name, by label selector, or every dibba container in the namespace
+    (drain=True; include_unlabelled=True drains the other containers too).
+    """
+    from utils.containerd.teardown import TeardownEngine
+
+    ns = app_namespace or DEFAULT_NAMESPACE
+    sock = DEFAULT_CONTAINERD_SOCKET
+    try:
+        engine = TeardownEngine(_pod_manager(sock, ns), grace=grace)
+        if drain:
+            return engine.delete_namespace(include_unlabelled=include_unlabelled)
+        if labels:
+            return engine.delete_by_labels(labels)
+        if pod_names:
+            return engine.delete_pods(pod_names)
+        return {"error": "nothing selected: pass pod_names, labels or drain=True", "namespace": ns}
     except Exception as err:
-        # Let decorator log; still return a structured error for callers
         return {"error": str(err), "namespace": ns, "socket": sock}
 
+
+@celery_app.task
+@log_to_file(logger)
+def image_gc_task(app_namespace: Optional[str] = None, force: bool = False, **extra_kwargs):
+    """
+    Evict least-recently-used, unreferenced images and their chain snapshots on this node
+    when the snapshotter disk is above IMAGE_GC_HIGH_PCT (force=True: down to the low watermark now).
+    """
+    ns = app_namespace or DEFAULT_NAMESPACE
+    sock = DEFAULT_CONTAINERD_SOCKET
+    try:
+        return _pod_manager(sock, ns).gc.collect(force=force)
+    except Exception as err:
+        return {"error": str(err), "namespace": ns, "socket": sock}
+
+
+@celery_app.task
+@log_to_file(logger)
+def janitor_task(app_namespace: Optional[str] = None, **extra_kwargs):
+    """One rate-limited orphan cleanup pass on this node (dead pods, loose apps, leaked snapshots)."""
+    from utils.containerd.janitor import Janitor
+
+    ns = app_namespace or DEFAULT_NAMESPACE
+    sock = DEFAULT_CONTAINERD_SOCKET
+    try:
+        return Janitor(_pod_manager(sock, ns)).run_once()
+    except Exception as err:
+        return {"error": str(err), "namespace": ns, "socket": sock}
@@ -3,6 +3,9 @@ from kombu import Queue,Exchange
 from socket import gethostname
 from utils.ReadConfig import ReadConfig as rc
 from utils.extensions.utilities_extention import UtilitiesExtension
+from celery.signals import worker_process_init
+from utils.containerd.channel_pool import get_channel_pool
+import os
 
 read_config = rc()
 secure_exchange = Exchange('secure_exchange', type='direct')
@@ -17,4 +20,38 @@ celery_app.conf.task_queues = [
 
         ]
 celery_app.autodiscover_tasks(['utils.celery.tasks.worker_node_tasks'])
-celery_app.conf.include = ["utils.celery.tasks.containerd_tasks"]
\ No newline at end of file
+celery_app.conf.include = ["utils.celery.tasks.containerd_tasks"]
+
+
+@worker_process_init.connect
+def _init_containerd_channels(**kwargs):
+    # prefork child: drop channels inherited from the parent, then connect once up front
+    pool = get_channel_pool()
+    pool.reset()
+    pool.warmup(os.environ.get("CONTAINERD_SOCKET", "unix:///run/containerd/containerd.sock"))
+
+
+@worker_process_init.connect
+def _init_warm_pools(**kwargs):
+    # start topping up warm sandbox pools; the refill lock keeps it to one process per namespace
+    from utils.celery.tasks.containerd_tasks import _warm_pool, DEFAULT_CONTAINERD_SOCKET, DEFAULT_NAMESPACE
+    from utils.containerd.warm_pool import WARM_POOL_SIZES
+
+    namespaces = {DEFAULT_NAMESPACE} | {i.partition("=")[0].strip() for i in WARM_POOL_SIZES.split(",") if "=" in i}
+    for ns in namespaces:
+        try:
+            _warm_pool(DEFAULT_CONTAINERD_SOCKET, ns).refill_async()
+        except Exception as e:
+            print(f"[warm-pool] init skipped for {ns}: {e}")
+
+
+@worker_process_init.connect
+def _init_janitor(**kwargs):
+    # every process runs the timer; the janitor's node lock keeps passes to one at a time
+    from utils.celery.tasks.containerd_tasks import _pod_manager, DEFAULT_CONTAINERD_SOCKET, DEFAULT_NAMESPACE
+    from utils.containerd.janitor import Janitor
+
+    try:
+        Janitor(_pod_manager(DEFAULT_CONTAINERD_SOCKET, DEFAULT_NAMESPACE)).start()
+    except Exception as e:
+        print(f"[janitor] init skipped: {e}")
@@ -0,0 +1,602 @@
+"""
+aio_containerd_interface.py
+asyncio (grpc.aio) variant of the containerd PodManager stack.
+
+Same API and behaviour as containerd_interface (ImageResolver, SnapshotManager,
+RuntimeManager, PodManager), but every containerd RPC is awaited, so one event loop
+can drive many pod lifecycles at once. Pure helpers, the OCI spec builder, the image
+metadata cache and the chain index are shared with the blocking implementation.
+
+Blocking work that has no aio counterpart stays off the loop via asyncio.to_thread:
+  - CNI plugin execution (subprocess)
+  - cold image pull + unpack (PodManager._pull_and_unpack under the node single-flight;
+    there is deliberately no async unpack, so leases and cleanup live in one place)
+
+From synchronous code (Celery tasks) use run_async(...): it submits the coroutine to a
+per-process event loop thread, which owns the aio channels (they are loop-bound).
+"""
+
+import asyncio
+import os
+import json
+import uuid
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, List, Tuple, Callable
+
+import grpc
+from google.protobuf import any_pb2
+from google.protobuf.json_format import ParseDict
+
+from generated.api.services.images.v1 import images_pb2, images_pb2_grpc
+from generated.api.services.content.v1 import content_pb2, content_pb2_grpc
+from generated.api.services.snapshots.v1 import snapshots_pb2, snapshots_pb2_grpc
+from generated.api.services.containers.v1 import containers_pb2, containers_pb2_grpc
+from generated.api.services.tasks.v1 import tasks_pb2, tasks_pb2_grpc
+from generated.api.services.leases.v1 import leases_pb2, leases_pb2_grpc
+from generated.api.types import descriptor_pb2
+
+from utils.containerd.grpc_ns import _AioAddNamespaceInterceptor
+from utils.containerd.channel_pool import DEFAULT_CHANNEL_OPTIONS
+from utils.containerd.image_cache import ImageMetadataCache, get_image_cache
+from utils.containerd.chain_index import ChainIndex, get_chain_index
+from utils.containerd.snapshotter_discovery import SnapshotterRegistry, get_snapshotter_registry
+from utils.containerd.transfer_pull import PullProgress
+from utils.containerd.containerd_interface import (
+    CONTAINERD_SOCKET, NAMESPACE, DEFAULT_SNAPSHOTTER, DEFAULT_CNI_NET_NAME, DEFAULT_IFNAME,
+    PLATFORM_OS, PLATFORM_ARCH, PULL_ENGINE, LEASE_TTL_SEC, MANAGED_LABEL, _lease_md,
+    _normalize_unix_target, _is_index, _is_manifest, _candidates_for_ref, _compute_chain_id, _cni_ip,
+    _snapshotter_candidates,
+    ContainerSpec, ContainerdClient, OciSpecBuilder, CniManager, PodManager, SINGLE_FLIGHT_TIMEOUT,
+)
+from utils.containerd.node_lock import get_single_flight
+from utils.containerd.phase_metrics import span
+from utils.redis.lifecycle_events import emit
+from utils.containerd.models import ResourceSpec
+from logpkg.log_kcld import LogKCld, log_to_file
+
+logger = LogKCld()
+
+
+# ========== Client ==========
+class AsyncContainerdClient:
+    @log_to_file(logger)
+    def __init__(self, socket: str = CONTAINERD_SOCKET, namespace: str = NAMESPACE):
+        self.socket = _normalize_unix_target(socket)
+        self.namespace = namespace
+        self.channel = grpc.aio.insecure_channel(
+            self.socket, options=DEFAULT_CHANNEL_OPTIONS,
+            interceptors=[_AioAddNamespaceInterceptor(namespace)],
+        )
+        self.images = images_pb2_grpc.ImagesStub(self.channel)
+        self.content = content_pb2_grpc.ContentStub(self.channel)
+        self.snapshots = snapshots_pb2_grpc.SnapshotsStub(self.channel)
+        self.containers = containers_pb2_grpc.ContainersStub(self.channel)
+        self.tasks = tasks_pb2_grpc.TasksStub(self.channel)
+        self.leases = leases_pb2_grpc.LeasesStub(self.channel)
+
+    async def close(self) -> None:
+        await self.channel.close()
+
+
+async def _read_blob_json(content_stub, digest: str) -> dict:
+    chunks = []
+    async for part in content_stub.Read(content_pb2.ReadContentRequest(digest=digest)):
+        if part.data:
+            chunks.append(part.data)
+    return json.loads(b"".join(chunks).decode("utf-8"))
+
+
+# ========== Image Resolution ==========
+class AsyncImageResolver:
+    @log_to_file(logger)
+    def __init__(self, client: AsyncContainerdClient, cache: Optional[ImageMetadataCache] = None):
+        self.c = client
+        self.cache = cache or get_image_cache()
+
+    async def resolve_image_name(self, wanted: str) -> str:
+        for cand in _candidates_for_ref(wanted):
+            try:
+                await self.c.images.Get(images_pb2.GetImageRequest(name=cand))
+                return cand
+            except grpc.RpcError as e:
+                if e.code() != grpc.StatusCode.NOT_FOUND:
+                    raise
+        raise RuntimeError(f"Image {wanted} not found in namespace {self.c.namespace}")
+
+    async def read_json(self, digest: str) -> dict:
+        doc = self.cache.get_blob(digest)
+        if doc is None:
+            doc = await _read_blob_json(self.c.content, digest)
+            self.cache.put_blob(digest, doc)
+        return doc
+
+    async def _select_platform(self, index_digest: str) -> dict:
+        picked = self.cache.get_platform_descriptor(index_digest, PLATFORM_OS, PLATFORM_ARCH)
+        if picked is not None:
+            return picked
+        idx = await self.read_json(index_digest)
+        manifests = idx.get("manifests") or []
+        m = next((m for m in manifests
+                  if (m.get("platform", {}) or {}).get("os") == PLATFORM_OS
+                  and (m.get("platform", {}) or {}).get("architecture") == PLATFORM_ARCH),
+                 manifests[0])
+        picked = {
+            "media_type": m.get("mediaType") or m.get("media_type"),
+            "digest": m["digest"],
+            "size": m["size"]
+        }
+        self.cache.put_platform_descriptor(index_digest, PLATFORM_OS, PLATFORM_ARCH, picked)
+        return picked
+
+    async def resolve_manifest(self, image_ref: str) -> descriptor_pb2.Descriptor:
+        resolved = await self.resolve_image_name(image_ref)
+        img = (await self.c.images.Get(images_pb2.GetImageRequest(name=resolved))).image
+        tgt = img.target
+        if _is_index(tgt.media_type):
+            d = descriptor_pb2.Descriptor()
+            ParseDict(await self._select_platform(tgt.digest), d)
+            return d
+        if _is_manifest(tgt.media_type):
+            return tgt
+        raise RuntimeError(f"Unsupported target media type: {tgt.media_type}")
+
+    async def load_manifest_and_config(self, manifest_desc) -> Tuple[dict, dict]:
+        manifest = await self.read_json(manifest_desc.digest)
+        config = await self.read_json(manifest["config"]["digest"])
+        return manifest, config
+
+
+# ========== Snapshot / Unpack ==========
+class AsyncSnapshotManager:
+    @log_to_file(logger)
+    def __init__(self, client: AsyncContainerdClient, default_snapshotter: str = DEFAULT_SNAPSHOTTER,
+                 chain_index: Optional[ChainIndex] = None,
+                 registry: Optional[SnapshotterRegistry] = None):
+        self.c = client
+        self._snapshotter_value_cache: Optional[str] = None
+        self.default_snapshotter = default_snapshotter
+        self.chains = chain_index or get_chain_index()
+        self.registry = registry or get_snapshotter_registry()
+
+    async def _select(self) -> Optional[str]:
+        cached = self.registry.cached(self.c.socket)
+        if cached is not None:
+            return cached
+        blocking = ContainerdClient.shared(socket=self.c.socket, namespace=self.c.namespace)
+        return await asyncio.to_thread(self.registry.select, blocking, self.default_snapshotter)
+
+    async def snapshotter(self) -> str:
+        if self._snapshotter_value_cache is None:
+            self._snapshotter_value_cache = await self._select()
+        return self._snapshotter_value_cache or self.default_snapshotter or "overlayfs"
+
+    async def reconcile(self, snapshotter: str) -> None:
+        committed = set()
+        try:
+            async for resp in self.c.snapshots.List(snapshots_pb2.ListSnapshotsRequest(snapshotter=snapshotter)):
+                committed.update(i.name for i in resp.info if i.kind == snapshots_pb2.COMMITTED)
+        except grpc.RpcError as e:
+            print(f"[chain-index] reconcile skipped for {snapshotter}: {e.code().name}")
+            self.chains.mark_reconciled(self.c.namespace, snapshotter)
+            return
+        self.chains.replace(self.c.namespace, snapshotter, committed)
+
+    async def chain_committed(self, snapshotter: str, chain_id: str) -> bool:
+        if self.chains.needs_reconcile(self.c.namespace, snapshotter):
+            await self.reconcile(snapshotter)
+        if self.chains.contains(self.c.namespace, snapshotter, chain_id):
+            return True
+        if await self._snap_stat_exists(snapshotter, chain_id):
+            self.chains.add(self.c.namespace, snapshotter, chain_id)
+            return True
+        return False
+
+    @asynccontextmanager
+    async def lease(self, id_hint: str):
+        """Async SnapshotManager.lease: expiring lease for the block, yields its id (or None)."""
+        lease_id = f"{id_hint}-{uuid.uuid4().hex[:8]}"
+        expire = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() + LEASE_TTL_SEC))
+        try:
+            await self.c.leases.Create(leases_pb2.CreateRequest(
+                id=lease_id, labels={"containerd.io/gc.expire": expire, "dibba.lease": id_hint}))
+        except grpc.RpcError as e:
+            print(f"[lease] create failed ({e.code().name}); continuing without a lease")
+            lease_id = None
+        try:
+            yield lease_id
+        finally:
+            if lease_id:
+                try:
+                    await self.c.leases.Delete(leases_pb2.DeleteRequest(id=lease_id))
+                except grpc.RpcError:
+                    pass
+
+    async def prepare_rw_snapshot(self, parent_chain_id: str, key_hint: str, extra_md=None,
+                                  lease: Optional[str] = None) -> Tuple[List, str]:
+        key = f"{key_hint}-{uuid.uuid4().hex[:8]}"
+        labels = {} if lease else {"containerd.io/gc.root": "true"}
+        extra_md = (list(extra_md or []) + (_lease_md(lease) or [])) or None
+
+        async def _prepare(snap_val: str):
+            with span("snapshot_prepare"):
+                resp = await self.c.snapshots.Prepare(snapshots_pb2.PrepareSnapshotRequest(
+                    snapshotter=snap_val, key=key, parent=parent_chain_id, labels=labels,
+                ), metadata=extra_md)
+            return list(resp.mounts)
+
+        current = await self.snapshotter()
+        try:
+            return await _prepare(current), key
+        except grpc.RpcError as e:
+            print(f"Prepare on snapshotter '{current}' failed: {e.code().name}")
+
+        self.registry.invalidate(self.c.socket)
+        self._snapshotter_value_cache = None
+        rediscovered = await self._select()
+        if rediscovered is not None:
+            if rediscovered != current:
+                try:
+                    mounts = await _prepare(rediscovered)
+                    self._snapshotter_value_cache = rediscovered
+                    return mounts, key
+                except grpc.RpcError:
+                    pass
+            self._snapshotter_value_cache = rediscovered
+            raise RuntimeError(f"Prepare failed on snapshotter '{rediscovered}' (parent {parent_chain_id}).")
+
+        for snap_val in _snapshotter_candidates(self.default_snapshotter):
+            try:
+                mounts = await _prepare(snap_val)
+                self._snapshotter_value_cache = snap_val
+                return mounts, key
+            except grpc.RpcError:
+                continue
+        raise RuntimeError("Unable to select snapshotter for containerd Snapshots API.")
+
+    async def _snap_stat_exists(self, snapshotter: str, key_or_name: str) -> bool:
+        try:
+            await self.c.snapshots.Stat(snapshots_pb2.StatSnapshotRequest(snapshotter=snapshotter, key=key_or_name))
+            return True
+        except grpc.RpcError as e:
+            if e.code() == grpc.StatusCode.NOT_FOUND:
+                return False
+            raise
+
+    async def _snap_remove_active(self, snapshotter: str, key: str) -> None:
+        try:
+            await self.c.snapshots.Remove(snapshots_pb2.RemoveSnapshotRequest(snapshotter=snapshotter, key=key))
+        except grpc.RpcError:
+            pass
+
+
+# ========== Container/Task ==========
+class AsyncRuntimeManager:
+    @log_to_file(logger)
+    def __init__(self, client: AsyncContainerdClient, snapshot_mgr: AsyncSnapshotManager):
+        self.c = client
+        self.snapshots = snapshot_mgr
+
+    @staticmethod
+    def _any_to_dict(a: any_pb2.Any) -> dict:
+        if not a or not a.value:
+            return {}
+        try:
+            return json.loads(a.value.decode("utf-8"))
+        except Exception:
+            return {}
+
+    async def create_container(self, cid: str, image_ref: str, spec_any: any_pb2.Any,
+                               labels: Optional[Dict[str, str]] = None, snapshot_key: str = "") -> None:
+        snapshotter = await self.snapshots.snapshotter()
+        with span("container_create"):
+            await self.c.containers.Create(containers_pb2.CreateContainerRequest(
+                container=containers_pb2.Container(
+                    id=cid,
+                    image=image_ref,
+                    labels=labels or {},
+                    spec=spec_any,
+                    runtime=containers_pb2.Container.Runtime(name="io.containerd.runc.v2"),
+                    snapshotter=snapshotter,
+                    snapshot_key=snapshot_key,
+                )
+            ))
+
+    async def start_task(self, cid: str, mounts, tty: bool = False,
+                         create_timeout=15.0, start_timeout=30.0) -> int:
+        with span("task_start"):
+            await self.c.tasks.Create(tasks_pb2.CreateTaskRequest(container_id=cid, terminal=tty, rootfs=mounts),
+                                      timeout=create_timeout)
+            resp = await self.c.tasks.Start(tasks_pb2.StartRequest(container_id=cid), timeout=start_timeout)
+        return resp.pid
+
+    async def stop_and_delete_task(self, cid: str, kill_signal: int = 15,
+                                   timeouts: Tuple[float, float] = (3.0, 10.0)) -> None:
+        try:
+            await self.c.tasks.Kill(tasks_pb2.KillRequest(container_id=cid, signal=kill_signal), timeout=timeouts[0])
+        except grpc.RpcError:
+            pass
+        try:
+            await self.c.tasks.Delete(tasks_pb2.DeleteTaskRequest(container_id=cid), timeout=timeouts[1])
+        except grpc.RpcError:
+            try:
+                await self.c.tasks.Kill(tasks_pb2.KillRequest(container_id=cid, signal=9), timeout=timeouts[0])
+                await self.c.tasks.Delete(tasks_pb2.DeleteTaskRequest(container_id=cid), timeout=timeouts[1])
+            except grpc.RpcError:
+                pass
+        try:
+            await self.c.containers.Delete(containers_pb2.DeleteContainerRequest(id=cid))
+        except grpc.RpcError:
+            pass
+
+    async def get_container_info(self, cid: str) -> Dict:
+        info: Dict = {"id": cid, "task": {}}
+        try:
+            c = (await self.c.containers.Get(containers_pb2.GetContainerRequest(id=cid))).container
+            info.update({
+                "image": c.image,
+                "labels": dict(c.labels),
+                "runtime": c.runtime.name if c.runtime and c.runtime.name else "",
+                "snapshotter": c.snapshotter,
+                "spec": self._any_to_dict(c.spec),
+            })
+        except grpc.RpcError as e:
+            info["error"] = f"containers.Get: {e.code().name}: {e.details()}"
+            return info
+        try:
+            st = await self.c.tasks.State(tasks_pb2.StateRequest(container_id=cid))
+            info["task"]["pid"] = st.pid
+            info["task"]["status"] = str(st.status)
+        except grpc.RpcError:
+            try:
+                gt = await self.c.tasks.Get(tasks_pb2.GetRequest(container_id=cid))
+                if gt.task.pid:
+                    info["task"]["pid"] = gt.task.pid
+            except grpc.RpcError:
+                pass
+        return info
+
+
+# ========== Pod Manager ==========
+class AsyncPodManager:
+    @log_to_file(logger)
+    def __init__(self, client: AsyncContainerdClient):
+        self.c = client
+        self.images = AsyncImageResolver(client)
+        self.snaps = AsyncSnapshotManager(client)
+        self.runtime = AsyncRuntimeManager(client, self.snaps)
+        self.cni = CniManager()
+        self._blocking: Optional[PodManager] = None
+
+    async def _snapshotter_name(self) -> str:
+        return await self.snaps.snapshotter()
+
+    def _blocking_client(self) -> ContainerdClient:
+        return ContainerdClient.shared(socket=self.c.socket, namespace=self.c.namespace)
+
+    def _blocking_pods(self) -> PodManager:
+        client = self._blocking_client()
+        if self._blocking is None or self._blocking.c is not client:
+            self._blocking = PodManager(client)
+        return self._blocking
+
+    async def _ensure_unpacked(self, image: str,
+                               progress_cb: Optional[Callable[[PullProgress], None]] = None) -> Tuple[str, dict]:
+        """
+        Async twin of PodManager._ensure_unpacked; returns (top chain ID, image config).
+        The warm check is awaited; a cold image is pulled and unpacked off-loop through the
+        same node-wide single-flight as the blocking PodManager, so sync and async tasks
+        never pull the same image twice.
+        """
+        snapshotter = await self._snapshotter_name()
+        try:
+            mdesc = await self.images.resolve_manifest(image)
+        except RuntimeError:
+            if PULL_ENGINE != "transfer":
+                raise
+            mdesc = None
+
+        if mdesc is not None:
+            _, cfg = await self.images.load_manifest_and_config(mdesc)
+            diff_ids = (cfg.get("rootfs") or {}).get("diff_ids", [])
+            if diff_ids and await self.snaps.chain_committed(snapshotter, _compute_chain_id(diff_ids)):
+                return _compute_chain_id(diff_ids), cfg
+            key = mdesc.digest
+        else:
+            key = f"ref:{image}"
+
+        pods = self._blocking_pods()
+        top_chain, cfg = await asyncio.to_thread(
+            get_single_flight().do,
+            f"{self.c.namespace}-{snapshotter}-{key}",
+            lambda: pods._pull_and_unpack(image, progress_cb),
+            SINGLE_FLIGHT_TIMEOUT,
+        )
+        self.snaps.chains.add(self.c.namespace, snapshotter, top_chain)
+        pods.gc.maybe_collect_async()
+        return top_chain, cfg
+
+    async def _prepare_rootfs(self, image: str, key_hint: str,
+                              progress_cb: Optional[Callable[[PullProgress], None]] = None,
+                              lease: Optional[str] = None) -> Tuple[List, str, dict]:
+        chain_id, cfg = await self._ensure_unpacked(image, progress_cb)
+        try:
+            mounts, snap_key = await self.snaps.prepare_rw_snapshot(chain_id, key_hint, lease=lease)
+        except RuntimeError:
+            snapshotter = await self._snapshotter_name()
+            self.snaps.chains.discard(self.c.namespace, snapshotter, chain_id)
+            if await self.snaps._snap_stat_exists(snapshotter, chain_id):
+                raise
+            chain_id, cfg = await self._ensure_unpacked(image, progress_cb)
+            mounts, snap_key = await self.snaps.prepare_rw_snapshot(chain_id, key_hint, lease=lease)
+        await asyncio.to_thread(self._blocking_pods().gc.touch, image)  # LRU order for image_gc
+        return mounts, snap_key, cfg
+
+    @log_to_file(logger)
+    async def create_pod(self, name: str, pause_image: str = "registry.k8s.io/pause:3.9",
+                         resources: Optional[ResourceSpec] = None,
+                         cni_network: str = DEFAULT_CNI_NET_NAME,
+                         cni_ifname: str = DEFAULT_IFNAME,
+                         progress_cb: Optional[Callable[[PullProgress], None]] = None) -> Dict:
+        async with self.snaps.lease(f"pod-{name}") as lease:
+            mounts, snap_key, cfg = await self._prepare_rootfs(pause_image, f"{name}-pause-rootfs",
+                                                               progress_cb, lease)
+            args_cfg = list((cfg.get("config") or {}).get("Entrypoint") or [])
+            args_cfg += list((cfg.get("config") or {}).get("Cmd") or [])
+            args = args_cfg or ["/pause"]
+
+            ns = [{"type": "pid"}, {"type": "network"}, {"type": "ipc"}, {"type": "uts"}, {"type": "mount"}]
+            spec_any = OciSpecBuilder(hostname=name).build(process_args=args, namespaces=ns, resources=resources)
+            cid = f"{name}"
+            await self.runtime.create_container(cid, pause_image, spec_any,
+                                                labels={"pod": name, "role": "pause", MANAGED_LABEL: "true"},
+                                                snapshot_key=snap_key)
+            pid = await self.runtime.start_task(cid, mounts)
+
+        ns_base = f"/proc/{pid}/ns"
+        ns_paths = {k: f"{ns_base}/{k}" for k in ["pid", "net", "ipc", "uts"]}
+        print(f"✅ Pause pod up: cid={cid}, pid={pid}")
+        emit(self.c.namespace, "sandbox_up", pod=name, cid=cid, pid=pid)
+
+        cni_attached = False
+        try:
+            cni_result = await asyncio.to_thread(self.cni.add, cni_network, cid, ns_paths["net"], cni_ifname)
+            cni_attached = True
+            print(f"🌐 CNI attached: {cni_result if isinstance(cni_result, dict) else 'ok'}")
+            emit(self.c.namespace, "cni_attached", pod=name, cid=cid, network=cni_network, ip=_cni_ip(cni_result))
+        except Exception as e:
+            print(f"❗ CNI attach failed: {e}")
+            emit(self.c.namespace, "cni_failed", pod=name, cid=cid, network=cni_network, error=e)
+
+        return {"name": name, "pause": {"cid": cid, "pid": pid}, "ns": ns_paths,
+                "cni": {"network": cni_network, "ifname": cni_ifname, "attached": cni_attached},
+                "snapshot_key": snap_key}
+
+    @log_to_file(logger)
+    async def add_container(self, pod: Dict, name: str, image: str,
+                            args: Optional[List[str]] = None,
+                            env: Optional[Dict[str, str]] = None,
+                            resources: Optional[ResourceSpec] = None,
+                            progress_cb: Optional[Callable[[PullProgress], None]] = None) -> Dict:
+        pod_name = pod["name"]
+        async with self.snaps.lease(f"app-{pod_name}-{name}") as lease:
+            mounts, snap_key, cfg = await self._prepare_rootfs(image, f"{pod_name}-{name}-rootfs",
+                                                               progress_cb, lease)
+            return await self._start_app(pod, name, image, (mounts, snap_key, cfg), args, env, resources)
+
+    async def _start_app(self, pod: Dict, name: str, image: str, rootfs: Tuple[List, str, dict],
+                         args: Optional[List[str]] = None,
+                         env: Optional[Dict[str, str]] = None,
+                         resources: Optional[ResourceSpec] = None) -> Dict:
+        pod_name = pod["name"]
+        pod_ns = pod["ns"]
+        mounts, snap_key, cfg = rootfs
+        if args is None:
+            args = list((cfg.get("config") or {}).get("Entrypoint") or [])
+            args += list((cfg.get("config") or {}).get("Cmd") or [])
+            if not args:
+                args = ["/bin/sh", "-c", "trap : TERM INT; sleep infinity & wait"]
+
+        namespaces = [
+            {"type": "pid", "path": pod_ns["pid"]},
+            {"type": "network", "path": pod_ns["net"]},
+            {"type": "ipc", "path": pod_ns["ipc"]},
+            {"type": "uts", "path": pod_ns["uts"]},
+            {"type": "mount"},
+        ]
+        spec_any = OciSpecBuilder(hostname=pod_name).build(
+            process_args=args, env=env or {}, namespaces=namespaces, resources=resources)
+        cid = f"{pod_name}-{name}"
+        await self.runtime.create_container(cid, image, spec_any,
+                                            labels={"pod": pod_name, "app": name, MANAGED_LABEL: "true"},
+                                            snapshot_key=snap_key)
+        pid = await self.runtime.start_task(cid, mounts)
+        print(f"🚀 App started: cid={cid}, pid={pid}, image={image}")
+        emit(self.c.namespace, "container_started", pod=pod_name, container=name, cid=cid, pid=pid, image=image)
+        return {"cid": cid, "pid": pid, "snapshot_key": snap_key}
+
+    @log_to_file(logger)
+    async def add_containers(self, pod: Dict, specs: List[ContainerSpec],
+                             progress_cb: Optional[Callable[[PullProgress], None]] = None) -> Dict[str, Dict]:
+        """Like PodManager.add_containers, but all containers are prepared and started concurrently."""
+        results = await asyncio.gather(*(
+            self.add_container(pod=pod, name=spec.name, image=spec.image, args=spec.args,
+                               env=spec.env, resources=spec.resources, progress_cb=progress_cb)
+            for spec in specs
+        ))
+        return {spec.name: res for spec, res in zip(specs, results)}
+
+    async def delete_container(self, app: Dict) -> None:
+        cid = app.get("cid")
+        snap_key = app.get("snapshot_key")
+        if cid:
+            await self.runtime.stop_and_delete_task(cid)
+        if snap_key:
+            await self.snaps._snap_remove_active(await self._snapshotter_name(), snap_key)
+
+    @log_to_file(logger)
+    async def delete_pod(self, pod: Dict, apps: Optional[List[Dict]] = None) -> None:
+        """Same order as PodManager.delete_pod; app containers are torn down concurrently."""
+        if apps:
+            await asyncio.gather(*(self.delete_container(app) for app in apps))
+
+        pause_cid = (pod or {}).get("pause", {}).get("cid")
+        netns_path = (pod or {}).get("ns", {}).get("net")
+        cni_cfg = (pod or {}).get("cni", {})
+        network_name = cni_cfg.get("network", DEFAULT_CNI_NET_NAME)
+        ifname = cni_cfg.get("ifname", DEFAULT_IFNAME)
+        if pause_cid and network_name:
+            netns_for_del = netns_path if (netns_path and os.path.exists(netns_path)) else ""
+            try:
+                await asyncio.to_thread(self.cni.delete, network_name, pause_cid, netns_for_del, ifname)
+            except Exception as e:
+                print(f"[cleanup] CNI DEL warning: {e}")
+        if pause_cid:
+            await self.runtime.stop_and_delete_task(pause_cid)
+        snap_key = (pod or {}).get("snapshot_key")
+        if snap_key:
+            await self.snaps._snap_remove_active(await self._snapshotter_name(), snap_key)
+
+
+# ========== Sync bridge (Celery) ==========
+class _LoopThread:
+    """One event loop per worker process, running in a daemon thread; recreated after fork."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._managers: Dict[Tuple[str, str], AsyncPodManager] = {}
+
+    def _ensure(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self.loop is None or self._pid != os.getpid():
+                self.loop = asyncio.new_event_loop()
+                self._pid = os.getpid()
+                self._managers = {}
+                threading.Thread(target=self.loop.run_forever, name="containerd-aio", daemon=True).start()
+            return self.loop
+
+    def run(self, coro, timeout: Optional[float] = None):
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure()).result(timeout)
+
+    def pod_manager(self, socket: str, namespace: str) -> AsyncPodManager:
+        """Must be called on the loop thread (aio channels bind to the running loop)."""
+        key = (socket, namespace)
+        if key not in self._managers:
+            self._managers[key] = AsyncPodManager(AsyncContainerdClient(socket=socket, namespace=namespace))
+        return self._managers[key]
+
+
+_loop_thread = _LoopThread()
+
+
+def run_async(coro, timeout: Optional[float] = None):
+    """Run a coroutine on this process's shared containerd event loop and wait for the result."""
+    return _loop_thread.run(coro, timeout)
+
+
+async def get_async_pod_manager(socket: str = CONTAINERD_SOCKET, namespace: str = NAMESPACE) -> AsyncPodManager:
+    """Shared AsyncPodManager for (socket, namespace) on the process loop (use inside run_async)."""
+    return _loop_thread.pod_manager(socket, namespace)
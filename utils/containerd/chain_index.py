@@ -0,0 +1,96 @@
+"""
+chain_index.py
+In-memory index of committed snapshot chain IDs, per (containerd namespace, snapshotter).
+
+containerd stays the source of truth: the index is filled from Snapshots.List on first
+use (and again every CHAIN_INDEX_RECONCILE_SEC), updated as grpc_unpack commits layers,
+and entries are dropped whenever containerd disagrees (e.g. Prepare on a missing parent).
+A hit lets a warm image skip blob checks and the per-layer Stat walk entirely.
+
+Env:
+  CHAIN_INDEX_RECONCILE_SEC  full re-list interval in seconds (default: 300, 0 disables)
+"""
+
+import os
+import time
+import threading
+from typing import Dict, Set, Tuple, Optional
+
+import grpc
+
+from generated.api.services.snapshots.v1 import snapshots_pb2
+from logpkg.log_kcld import LogKCld, log_to_file
+
+logger = LogKCld()
+
+CHAIN_INDEX_RECONCILE_SEC = float(os.environ.get("CHAIN_INDEX_RECONCILE_SEC", "300"))
+
+
+class ChainIndex:
+    @log_to_file(logger)
+    def __init__(self, reconcile_interval: float = CHAIN_INDEX_RECONCILE_SEC):
+        self.reconcile_interval = reconcile_interval
+        self._lock = threading.Lock()
+        self._chains: Dict[Tuple[str, str], Set[str]] = {}
+        self._reconciled_at: Dict[Tuple[str, str], float] = {}
+
+    def contains(self, namespace: str, snapshotter: str, chain_id: str) -> bool:
+        with self._lock:
+            return chain_id in self._chains.get((namespace, snapshotter), ())
+
+    def add(self, namespace: str, snapshotter: str, chain_id: str) -> None:
+        with self._lock:
+            self._chains.setdefault((namespace, snapshotter), set()).add(chain_id)
+
+    def discard(self, namespace: str, snapshotter: str, chain_id: str) -> None:
+        with self._lock:
+            self._chains.get((namespace, snapshotter), set()).discard(chain_id)
+
+    @log_to_file(logger)
+    def reconcile(self, client, snapshotter: str) -> int:
+        """
+        Replace the index for (client.namespace, snapshotter) with the committed
+        snapshots containerd reports. Returns the number of chains indexed.
+        """
+        committed: Set[str] = set()
+        try:
+            for resp in client.snapshots.List(snapshots_pb2.ListSnapshotsRequest(snapshotter=snapshotter)):
+                committed.update(i.name for i in resp.info if i.kind == snapshots_pb2.COMMITTED)
+        except grpc.RpcError as e:
+            print(f"[chain-index] reconcile skipped for {snapshotter}: {e.code().name}")
+            self.mark_reconciled(client.namespace, snapshotter)  # don't re-list on every call
+            return -1
+        self.replace(client.namespace, snapshotter, committed)
+        return len(committed)
+
+    def replace(self, namespace: str, snapshotter: str, committed: Set[str]) -> None:
+        with self._lock:
+            self._chains[(namespace, snapshotter)] = set(committed)
+            self._reconciled_at[(namespace, snapshotter)] = time.monotonic()
+
+    def mark_reconciled(self, namespace: str, snapshotter: str) -> None:
+        with self._lock:
+            self._reconciled_at[(namespace, snapshotter)] = time.monotonic()
+
+    def needs_reconcile(self, namespace: str, snapshotter: str) -> bool:
+        with self._lock:
+            last = self._reconciled_at.get((namespace, snapshotter))
+        return last is None or (self.reconcile_interval > 0 and time.monotonic() - last > self.reconcile_interval)
+
+    def maybe_reconcile(self, client, snapshotter: str) -> None:
+        if self.needs_reconcile(client.namespace, snapshotter):
+            self.reconcile(client, snapshotter)
+
+
+_shared_index: Optional[ChainIndex] = None
+_shared_lock = threading.Lock()
+
+
+def get_chain_index() -> ChainIndex:
+    """Process-wide chain index shared by every SnapshotManager in this worker."""
+    global _shared_index
+    if _shared_index is None:
+        with _shared_lock:
+            if _shared_index is None:
+                _shared_index = ChainIndex()
+    return _shared_index
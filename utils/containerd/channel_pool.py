@@ -0,0 +1,121 @@
+"""
+channel_pool.py
+Process-wide pool of gRPC channels to containerd (and CRI), one per socket target.
+
+- channels carry keepalive settings and are warmed to READY before first use,
+  so tasks don't pay connection setup / HTTP/2 handshake per call
+- fork-safe: the pool remembers the pid that created it; in a forked child (Celery
+  prefork) inherited channels are dropped (never used or closed) and recreated lazily.
+  worker_process_init also calls reset() + warmup() explicitly.
+
+Env:
+  CONTAINERD_CHANNEL_WARMUP_TIMEOUT  seconds to wait for READY on warmup (default: 5)
+  CONTAINERD_KEEPALIVE_MS            keepalive ping interval (default: 30000)
+"""
+
+import os
+import threading
+from typing import Dict, Optional, List, Tuple
+
+import grpc
+
+from logpkg.log_kcld import LogKCld, log_to_file
+
+logger = LogKCld()
+
+CHANNEL_WARMUP_TIMEOUT = float(os.environ.get("CONTAINERD_CHANNEL_WARMUP_TIMEOUT", "5"))
+KEEPALIVE_MS = int(os.environ.get("CONTAINERD_KEEPALIVE_MS", "30000"))
+
+DEFAULT_CHANNEL_OPTIONS: List[Tuple[str, int]] = [
+    ("grpc.keepalive_time_ms", KEEPALIVE_MS),
+    ("grpc.keepalive_timeout_ms", 10_000),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+    ("grpc.max_receive_message_length", 64 * 1024 * 1024),
+]
+
+
+class ChannelPool:
+    @log_to_file(logger)
+    def __init__(self, options: Optional[List[Tuple[str, int]]] = None,
+                 warmup_timeout: float = CHANNEL_WARMUP_TIMEOUT):
+        self.options = options or DEFAULT_CHANNEL_OPTIONS
+        self.warmup_timeout = warmup_timeout
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._channels: Dict[str, grpc.Channel] = {}
+        # per-(target, namespace) objects built on top of the channels (e.g. ContainerdClient)
+        self._clients: Dict[Tuple[str, str], object] = {}
+
+    def _check_fork(self) -> None:
+        # caller holds self._lock
+        if self._pid != os.getpid():
+            # channels created by the parent are unusable here; closing them could
+            # also tear down the parent's connections, so just forget them
+            self._channels = {}
+            self._clients = {}
+            self._pid = os.getpid()
+
+    @log_to_file(logger)
+    def channel(self, target: str) -> grpc.Channel:
+        with self._lock:
+            self._check_fork()
+            ch = self._channels.get(target)
+            if ch is None:
+                ch = grpc.insecure_channel(target, options=self.options)
+                self._channels[target] = ch
+            return ch
+
+    def client(self, target: str, namespace: str, factory):
+        """
+        Return the cached object for (target, namespace), building it with
+        factory(channel) on first use. Stubs are reused across tasks this way.
+        """
+        key = (target, namespace)
+        with self._lock:
+            self._check_fork()
+            cached = self._clients.get(key)
+        if cached is not None:
+            return cached
+        built = factory(self.channel(target))
+        with self._lock:
+            return self._clients.setdefault(key, built)
+
+    @log_to_file(logger)
+    def warmup(self, target: str, timeout: Optional[float] = None) -> bool:
+        """Connect now and wait for READY; returns False (never raises) if containerd isn't up yet."""
+        try:
+            grpc.channel_ready_future(self.channel(target)).result(timeout=timeout or self.warmup_timeout)
+            return True
+        except grpc.FutureTimeoutError:
+            print(f"[channel-pool] {target} not ready after {timeout or self.warmup_timeout}s")
+            return False
+
+    @log_to_file(logger)
+    def reset(self) -> None:
+        """Drop everything; call in a freshly forked worker process."""
+        with self._lock:
+            self._pid = -1
+            self._check_fork()
+
+    @log_to_file(logger)
+    def close(self) -> None:
+        with self._lock:
+            if self._pid == os.getpid():
+                for ch in self._channels.values():
+                    ch.close()
+            self._channels = {}
+            self._clients = {}
+
+
+_shared_pool: Optional[ChannelPool] = None
+_shared_lock = threading.Lock()
+
+
+def get_channel_pool() -> ChannelPool:
+    global _shared_pool
+    if _shared_pool is None:
+        with _shared_lock:
+            if _shared_pool is None:
+                _shared_pool = ChannelPool()
+    return _shared_pool
@@ -16,9 +16,11 @@ import hashlib
 import grpc
 import subprocess
 import time
+import threading
 from shutil import which
+from contextlib import contextmanager
 from dataclasses import dataclass,field
-from typing import Optional, Dict, List, Tuple
+from typing import Optional, Dict, List, Tuple, Callable
 from utils.ReadConfig import ReadConfig as rc
 from logpkg.log_kcld import LogKCld, log_to_file
 from typing import Union
@@ -33,13 +35,29 @@ from generated.api.services.snapshots.v1 import snapshots_pb2, snapshots_pb2_grp
 from generated.api.services.containers.v1 import containers_pb2, containers_pb2_grpc
 from generated.api.services.tasks.v1 import tasks_pb2, tasks_pb2_grpc
 from generated.api.types import descriptor_pb2
+from generated.api.types.task import task_pb2 as task_types_pb2
 from generated.runtime.v1 import api_pb2, api_pb2_grpc
 
 # diff + leases for gRPC-only unpack
 from generated.api.services.diff.v1 import diff_pb2, diff_pb2_grpc
 from generated.api.services.leases.v1 import leases_pb2, leases_pb2_grpc
+# transfer + streaming for progress-reporting pulls
+from generated.api.services.transfer.v1 import transfer_pb2_grpc
+from generated.api.services.streaming.v1 import streaming_pb2_grpc
+from generated.api.services.events.v1 import events_pb2_grpc
+from generated.api.services.introspection.v1 import introspection_pb2_grpc
 from utils.containerd.grpc_ns import _AddNamespaceInterceptor
 from utils.containerd.models import ResourceSpec
+from utils.containerd.image_cache import ImageMetadataCache, get_image_cache
+from utils.containerd.chain_index import ChainIndex, get_chain_index
+from utils.containerd.transfer_pull import TransferPuller, TransferUnavailable, PullProgress
+from utils.containerd.channel_pool import get_channel_pool
+from utils.containerd.snapshotter_discovery import SnapshotterRegistry, get_snapshotter_registry
+from utils.containerd.pod_dag import PodDag, StageFailed
+from utils.containerd.node_lock import get_single_flight
+from utils.containerd.image_gc import ImageGC
+from utils.containerd.phase_metrics import span, timed
+from utils.redis.lifecycle_events import emit
 
 logger = LogKCld()
 
@@ -47,7 +65,6 @@ read_conf = rc()
 
 
 # ---- add this helper near your imports ----
-@log_to_file(logger)
 def _normalize_unix_target(sock: str) -> str:
     """
     Accepts either:
@@ -86,8 +103,25 @@ CNI_CONF_DIR = os.environ.get("CNI_CONF_DIR", "/etc/cni/net.d")
 DEFAULT_CNI_NET_NAME = os.environ.get("CNI_NET_NAME", "calico")  # must match conflist "name"
 DEFAULT_IFNAME = os.environ.get("CNI_IFNAME", "eth0")
 
+# "transfer" (containerd Transfer service, streamed progress + unpack during pull) or "cri"
+PULL_ENGINE = os.environ.get("CONTAINERD_PULL_ENGINE", "transfer").lower()
+POD_DAG_WORKERS = int(os.environ.get("POD_DAG_WORKERS", "8"))
+SINGLE_FLIGHT_TIMEOUT = float(os.environ.get("IMAGE_SINGLE_FLIGHT_TIMEOUT", "1800"))
+# pod creation / unpack run under a containerd lease that expires after this long, so work
+# orphaned by a crashed worker is reclaimed by containerd's GC
+LEASE_TTL_SEC = int(os.environ.get("CONTAINERD_LEASE_TTL_SEC", "3600"))
+LEASE_HEADER = "containerd-lease"
+# stamped on every pause/app container dibba creates; cleanup only ever selects on it, since
+# namespaces like k8s.io also hold kubelet/CRI containers with their own pod/app labels
+MANAGED_LABEL = "dibba.io/managed"
+MANAGED_FILTER = f'labels."{MANAGED_LABEL}"=="true"'
+
+
+def _lease_md(lease_id: Optional[str]) -> Optional[List[Tuple[str, str]]]:
+    """Per-call metadata attaching created snapshots/content to a lease."""
+    return [(LEASE_HEADER, lease_id)] if lease_id else None
+
 # --- platform auto-detect (overridden if FORCE_PLATFORM is set) ---
-@log_to_file(logger)
 def _detect_platform() -> Tuple[str, str]:
     m = os.uname().machine.lower()
     arch_map = {
@@ -112,22 +146,18 @@ DOCKER_LIST = "application/vnd.docker.distribution.manifest.list.v2+json"
 DOCKER_MAN  = "application/vnd.docker.distribution.manifest.v2+json"
 ANNOTATION_UNCOMPRESSED = "containerd.io/uncompressed"
 
-@log_to_file(logger)
 def _is_index(mt: str) -> bool:
     return mt.endswith("image.index.v1+json") or mt == DOCKER_LIST
 
-@log_to_file(logger)
 def _is_manifest(mt: str) -> bool:
     return mt.endswith("image.manifest.v1+json") or mt == DOCKER_MAN
 
-@log_to_file(logger)
 def ns_md(extra=None) -> Tuple[Tuple[str,str], ...]:
     md = [("containerd-namespace", NAMESPACE)]
     if extra:
         md.extend(extra)
     return tuple(md)
 
-@log_to_file(logger)
 def rtns_md(namespace: str,extra=None) -> Tuple[Tuple[str,str], ...]:
     md = [("containerd-namespace", namespace)]
     if extra:
@@ -136,7 +166,6 @@ def rtns_md(namespace: str,extra=None) -> Tuple[Tuple[str,str], ...]:
 
 
 # ========== Utilities ==========
-@log_to_file(logger)
 def _candidates_for_ref(ref: str) -> List[str]:
     out = {ref}
     last = ref.split("/")[-1]
@@ -158,7 +187,6 @@ def _read_blob_json(content_stub, digest: str, extra_md=None) -> dict:
     data = b"".join(part.data for part in stream if part.data)
     return json.loads(data.decode("utf-8"))
 
-@log_to_file(logger)
 def _compute_chain_id(diff_ids: List[str]) -> str:
     if not diff_ids:
         raise ValueError("chainID needs at least one diff_id")
@@ -171,7 +199,6 @@ def _compute_chain_id(diff_ids: List[str]) -> str:
         chain = f"sha256:{h.hexdigest()}"
     return chain
 
-@log_to_file(logger)
 def _parse_bytes(value: str | int | None) -> Optional[int]:
     if value is None:
         return None
@@ -196,7 +223,6 @@ def _parse_bytes(value: str | int | None) -> Optional[int]:
         mul = units.get(suf[-1], 1)
     return int(float(num) * mul)
 
-@log_to_file(logger)
 def _mcores_to_quota_period(millicores: int, period_us: int = 100_000) -> Tuple[int, int]:
     if millicores <= 0:
         return (0, period_us)
@@ -204,13 +230,21 @@ def _mcores_to_quota_period(millicores: int, period_us: int = 100_000) -> Tuple[
     quota = max(quota, 1000)
     return (quota, period_us)
 
-@log_to_file(logger)
 def _mcores_to_shares(millicores: int) -> int:
     if millicores <= 0:
         return 2
     shares = int(1024 * (millicores / 1000.0))
     return max(2, shares)
 
+def _cni_ip(result) -> Optional[str]:
+    """First address of a CNI ADD result ("10.0.0.5/32" -> "10.0.0.5"), if it has one."""
+    if not isinstance(result, dict):
+        return None
+    ips = result.get("ips") or []
+    if not ips:
+        return None
+    return (ips[0].get("address") or "").split("/")[0] or None
+
 @dataclass
 class ContainerSpec:
     name: str
@@ -242,7 +276,8 @@ class _CRIImageClient:
     def __init__(self, socket_target="/run/containerd/containerd.sock"):
         # Accept either a path or a 'unix://...' target
         target = _normalize_unix_target(socket_target)
-        self.channel = grpc.insecure_channel(target)
+        # pooled: the CRI socket is usually the containerd socket, so this reuses that connection
+        self.channel = get_channel_pool().channel(target)
         self.stub = api_pb2_grpc.ImageServiceStub(self.channel)
 
     @log_to_file(logger)
@@ -272,10 +307,13 @@ class ContainerdClient:
     @log_to_file(logger)
     def __init__(self,
                  socket: str = CONTAINERD_SOCKET,
-                 namespace: str = None):
+                 namespace: str = None,
+                 channel: Optional[grpc.Channel] = None):
         self.socket = socket
         self.namespace = namespace
-        if socket.startswith("unix://"):
+        if channel is not None:
+            ch = channel  # shared/pooled channel, see ContainerdClient.shared()
+        elif socket.startswith("unix://"):
             ch = grpc.insecure_channel(socket)
         else:
             ch = grpc.insecure_channel(socket)  # adjust if you truly have TLS
@@ -290,6 +328,22 @@ class ContainerdClient:
         self.tasks = tasks_pb2_grpc.TasksStub(self._ich)
         self.diff = diff_pb2_grpc.DiffStub(self._ich)
         self.leases = leases_pb2_grpc.LeasesStub(self._ich)
+        self.transfer = transfer_pb2_grpc.TransferStub(self._ich)
+        self.streaming = streaming_pb2_grpc.StreamingStub(self._ich)
+        self.events = events_pb2_grpc.EventsStub(self._ich)
+        self.introspection = introspection_pb2_grpc.IntrospectionStub(self._ich)
+
+    @classmethod
+    @log_to_file(logger)
+    def shared(cls, socket: str = CONTAINERD_SOCKET, namespace: str = NAMESPACE) -> "ContainerdClient":
+        """
+        Process-wide client for (socket, namespace) on a pooled, keepalive'd channel.
+        Stubs are built once and reused by every task in this worker process.
+        """
+        target = _normalize_unix_target(socket)
+        return get_channel_pool().client(
+            target, namespace, lambda ch: cls(socket=target, namespace=namespace, channel=ch))
+
     def md(self, extra: tuple[tuple[str, str], ...] = ()) -> tuple[tuple[str, str], ...]:
         base = (("containerd-namespace", self.namespace),)
         return base + tuple(extra)
@@ -297,8 +351,10 @@ class ContainerdClient:
 # ========== Image Resolution ==========
 class ImageResolver:
     @log_to_file(logger)
-    def __init__(self, client: ContainerdClient):
+    def __init__(self, client: ContainerdClient, cache: Optional[ImageMetadataCache] = None):
         self.c = client
+        # digest-keyed, shared across resolvers in this process unless a cache is injected
+        self.cache = cache or get_image_cache()
 
     @log_to_file(logger)
     def resolve_image_name(self, wanted: str) -> str:
@@ -311,39 +367,56 @@ class ImageResolver:
                     raise
         raise RuntimeError(f"Image {wanted} not found in namespace {NAMESPACE}")
 
+    @log_to_file(logger)
+    def read_json(self, digest: str, extra_md=None) -> dict:
+        """
+        Read + parse a JSON blob (index/manifest/config) by digest.
+        Digests are content addresses, so a cached parse is always valid.
+        """
+        doc = self.cache.get_blob(digest)
+        if doc is None:
+            doc = _read_blob_json(self.c.content, digest, extra_md)
+            self.cache.put_blob(digest, doc)
+        return doc
+
+    def _select_platform(self, index_digest: str, extra_md=None) -> dict:
+        picked = self.cache.get_platform_descriptor(index_digest, PLATFORM_OS, PLATFORM_ARCH)
+        if picked is not None:
+            return picked
+        idx = self.read_json(index_digest, extra_md)
+        manifests = idx.get("manifests") or []
+        m = next((m for m in manifests
+                  if (m.get("platform", {}) or {}).get("os") == PLATFORM_OS
+                  and (m.get("platform", {}) or {}).get("architecture") == PLATFORM_ARCH),
+                 manifests[0])
+        picked = {
+            "media_type": m.get("mediaType") or m.get("media_type"),
+            "digest": m["digest"],
+            "size": m["size"]
+        }
+        self.cache.put_platform_descriptor(index_digest, PLATFORM_OS, PLATFORM_ARCH, picked)
+        return picked
+
+    @timed("resolve_manifest")
     def resolve_manifest(self, image_ref: str, extra_md=None) -> descriptor_pb2.Descriptor:
         resolved = self.resolve_image_name(image_ref)
+        # the name -> target mapping is mutable (tags move), so it is always asked of containerd
         img = self.c.images.Get(images_pb2.GetImageRequest(name=resolved)).image
         tgt = img.target
         if _is_index(tgt.media_type):
-            idx = _read_blob_json(self.c.content, tgt.digest, extra_md)
-            for m in idx.get("manifests", []):
-                plat = m.get("platform", {}) or {}
-                if plat.get("os") == PLATFORM_OS and plat.get("architecture") == PLATFORM_ARCH:
-                    d = descriptor_pb2.Descriptor()
-                    ParseDict({
-                        "media_type": m.get("mediaType") or m.get("media_type"),
-                        "digest": m["digest"],
-                        "size": m["size"]
-                    }, d)
-                    return d
-            m = (idx.get("manifests") or [])[0]
             d = descriptor_pb2.Descriptor()
-            ParseDict({
-                "media_type": m.get("mediaType") or m.get("media_type"),
-                "digest": m["digest"],
-                "size": m["size"]
-            }, d)
+            ParseDict(self._select_platform(tgt.digest, extra_md), d)
             return d
         if _is_manifest(tgt.media_type):
             return tgt
         raise RuntimeError(f"Unsupported target media type: {tgt.media_type}")
 
     @log_to_file(logger)
+    @timed("load_config")
     def load_manifest_and_config(self, manifest_desc, extra_md=None):
-        manifest = _read_blob_json(self.c.content, manifest_desc.digest, extra_md)
+        manifest = self.read_json(manifest_desc.digest, extra_md)
         cfg_digest = manifest["config"]["digest"]
-        config = _read_blob_json(self.c.content, cfg_digest, extra_md)
+        config = self.read_json(cfg_digest, extra_md)
         return manifest, config
 
     @log_to_file(logger)
@@ -356,51 +429,99 @@ class ImageResolver:
             raise RuntimeError(f"No diff_ids in config for {image_ref}")
         return _compute_chain_id(diff_ids)
 
+
 # ========== Snapshot / Unpack ==========
+def _snapshotter_candidates(default_snapshotter: Optional[str]) -> List[str]:
+    """Snapshotter names to brute-force when discovery found nothing (short and full plugin IDs)."""
+    raw = []
+    if default_snapshotter:
+        raw.append(default_snapshotter)
+    raw += ["overlayfs", "native", "btrfs", "zfs", "stargz"]
+    seen = set(); raw = [x for x in raw if not (x in seen or seen.add(x))]
+    full = [f"io.containerd.snapshotter.v1.{name}" for name in raw]
+    return raw + full
+
+
 class SnapshotManager:
     @log_to_file(logger)
-    def __init__(self, client: ContainerdClient, default_snapshotter: str = DEFAULT_SNAPSHOTTER):
+    def __init__(self, client: ContainerdClient, default_snapshotter: str = DEFAULT_SNAPSHOTTER,
+                 chain_index: Optional[ChainIndex] = None,
+                 registry: Optional[SnapshotterRegistry] = None):
         self.c = client
         self._snapshotter_value_cache: Optional[str] = None
         self.default_snapshotter = default_snapshotter
+        self.chains = chain_index or get_chain_index()
+        self.registry = registry or get_snapshotter_registry()
+
+    def snapshotter(self) -> str:
+        """Snapshotter for this node: discovered once per process via Introspection."""
+        if self._snapshotter_value_cache is None:
+            self._snapshotter_value_cache = self.registry.select(self.c, self.default_snapshotter)
+        return self._snapshotter_value_cache or self.default_snapshotter or "overlayfs"
 
     @log_to_file(logger)
+    def chain_committed(self, snapshotter: str, chain_id: str) -> bool:
+        """
+        O(1) check that a committed chain exists: index hit, else a single Stat
+        (a positive Stat is recorded so the next pod start skips the RPC).
+        """
+        self.chains.maybe_reconcile(self.c, snapshotter)
+        if self.chains.contains(self.c.namespace, snapshotter, chain_id):
+            return True
+        if self._snap_stat_exists(snapshotter, chain_id):
+            self.chains.add(self.c.namespace, snapshotter, chain_id)
+            return True
+        return False
+
     def _snapshotter_candidates(self) -> List[str]:
-        raw = []
-        if self.default_snapshotter:
-            raw.append(self.default_snapshotter)
-        raw += ["overlayfs", "native", "btrfs", "zfs", "stargz"]
-        seen = set(); raw = [x for x in raw if not (x in seen or seen.add(x))]
-        full = [f"io.containerd.snapshotter.v1.{name}" for name in raw]
-        return raw + full
+        return _snapshotter_candidates(self.default_snapshotter)
 
     @log_to_file(logger)
-    def prepare_rw_snapshot(self, parent_chain_id: str, key_hint: str, extra_md=None) -> Tuple[List
-, str]:
+    @timed("snapshot_prepare")
+    def prepare_rw_snapshot(self, parent_chain_id: str, key_hint: str, extra_md=None,
+                            lease: Optional[str] = None) -> Tuple[List, str]:
         key = f"{key_hint}-{uuid.uuid4().hex[:8]}"
 
-        if self._snapshotter_value_cache:
-            try:
-                req = snapshots_pb2.PrepareSnapshotRequest(
-                    snapshotter=self._snapshotter_value_cache, key=key, parent=parent_chain_id,
-                    labels={"containerd.io/gc.root": "true"},
-                )
-                resp = self.c.snapshots.Prepare(req)
-                print(f"Using snapshotter '{self._snapshotter_value_cache}'")
-                return list(resp.mounts), key
-            except grpc.RpcError:
-                pass
+        # under a lease the snapshot needs no gc.root: the lease holds it until the
+        # container referencing it (snapshot_key) exists, then the container does
+        labels = {} if lease else {"containerd.io/gc.root": "true"}
+        extra_md = (list(extra_md or []) + (_lease_md(lease) or [])) or None
 
+        def _prepare(snap_val: str):
+            req = snapshots_pb2.PrepareSnapshotRequest(
+                snapshotter=snap_val, key=key, parent=parent_chain_id, labels=labels,
+            )
+            return list(self.c.snapshots.Prepare(req, metadata=extra_md).mounts)
+
+        current = self.snapshotter()
+        try:
+            return _prepare(current), key
+        except grpc.RpcError as e:
+            print(f"Prepare on snapshotter '{current}' failed: {e.code().name}")
+
+        # containerd disagrees with the cached choice: re-discover once
+        self.registry.invalidate(self.c.socket)
+        self._snapshotter_value_cache = None
+        rediscovered = self.registry.select(self.c, self.default_snapshotter)
+        if rediscovered is not None:
+            if rediscovered != current:
+                try:
+                    mounts = _prepare(rediscovered)
+                    self._snapshotter_value_cache = rediscovered
+                    print(f"Discovered snapshotter '{rediscovered}'")
+                    return mounts, key
+                except grpc.RpcError:
+                    pass
+            self._snapshotter_value_cache = rediscovered
+            raise RuntimeError(f"Prepare failed on snapshotter '{rediscovered}' (parent {parent_chain_id}).")
+
+        # no Introspection on this daemon: fall back to probing
         for snap_val in self._snapshotter_candidates():
             try:
-                req = snapshots_pb2.PrepareSnapshotRequest(
-                    snapshotter=snap_val, key=key, parent=parent_chain_id,
-                    labels={"containerd.io/gc.root": "true"},
-                )
-                resp = self.c.snapshots.Prepare(req)
+                mounts = _prepare(snap_val)
                 self._snapshotter_value_cache = snap_val
                 print(f"Discovered snapshotter '{snap_val}'")
-                return list(resp.mounts), key
+                return mounts, key
             except grpc.RpcError:
                 continue
         raise RuntimeError("Unable to select snapshotter for containerd Snapshots API.")
@@ -421,7 +542,7 @@ class SnapshotManager:
     def _snap_remove_active(self, snapshotter: str, key: str, extra_md=None):
         try:
             self.c.snapshots.Remove(
-                snapshots_pb2.RemoveSnapshotRequest(snapshotter=snapshotter, key=key)
+                snapshots_pb2.RemoveSnapshotRequest(snapshotter=snapshotter, key=key), metadata=extra_md
             )
         except grpc.RpcError:
             pass
@@ -433,58 +554,64 @@ class SnapshotManager:
         if len(diff_ids) != len(layers):
             raise RuntimeError("layers vs diff_ids length mismatch; cannot compute chainIDs.")
 
-        parent_chain = ""
-        for i, layer in enumerate(layers):
-            cur_chain = _compute_chain_id(diff_ids[:i+1])
-
-            if self._snap_stat_exists(snapshotter, cur_chain, None):
-                parent_chain = cur_chain
-                continue
-
-            prep_key = f"unpack-{uuid.uuid4().hex[:8]}-{i}"
-            prep = self.c.snapshots.Prepare(
-                snapshots_pb2.PrepareSnapshotRequest(
-                    snapshotter=snapshotter,
-                    key=prep_key,
-                    parent=parent_chain or "",
-                    labels={"containerd.io/gc.root": "true"},
-                )
-            )
-            mounts = list(prep.mounts)
-
-            d = descriptor_pb2.Descriptor()
-            ParseDict({
-                "media_type": layer.get("mediaType") or layer.get("media_type"),
-                "digest": layer["digest"],
-                "size": layer.get("size", 0),
-                "annotations": { ANNOTATION_UNCOMPRESSED: diff_ids[i] }
-            }, d)
-
-            self.c.diff.Apply(diff_pb2.ApplyRequest(diff=d, mounts=mounts))
+        # uncommitted "unpack-*" keys live only in the lease; committed chains are gc roots
+        with self.lease("unpack") as lease_id:
+            md = _lease_md(lease_id)
+            parent_chain = ""
+            for i, layer in enumerate(layers):
+                cur_chain = _compute_chain_id(diff_ids[:i+1])
+
+                if (self.chains.contains(self.c.namespace, snapshotter, cur_chain)
+                        or self._snap_stat_exists(snapshotter, cur_chain, None)):
+                    self.chains.add(self.c.namespace, snapshotter, cur_chain)
+                    parent_chain = cur_chain
+                    continue
 
-            try:
-                self.c.snapshots.Commit(
-                    snapshots_pb2.CommitSnapshotRequest(
-                        snapshotter=snapshotter, name=cur_chain, key=prep_key,
-                        labels={"containerd.io/gc.root": "true"},
+                with span("unpack_layer"):
+                    prep_key = f"unpack-{uuid.uuid4().hex[:8]}-{i}"
+                    prep = self.c.snapshots.Prepare(
+                        snapshots_pb2.PrepareSnapshotRequest(
+                            snapshotter=snapshotter,
+                            key=prep_key,
+                            parent=parent_chain or "",
+                        ),
+                        metadata=md,
                     )
-                )
-            except grpc.RpcError as e:
-                if e.code() == grpc.StatusCode.ALREADY_EXISTS:
-                    self._snap_remove_active(snapshotter, prep_key, None)
-                else:
-                    self._snap_remove_active(snapshotter, prep_key, None)
-                    raise
+                    mounts = list(prep.mounts)
+
+                    d = descriptor_pb2.Descriptor()
+                    ParseDict({
+                        "media_type": layer.get("mediaType") or layer.get("media_type"),
+                        "digest": layer["digest"],
+                        "size": layer.get("size", 0),
+                        "annotations": { ANNOTATION_UNCOMPRESSED: diff_ids[i] }
+                    }, d)
 
-            parent_chain = cur_chain
+                    try:
+                        self.c.diff.Apply(diff_pb2.ApplyRequest(diff=d, mounts=mounts), metadata=md)
+                        self.c.snapshots.Commit(
+                            snapshots_pb2.CommitSnapshotRequest(
+                                snapshotter=snapshotter, name=cur_chain, key=prep_key,
+                                labels={"containerd.io/gc.root": "true"},
+                            ),
+                            metadata=md,
+                        )
+                    except grpc.RpcError as e:
+                        self._snap_remove_active(snapshotter, prep_key, md)
+                        if e.code() != grpc.StatusCode.ALREADY_EXISTS:
+                            raise
+
+                self.chains.add(self.c.namespace, snapshotter, cur_chain)
+                parent_chain = cur_chain
 
         return parent_chain
 
     @log_to_file(logger)
-    def _new_lease(self, id_hint: str = "unpack") -> leases_pb2.Lease:
+    def _new_lease(self, id_hint: str = "unpack", ttl: int = LEASE_TTL_SEC) -> leases_pb2.Lease:
         lid = f"{id_hint}-{uuid.uuid4().hex[:8]}"
+        expire = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() + ttl))
         resp = self.c.leases.Create(
-            leases_pb2.CreateRequest(id=lid, labels={"containerd.io/gc.root": "true"}))
+            leases_pb2.CreateRequest(id=lid, labels={"containerd.io/gc.expire": expire, "dibba.lease": id_hint}))
         return resp.lease
 
     @log_to_file(logger)
@@ -494,86 +621,173 @@ class SnapshotManager:
         except grpc.RpcError:
             pass
 
+    @contextmanager
+    def lease(self, id_hint: str):
+        """
+        Expiring lease for the duration of the block; yields its id (None if leases are
+        unavailable, in which case callers fall back to gc.root labels). Whatever was
+        created under it and is not referenced by then becomes collectable on exit, or
+        at expiry if the process dies first.
+        """
+        try:
+            lease_id = self._new_lease(id_hint).id
+        except grpc.RpcError as e:
+            print(f"[lease] create failed ({e.code().name}); continuing without a lease")
+            lease_id = None
+        try:
+            yield lease_id
+        finally:
+            if lease_id:
+                self._delete_lease(lease_id)
+
 
 # ========== OCI Spec Builder ==========
+DEFAULT_CAPABILITIES: Tuple[str, ...] = (
+    "CAP_CHOWN","CAP_DAC_OVERRIDE","CAP_FSETID","CAP_FOWNER","CAP_MKNOD",
+    "CAP_NET_RAW","CAP_SETGID","CAP_SETUID","CAP_SETFCAP","CAP_SETPCAP",
+    "CAP_NET_BIND_SERVICE","CAP_SYS_CHROOT","CAP_KILL","CAP_AUDIT_WRITE"
+)
+DEFAULT_SPEC_MOUNTS: List[Dict] = [
+    {"destination": "/proc", "type": "proc", "source": "proc"},
+    {"destination": "/dev", "type": "tmpfs", "source": "tmpfs",
+     "options": ["nosuid","strictatime","mode=755","size=65536k"]},
+    {"destination": "/dev/pts", "type": "devpts", "source": "devpts",
+     "options": ["nosuid","noexec","newinstance","ptmxmode=0666","mode=0620","gid=5"]},
+    {"destination": "/dev/shm", "type": "tmpfs", "source": "shm",
+     "options": ["nosuid","noexec","nodev","mode=1777","size=65536k"]},
+    {"destination": "/sys", "type": "sysfs", "source": "sysfs",
+     "options": ["nosuid","noexec","nodev","ro"]},
+    {"destination": "/sys/fs/cgroup", "type": "cgroup", "source": "cgroup",
+     "options": ["nosuid","noexec","nodev","relatime","ro"]},
+]
+DEFAULT_PATH_ENV = "/usr/local/sbin:/usr/local/bin:/usr/sbin:/usr/bin:/sbin:/bin"
+
+
+@dataclass(frozen=True)
+class _SpecTemplate:
+    """Pre-serialized JSON around the per-container fields of an OCI spec."""
+    head: str       # up to process.cwd
+    caps: str       # after process.env: capabilities, closes "process", opens "root"...
+    mounts: str     # after hostname: mounts, opens linux.namespaces
+
+
+_spec_templates: Dict[Tuple[bool, Tuple[str, ...]], _SpecTemplate] = {}
+_spec_templates_lock = threading.Lock()
+
+
+def _spec_template(root_readonly: bool, capabilities: Tuple[str, ...]) -> _SpecTemplate:
+    key = (root_readonly, capabilities)
+    tpl = _spec_templates.get(key)
+    if tpl is None:
+        with _spec_templates_lock:
+            tpl = _spec_templates.get(key)
+            if tpl is None:
+                tpl = _SpecTemplate(
+                    head='{"ociVersion": "1.1.0", "process": {"terminal": false, "cwd": ',
+                    caps=(', "capabilities": ' + json.dumps({"bounding": list(capabilities)})
+                          + '}, "root": ' + json.dumps({"path": "rootfs", "readonly": root_readonly})
+                          + ', "hostname": '),
+                    mounts=', "mounts": ' + json.dumps(DEFAULT_SPEC_MOUNTS) + ', "linux": {"namespaces": ',
+                )
+                _spec_templates[key] = tpl
+    return tpl
+
+
+def _linux_resources(resources) -> dict:
+    if resources is None:
+        return {}
+    if hasattr(resources, "to_linux_resources_dict"):
+        return resources.to_linux_resources_dict() or {}    # ResourceSpec -> dict
+    if isinstance(resources, dict):
+        return resources
+    raise TypeError("resources must be ResourceSpec or dict")
+
+
+def _spec_namespaces(namespaces: Optional[List[Dict]]) -> List[Dict]:
+    out = []
+    for ns in namespaces or []:
+        entry = {"type": ns["type"]}
+        if ns.get("path"):
+            entry["path"] = ns["path"]
+        out.append(entry)
+    return out
+
+
 class OciSpecBuilder:
-    @log_to_file(logger)
+    """
+    Builds the OCI runtime spec as containerd's spec Any.
+
+    The invariant parts (capabilities, root, default mounts) are serialized once per
+    (root_readonly, capability set) and cached; build() only encodes the per-container
+    fields (cwd, args, env, hostname, namespaces, resources) and splices them in.
+    build_dict() produces the same spec as a plain dict (reference / debugging).
+    """
+
     def __init__(self, hostname: Optional[str] = None):
         self.hostname = hostname or ""
 
-    @log_to_file(logger)
-    def build(self,
-              process_args: List[str],
-              env: Optional[Dict[str, str]] = None,
-              namespaces: Optional[List[Dict]] = None,
-              resources: Union[dict, "ResourceSpec"]= None,
-              cwd: str = "/",
-              root_readonly: bool = False) -> any_pb2.Any:
-        if hasattr(resources, "to_linux_resources_dict"):
-            linux_res = resources.to_linux_resources_dict()           # ResourceSpec -> dict
-        elif isinstance(resources, dict):
-            linux_res = resources
-        else:
-            raise TypeError("resources must be ResourceSpec or dict")
-
-        default_env = {
-            "PATH": "/usr/local/sbin:/usr/local/bin:/usr/sbin:/usr/bin:/sbin:/bin"
-        }
-        merged_env = dict(default_env)
+    @staticmethod
+    def _env_list(env: Optional[Dict[str, str]]) -> List[str]:
+        merged_env = {"PATH": DEFAULT_PATH_ENV}
         if env:
             merged_env.update(env)
-
-        spec = {
+        return [f"{k}={v}" for k, v in merged_env.items()]
+
+    def build_dict(self,
+                   process_args: List[str],
+                   env: Optional[Dict[str, str]] = None,
+                   namespaces: Optional[List[Dict]] = None,
+                   resources: Union[dict, "ResourceSpec"] = None,
+                   cwd: str = "/",
+                   root_readonly: bool = False,
+                   capabilities: Tuple[str, ...] = DEFAULT_CAPABILITIES) -> dict:
+        return {
             "ociVersion": "1.1.0",
             "process": {
                 "terminal": False,
                 "cwd": cwd,
                 "args": process_args,
-                "env": [f"{k}={v}" for k, v in merged_env.items()],
-                "capabilities": {
-                    "bounding": [
-                        "CAP_CHOWN","CAP_DAC_OVERRIDE","CAP_FSETID","CAP_FOWNER","CAP_MKNOD",
-                        "CAP_NET_RAW","CAP_SETGID","CAP_SETUID","CAP_SETFCAP","CAP_SETPCAP",
-                        "CAP_NET_BIND_SERVICE","CAP_SYS_CHROOT","CAP_KILL","CAP_AUDIT_WRITE"
-                    ]
-                }
+                "env": self._env_list(env),
+                "capabilities": {"bounding": list(capabilities)},
             },
             "root": {"path": "rootfs", "readonly": root_readonly},
             "hostname": self.hostname,
-            "mounts": [
-                {"destination": "/proc", "type": "proc", "source": "proc"},
-                {"destination": "/dev", "type": "tmpfs", "source": "tmpfs",
-                 "options": ["nosuid","strictatime","mode=755","size=65536k"]},
-                {"destination": "/dev/pts", "type": "devpts", "source": "devpts",
-                 "options": ["nosuid","noexec","newinstance","ptmxmode=0666","mode=0620","gid=5"]},
-                {"destination": "/dev/shm", "type": "tmpfs", "source": "shm",
-                 "options": ["nosuid","noexec","nodev","mode=1777","size=65536k"]},
-                {"destination": "/sys", "type": "sysfs", "source": "sysfs",
-                 "options": ["nosuid","noexec","nodev","ro"]},
-                {"destination": "/sys/fs/cgroup", "type": "cgroup", "source": "cgroup",
-                 "options": ["nosuid","noexec","nodev","relatime","ro"]},
-            ],
+            "mounts": [dict(m) for m in DEFAULT_SPEC_MOUNTS],
             "linux": {
-                "namespaces": [],
-                "resources": {}
-            }
+                "namespaces": _spec_namespaces(namespaces),
+                "resources": dict(_linux_resources(resources)),
+            },
         }
 
-        if namespaces:
-            for ns in namespaces:
-                entry = {"type": ns["type"]}
-                if ns.get("path"):
-                    entry["path"] = ns["path"]
-                spec["linux"]["namespaces"].append(entry)
-
-        if resources:
-            res = resources.to_linux_resources_dict()
-            if res:
-                spec["linux"]["resources"].update(res)
+    def build_json(self,
+                   process_args: List[str],
+                   env: Optional[Dict[str, str]] = None,
+                   namespaces: Optional[List[Dict]] = None,
+                   resources: Union[dict, "ResourceSpec"] = None,
+                   cwd: str = "/",
+                   root_readonly: bool = False,
+                   capabilities: Tuple[str, ...] = DEFAULT_CAPABILITIES) -> bytes:
+        tpl = _spec_template(root_readonly, tuple(capabilities))
+        return "".join((
+            tpl.head, json.dumps(cwd),
+            ', "args": ', json.dumps(process_args),
+            ', "env": ', json.dumps(self._env_list(env)),
+            tpl.caps, json.dumps(self.hostname),
+            tpl.mounts, json.dumps(_spec_namespaces(namespaces)),
+            ', "resources": ', json.dumps(_linux_resources(resources)), "}}",
+        )).encode("utf-8")
 
+    def build(self,
+              process_args: List[str],
+              env: Optional[Dict[str, str]] = None,
+              namespaces: Optional[List[Dict]] = None,
+              resources: Union[dict, "ResourceSpec"]= None,
+              cwd: str = "/",
+              root_readonly: bool = False,
+              capabilities: Tuple[str, ...] = DEFAULT_CAPABILITIES) -> any_pb2.Any:
         a = any_pb2.Any()
         a.type_url = OCI_SPEC_TYPEURL
-        a.value = json.dumps(spec).encode("utf-8")
+        a.value = self.build_json(process_args, env, namespaces, resources, cwd, root_readonly, capabilities)
         return a
 
 # ========== CNI Manager ==========
@@ -593,7 +807,6 @@ class CniManager:
         self.cnitool = which("cnitool")
 
     # ----- shared env for CNI calls -----
-    @log_to_file(logger)
     def _base_env(self, container_id: str, netns_path: str, ifname: str, extra_env: dict | None = None):
         env = os.environ.copy()
         env.update({
@@ -669,7 +882,6 @@ class CniManager:
         )
 
     # ======== plugin execution helpers (fallback path) ========
-    @log_to_file(logger)
     def _plugin_bin(self, plugin_type: str) -> str:
         path = os.path.join(self.cni_bin_dir, plugin_type)
         if not os.path.exists(path):
@@ -725,6 +937,7 @@ class CniManager:
 
     # ---------- Public API ----------
     @log_to_file(logger)
+    @timed("cni_add")
     def add(self, network_name: str, container_id: str, netns_path: str, ifname: str = DEFAULT_IFNAME,
             timeout: int = 20) -> dict:
         env = self._base_env(container_id, netns_path, ifname)
@@ -733,6 +946,7 @@ class CniManager:
         return self._direct_add_first_plugin(network_name, container_id, netns_path, ifname, timeout)
 
     @log_to_file(logger)
+    @timed("cni_del")
     def delete(self, network_name: str, container_id: str, netns_path: str, ifname: str = DEFAULT_IFNAME,
                timeout: int = 20):
         env = self._base_env(container_id, netns_path, ifname)
@@ -761,7 +975,6 @@ class RuntimeManager:
         self.c = client
         self.snapshots = snapshot_mgr
 
-    @log_to_file(logger)
     def _any_to_dict(self, a: any_pb2.Any) -> dict:
         """
         Decode an Any (we store the OCI spec here) into a dict when possible.
@@ -775,8 +988,10 @@ class RuntimeManager:
             return {}
 
     @log_to_file(logger)
+    @timed("container_create")
     def create_container(self, cid: str, image_ref: str, spec_any: any_pb2.Any,
-                         labels: Optional[Dict[str, str]] = None):
+                         labels: Optional[Dict[str, str]] = None, snapshot_key: str = ""):
+        # snapshot_key makes the container the GC owner of its rootfs snapshot
         self.c.containers.Create(
             containers_pb2.CreateContainerRequest(
                 container=containers_pb2.Container(
@@ -785,12 +1000,14 @@ class RuntimeManager:
                     labels=labels or {},
                     spec=spec_any,
                     runtime=containers_pb2.Container.Runtime(name="io.containerd.runc.v2"),
-                    snapshotter=self.snapshots._snapshotter_value_cache or DEFAULT_SNAPSHOTTER or "overlayfs",
+                    snapshotter=self.snapshots.snapshotter(),
+                    snapshot_key=snapshot_key,
                 )
             )
         )
 
     @log_to_file(logger)
+    @timed("task_start")
     def start_task(self, cid: str, mounts, tty: bool = False, create_timeout=15.0, start_timeout=30.0) -> int:
         create_req = tasks_pb2.CreateTaskRequest(
             container_id=cid,
@@ -836,7 +1053,7 @@ class RuntimeManager:
             pass
 
     @log_to_file(logger)
-    def get_container_info(self, cid: str) -> Dict:
+    def get_container_info(self, cid: str, include_spec: bool = True) -> Dict:
         """
         Return merged info about a container and its (optional) task.
         - From Containers API: image, labels, runtime, snapshotter, OCI spec
@@ -855,7 +1072,7 @@ class RuntimeManager:
                 "labels": dict(c.labels),
                 "runtime": c.runtime.name if c.runtime and c.runtime.name else "",
                 "snapshotter": c.snapshotter,
-                "spec": self._any_to_dict(c.spec),
+                "spec": self._any_to_dict(c.spec) if include_spec else {},
             })
         except grpc.RpcError as e:
             # Not found or another error — return minimal info
@@ -898,6 +1115,23 @@ class RuntimeManager:
 
         return info
 
+    @log_to_file(logger)
+    def list_containers(self, filters: Optional[List[str]] = None) -> List:
+        """Containers.List with server-side filters, e.g. ['labels.role==pause', 'labels.app']."""
+        return list(self.c.containers.List(containers_pb2.ListContainersRequest(filters=filters or [])).containers)
+
+    @log_to_file(logger)
+    def list_tasks(self) -> Dict[str, Dict]:
+        """All tasks in the namespace in one call: cid -> {pid, status, exit_status}."""
+        out: Dict[str, Dict] = {}
+        for p in self.c.tasks.List(tasks_pb2.ListTasksRequest()).tasks:
+            out[p.container_id] = {
+                "pid": p.pid,
+                "status": task_types_pb2.Status.Name(p.status).lower(),
+                "exit_status": p.exit_status if p.status == task_types_pb2.STOPPED else None,
+            }
+        return out
+
 # ========== Pod Manager ==========
 class PodManager:
     @log_to_file(logger)
@@ -907,54 +1141,126 @@ class PodManager:
         self.snaps = SnapshotManager(client)
         self.runtime = RuntimeManager(client, self.snaps)
         self.cni = CniManager()
+        self.gc = ImageGC(self)
 
     @log_to_file(logger)
-    def _ensure_unpacked(self, image: str):
+    @timed("image_ensure")
+    def _ensure_unpacked(self, image: str,
+                         progress_cb: Optional[Callable[[PullProgress], None]] = None) -> Tuple[str, dict]:
         """
         Ensure blobs exist in content store and unpack chain into snapshots.
+        Returns (top chain ID, image config) so callers don't re-resolve the image.
+
+        Warm images return straight away. Cold ones go through a node-wide single-flight
+        keyed by manifest digest (or the ref, if containerd has never seen the image):
+        one task per node pulls and unpacks, concurrent tasks in this process get its
+        result, and tasks in other worker processes wait for the node lock and then find
+        the chain committed.
+        """
+        snapshotter = self._snapshotter_name()
+        try:
+            manifest_desc = self.images.resolve_manifest(image)
+        except RuntimeError:
+            if PULL_ENGINE != "transfer":
+                raise
+            manifest_desc = None
+
+        if manifest_desc is not None:
+            _, cfg = self.images.load_manifest_and_config(manifest_desc)
+            diff_ids = (cfg.get("rootfs") or {}).get("diff_ids", [])
+            if diff_ids and self.snaps.chain_committed(snapshotter, _compute_chain_id(diff_ids)):
+                return _compute_chain_id(diff_ids), cfg
+            key = manifest_desc.digest
+        else:
+            key = f"ref:{image}"
+
+        result = get_single_flight().do(
+            f"{self.c.namespace}-{snapshotter}-{key}",
+            lambda: self._pull_and_unpack(image, progress_cb),
+            timeout=SINGLE_FLIGHT_TIMEOUT,
+        )
+        # a cold pull is what fills the disk: check the image GC watermark
+        self.gc.maybe_collect_async()
+        return result
+
+    @log_to_file(logger)
+    def _pull_and_unpack(self, image: str,
+                         progress_cb: Optional[Callable[[PullProgress], None]] = None) -> Tuple[str, dict]:
+        """
+        Cold path of _ensure_unpacked; runs as the single-flight leader for the image.
 
         Flow:
           - resolve manifest for requested ref
-          - if any layer blob missing, CRI PullImage(image)
-          - ask CRI for manifest digest via ImageStatus; re-resolve via digest
-          - re-check blobs (with a tiny retry), then grpc_unpack
+          - if the top chain ID is already committed (chain index / one Stat), stop here
+          - if any layer blob missing, pull via the Transfer service (unpacks while
+            downloading, reports progress to progress_cb); if containerd has no Transfer
+            service, or PULL_ENGINE=cri, CRI PullImage(image) + ImageStatus for the digest
+          - re-resolve, re-check blobs (with a tiny retry), then grpc_unpack
         """
 
-        @log_to_file(logger)
         def _layers_from_manifest(m: dict) -> list[str]:
             return [l["digest"] for l in (m.get("layers") or [])]
 
+        snapshotter = self._snapshotter_name()
+
         # 1) Resolve current manifest+config for the tag/ref we were given
-        manifest_desc = self.images.resolve_manifest(image)
-        manifest, cfg = self.images.load_manifest_and_config(manifest_desc)
-        layer_digests = _layers_from_manifest(manifest)
+        try:
+            manifest_desc = self.images.resolve_manifest(image)
+        except RuntimeError:
+            if PULL_ENGINE != "transfer":
+                raise
+            # image record not in containerd at all: the Transfer service can pull it from scratch
+            manifest_desc = None
+
+        if manifest_desc is not None:
+            manifest, cfg = self.images.load_manifest_and_config(manifest_desc)
+            layer_digests = _layers_from_manifest(manifest)
+
+            # Warm image: the whole chain is already unpacked, nothing else to check
+            diff_ids = (cfg.get("rootfs") or {}).get("diff_ids", [])
+            if diff_ids:
+                top_chain = _compute_chain_id(diff_ids)
+                if self.snaps.chain_committed(snapshotter, top_chain):
+                    return top_chain, cfg
+
+            with span("blob_check"):
+                missing = [dg for dg in layer_digests if not _blob_exists(self.c.content, dg)]
+        else:
+            missing = [image]
 
-        missing = [dg for dg in layer_digests if not _blob_exists(self.c.content, dg)]
         if missing:
-            print("ℹ️  Some blobs missing in content store; invoking CRI pull...")
-            cri = _CRIImageClient(
-                socket_target=os.environ.get("CRI_SOCKET", "/run/containerd/containerd.sock")
-                # You can also reuse your CONTAINERD_SOCKET env/config here; the normalizer handles both.
-            )
-            pulled_ref = cri.pull(image)  # digest-like ref, e.g., 'sha256:07ccdb...'
-            if not pulled_ref:
-                raise RuntimeError(f"CRI PullImage failed; missing blobs start with: {missing[0]}")
-
-            # 2) Ask CRI what manifest digest it actually resolved (more authoritative than the tag)
-            digest_ref = cri.image_status(pulled_ref) or pulled_ref
-
-            # 3) Re-resolve manifest using the digest ref (then fall back to original if needed)
-            last_err = None
-            for ref in (digest_ref, pulled_ref, image):
+            digest_ref = None
+            if PULL_ENGINE == "transfer":
                 try:
-                    manifest_desc = self.images.resolve_manifest(ref)
+                    print("ℹ️  Some blobs missing in content store; pulling via Transfer service...")
+                    with span("transfer_pull"):
+                        TransferPuller(self.c, snapshotter, PLATFORM_OS, PLATFORM_ARCH).pull(
+                            image, progress_cb=progress_cb)
+                    manifest_desc = self.images.resolve_manifest(image)
                     manifest, cfg = self.images.load_manifest_and_config(manifest_desc)
                     layer_digests = _layers_from_manifest(manifest)
-                    break
-                except Exception as e:
-                    last_err = e
-            else:
-                raise RuntimeError(f"After CRI pull, failed to resolve manifest: {last_err}")
+                    digest_ref = manifest_desc.digest
+                    # the transfer unpacked into our snapshotter; usually nothing is left to do
+                    diff_ids = (cfg.get("rootfs") or {}).get("diff_ids", [])
+                    if diff_ids and self.snaps.chain_committed(snapshotter, _compute_chain_id(diff_ids)):
+                        return _compute_chain_id(diff_ids), cfg
+                except TransferUnavailable as e:
+                    print(f"ℹ️  {e}; falling back to CRI pull")
+
+            if digest_ref is None:
+                pulled_ref, digest_ref = self._cri_pull(image, missing)
+                # 3) Re-resolve manifest using the digest ref (then fall back to original if needed)
+                last_err = None
+                for ref in (digest_ref, pulled_ref, image):
+                    try:
+                        manifest_desc = self.images.resolve_manifest(ref)
+                        manifest, cfg = self.images.load_manifest_and_config(manifest_desc)
+                        layer_digests = _layers_from_manifest(manifest)
+                        break
+                    except Exception as e:
+                        last_err = e
+                else:
+                    raise RuntimeError(f"After CRI pull, failed to resolve manifest: {last_err}")
 
             # 4) Re-check presence with a short backoff to avoid tiny commit races
             still_missing = [dg for dg in layer_digests if
@@ -963,9 +1269,9 @@ class PodManager:
                 ns = NAMESPACE
                 example = still_missing[0]
                 raise RuntimeError(
-                    "Content still missing after CRI pull.\n"
+                    "Content still missing after pull.\n"
                     f"- Namespace: {ns}\n"
-                    f"- CRI manifest: {digest_ref}\n"
+                    f"- Manifest: {digest_ref}\n"
                     f"- Example missing digest: {example}\n"
                     "Checks:\n"
                     "  • Ensure your gRPC calls use the same namespace as CRI (usually k8s.io).\n"
@@ -975,24 +1281,66 @@ class PodManager:
                 )
 
         # 5) Unpack into the snapshotter you discovered
-        self.snaps.grpc_unpack(
-            image, manifest, cfg,
-            self.snaps._snapshotter_value_cache or DEFAULT_SNAPSHOTTER or "overlayfs"
+        top_chain = self.snaps.grpc_unpack(image, manifest, cfg, snapshotter)
+        return top_chain, cfg
+
+    @log_to_file(logger)
+    @timed("cri_pull")
+    def _cri_pull(self, image: str, missing: List[str]) -> Tuple[str, str]:
+        """
+        Blocking CRI PullImage; returns (pulled ref, manifest digest CRI resolved).
+        The digest is more authoritative than the tag; it falls back to the pulled ref.
+        """
+        print("ℹ️  Some blobs missing in content store; invoking CRI pull...")
+        cri = _CRIImageClient(
+            socket_target=os.environ.get("CRI_SOCKET", "/run/containerd/containerd.sock")
+            # You can also reuse your CONTAINERD_SOCKET env/config here; the normalizer handles both.
         )
+        pulled_ref = cri.pull(image)  # digest-like ref, e.g., 'sha256:07ccdb...'
+        if not pulled_ref:
+            raise RuntimeError(f"CRI PullImage failed; missing blobs start with: {missing[0]}")
+        return pulled_ref, cri.image_status(pulled_ref) or pulled_ref
+
+    @log_to_file(logger)
+    def _prepare_rootfs(self, image: str, key_hint: str,
+                        progress_cb: Optional[Callable[[PullProgress], None]] = None,
+                        lease: Optional[str] = None) -> Tuple[List, str, dict]:
+        """
+        Unpack (if needed) and prepare a writable rootfs on top of the image chain,
+        under `lease` if given (see SnapshotManager.lease).
+        If the chain index was stale (parent GC'd/removed behind our back), drop the
+        entry, unpack again and retry once.
+        """
+        chain_id, cfg = self._ensure_unpacked(image, progress_cb)
+        try:
+            mounts, snap_key = self.snaps.prepare_rw_snapshot(chain_id, key_hint, lease=lease)
+        except RuntimeError:
+            snapshotter = self._snapshotter_name()
+            self.snaps.chains.discard(self.c.namespace, snapshotter, chain_id)
+            if self.snaps._snap_stat_exists(snapshotter, chain_id):
+                raise
+            chain_id, cfg = self._ensure_unpacked(image, progress_cb)
+            mounts, snap_key = self.snaps.prepare_rw_snapshot(chain_id, key_hint, lease=lease)
+        self.gc.touch(image)  # LRU order for image_gc
+        return mounts, snap_key, cfg
 
     @log_to_file(logger)
     def create_pod(self, name: str, pause_image: str = "registry.k8s.io/pause:3.9",
                    resources: Optional[ResourceSpec] = None,
                    cni_network: str = DEFAULT_CNI_NET_NAME,
-                   cni_ifname: str = DEFAULT_IFNAME) -> Dict:
+                   cni_ifname: str = DEFAULT_IFNAME,
+                   progress_cb: Optional[Callable[[PullProgress], None]] = None) -> Dict:
         print(f"Using platform: {PLATFORM_OS}/{PLATFORM_ARCH}")
-        self._ensure_unpacked(pause_image)
-
-        chain_id = self.images.chain_id_for_image(pause_image)
-        mounts, snap_key = self.snaps.prepare_rw_snapshot(chain_id, f"{name}-pause-rootfs")
-
-        mdesc = self.images.resolve_manifest(pause_image)
-        _, cfg = self.images.load_manifest_and_config(mdesc)
+        with self.snaps.lease(f"pod-{name}") as lease:
+            rootfs = self._prepare_rootfs(pause_image, f"{name}-pause-rootfs", progress_cb, lease)
+            pod = self._start_sandbox(name, pause_image, rootfs, resources)
+        self._attach_cni(pod, cni_network, cni_ifname)
+        return pod
+
+    def _start_sandbox(self, name: str, pause_image: str, rootfs: Tuple[List, str, dict],
+                       resources: Optional[ResourceSpec] = None) -> Dict:
+        """Create + start the pause container on a prepared rootfs; returns the pod dict (no CNI yet)."""
+        mounts, snap_key, cfg = rootfs
         args_cfg = list((cfg.get("config") or {}).get("Entrypoint") or [])
         args_cfg += list((cfg.get("config") or {}).get("Cmd") or [])
         args = args_cfg or ["/pause"]
@@ -1011,43 +1359,56 @@ class PodManager:
             resources=resources,
         )
         cid = f"{name}"
-        self.runtime.create_container(cid, pause_image, spec_any, labels={"pod": name, "role": "pause"})
+        self.runtime.create_container(cid, pause_image, spec_any,
+                                      labels={"pod": name, "role": "pause", MANAGED_LABEL: "true"},
+                                      snapshot_key=snap_key)
         pid = self.runtime.start_task(cid, mounts)
 
         ns_base = f"/proc/{pid}/ns"
         ns_paths = {k: f"{ns_base}/{k}" for k in ["pid", "net", "ipc", "uts"]}
         print(f"✅ Pause pod up: cid={cid}, pid={pid}")
+        emit(self.c.namespace, "sandbox_up", pod=name, cid=cid, pid=pid)
+        return {"name": name, "pause": {"cid": cid, "pid": pid}, "ns": ns_paths,
+                "cni": {}, "snapshot_key": snap_key}
 
+    def _attach_cni(self, pod: Dict, cni_network: str, cni_ifname: str) -> Dict:
         # Attach Calico via CNI (prefers cnitool, falls back to direct first-plugin exec)
+        cni_attached = False
         try:
-            cni_result = self.cni.add(network_name=cni_network, container_id=cid,
-                                      netns_path=ns_paths["net"], ifname=cni_ifname)
+            cni_result = self.cni.add(network_name=cni_network, container_id=pod["pause"]["cid"],
+                                      netns_path=pod["ns"]["net"], ifname=cni_ifname)
+            cni_attached = True
             print(f"🌐 CNI attached: {cni_result if isinstance(cni_result, dict) else 'ok'}")
+            emit(self.c.namespace, "cni_attached", pod=pod["name"], cid=pod["pause"]["cid"],
+                 network=cni_network, ip=_cni_ip(cni_result))
         except Exception as e:
             print(f"❗ CNI attach failed: {e}")
-
-        return {"name": name, "pause": {"cid": cid, "pid": pid}, "ns": ns_paths,
-                "cni": {"network": cni_network, "ifname": cni_ifname},
-                "snapshot_key": snap_key}
+            emit(self.c.namespace, "cni_failed", pod=pod["name"], cid=pod["pause"]["cid"],
+                 network=cni_network, error=e)
+        pod["cni"] = {"network": cni_network, "ifname": cni_ifname, "attached": cni_attached}
+        return pod
 
     @log_to_file(logger)
     def add_container(self, pod: Dict, name: str,
                       image: str,
                       args: Optional[List[str]] = None,
                       env: Optional[Dict[str, str]] = None,
-                      resources: Optional[ResourceSpec] = None) -> Dict:
-
+                      resources: Optional[ResourceSpec] = None,
+                      progress_cb: Optional[Callable[[PullProgress], None]] = None) -> Dict:
+        with self.snaps.lease(f"app-{pod['name']}-{name}") as lease:
+            rootfs = self._prepare_rootfs(image, f"{pod['name']}-{name}-rootfs", progress_cb, lease)
+            return self._start_app(pod, name, image, rootfs, args, env, resources)
+
+    def _start_app(self, pod: Dict, name: str, image: str, rootfs: Tuple[List, str, dict],
+                   args: Optional[List[str]] = None,
+                   env: Optional[Dict[str, str]] = None,
+                   resources: Optional[ResourceSpec] = None) -> Dict:
+        """Create + start an app container on a prepared rootfs, joined to the pod namespaces."""
         pod_name = pod["name"]
         pod_ns = pod["ns"]
-
-        self._ensure_unpacked(image)
-
-        chain_id = self.images.chain_id_for_image(image)
-        mounts, snap_key = self.snaps.prepare_rw_snapshot(chain_id, f"{pod_name}-{name}-rootfs")
+        mounts, snap_key, cfg = rootfs
 
         if args is None:
-            mdesc = self.images.resolve_manifest(image)
-            _, cfg = self.images.load_manifest_and_config(mdesc)
             args = list((cfg.get("config") or {}).get("Entrypoint") or [])
             args += list((cfg.get("config") or {}).get("Cmd") or [])
             if not args:
@@ -1068,13 +1429,17 @@ class PodManager:
             resources=resources
         )
         cid = f"{pod_name}-{name}"
-        self.runtime.create_container(cid, image, spec_any, labels={"pod": pod_name, "app": name})
+        self.runtime.create_container(cid, image, spec_any,
+                                      labels={"pod": pod_name, "app": name, MANAGED_LABEL: "true"},
+                                      snapshot_key=snap_key)
         pid = self.runtime.start_task(cid, mounts)
         print(f"🚀 App started: cid={cid}, pid={pid}, image={image}")
+        emit(self.c.namespace, "container_started", pod=pod_name, container=name, cid=cid, pid=pid, image=image)
         return {"cid": cid, "pid": pid, "snapshot_key": snap_key}
 
     @log_to_file(logger)
-    def add_containers(self, pod: Dict, specs: List[ContainerSpec]) -> Dict[str, Dict]:
+    def add_containers(self, pod: Dict, specs: List[ContainerSpec],
+                       progress_cb: Optional[Callable[[PullProgress], None]] = None) -> Dict[str, Dict]:
         """
         Launch multiple containers (apps/sidecars) into the same pod namespaces.
         Returns a dict: { <name>: {"cid":..., "pid":..., "snapshot_key":...}, ... }
@@ -1087,47 +1452,137 @@ class PodManager:
                 image=spec.image,
                 args=spec.args,
                 env=spec.env,
-                resources=spec.resources
+                resources=spec.resources,
+                progress_cb=progress_cb
             )
             results[spec.name] = res
         return results
 
     @log_to_file(logger)
+    def create_pod_dag(self, name: str, specs: List[ContainerSpec],
+                       pause_image: str = "registry.k8s.io/pause:3.9",
+                       resources: Optional[ResourceSpec] = None,
+                       cni_network: str = DEFAULT_CNI_NET_NAME,
+                       cni_ifname: str = DEFAULT_IFNAME,
+                       progress_cb: Optional[Callable[[PullProgress], None]] = None,
+                       pod: Optional[Dict] = None,
+                       max_workers: int = POD_DAG_WORKERS) -> Dict:
+        """
+        create_pod + add_containers as a dependency graph:
+
+            pause-rootfs -> sandbox -> cni --+
+            rootfs:<app> --------------------+--> app:<app>   (one chain per container)
+
+        App image pull/unpack overlaps sandbox start and CNI ADD; containers start in
+        parallel once the pod network is up. Pass `pod` (e.g. a claimed warm sandbox)
+        to skip the sandbox stages. On failure everything created so far is removed,
+        including a claimed warm sandbox (it is labelled claimed and would never be reused).
+        Returns {"pod", "apps", "timings"}.
+        """
+        with span("pod_create"), self.snaps.lease(f"pod-{name}") as lease:
+            dag = PodDag(max_workers=max_workers)
+            if pod is None:
+                dag.add("pause-rootfs", lambda r: self._prepare_rootfs(pause_image, f"{name}-pause-rootfs",
+                                                                       progress_cb, lease))
+                dag.add("sandbox", lambda r: self._start_sandbox(name, pause_image, r["pause-rootfs"], resources),
+                        deps=["pause-rootfs"])
+                dag.add("cni", lambda r: self._attach_cni(r["sandbox"], cni_network, cni_ifname), deps=["sandbox"])
+            else:
+                dag.add("cni", lambda r: pod)
+            pod_name = pod["name"] if pod is not None else name
+
+            for spec in specs:
+                dag.add(f"rootfs:{spec.name}",
+                        lambda r, s=spec: self._prepare_rootfs(s.image, f"{pod_name}-{s.name}-rootfs",
+                                                               progress_cb, lease))
+                dag.add(f"app:{spec.name}",
+                        lambda r, s=spec: self._start_app(r["cni"], s.name, s.image, r[f"rootfs:{s.name}"],
+                                                          s.args, s.env, s.resources),
+                        deps=["cni", f"rootfs:{spec.name}"])
+
+            try:
+                results = dag.run()
+            except StageFailed as e:
+                self._cleanup_partial(e.results, owns_pod=pod is None or bool(pod.get("warm")))
+                raise RuntimeError(f"pod {pod_name}: {e}") from e.error
+
+        return {"pod": results["cni"],
+                "apps": {spec.name: results[f"app:{spec.name}"] for spec in specs},
+                "timings": dag.timings()}
+
+    def _cleanup_partial(self, results: Dict, owns_pod: bool) -> None:
+        """Undo what a failed create_pod_dag managed to create, in one teardown pass."""
+        started = {k.split(":", 1)[1] for k in results if k.startswith("app:")}
+        apps: List[Dict] = []
+        for key, value in results.items():
+            if key.startswith("app:"):
+                apps.append(value)
+            elif key.startswith("rootfs:") and key.split(":", 1)[1] not in started:
+                apps.append({"snapshot_key": value[1]})  # prepared but never started
+        pod = (results.get("cni") or results.get("sandbox")) if owns_pod else None
+        if owns_pod and pod is None and "pause-rootfs" in results:
+            apps.append({"snapshot_key": results["pause-rootfs"][1]})
+        if pod is not None or apps:
+            self.delete_pods([(pod, apps)])
+
+    @log_to_file(logger)
+    def inventory(self, pod_name: Optional[str] = None) -> Dict:
+        """
+        Every pod (pause + apps) on this node with pids and task status, in three RPCs:
+        Containers.List for pause and app containers (label filters), then one Tasks.List.
+        """
+        pod_sel = f',labels.pod=="{pod_name}"' if pod_name else ""
+        pauses = self.runtime.list_containers([f'labels.role=="pause"{pod_sel}'])
+        apps = self.runtime.list_containers([f'labels.app{pod_sel}'])
+        tasks = self.runtime.list_tasks()
+        no_task = {"pid": None, "status": "no-task", "exit_status": None}
+
+        def _entry(c) -> Dict:
+            return {"cid": c.id, "image": c.image, **tasks.get(c.id, no_task)}
+
+        pods: Dict[str, Dict] = {}
+        for c in pauses:
+            pods.setdefault(c.labels.get("pod", c.id), {"pause": None, "apps": {}})["pause"] = _entry(c)
+        for c in apps:
+            pod = pods.setdefault(c.labels.get("pod", ""), {"pause": None, "apps": {}})
+            pod["apps"][c.labels.get("app", c.id)] = _entry(c)
+        return {
+            "namespace": self.c.namespace,
+            "pods": pods,
+            "counts": {
+                "pods": len(pods),
+                "apps": len(apps),
+                "running": sum(1 for c in list(pauses) + list(apps)
+                               if tasks.get(c.id, no_task)["status"] == "running"),
+            },
+        }
+
     def _snapshotter_name(self) -> str:
-        return self.snaps._snapshotter_value_cache or DEFAULT_SNAPSHOTTER or "overlayfs"
+        return self.snaps.snapshotter()
+
+    def _teardown(self, grace: Optional[float] = None):
+        from utils.containerd.teardown import TeardownEngine
+        return TeardownEngine(self, grace=grace)
 
     @log_to_file(logger)
-    def delete_container(self, app: Dict) -> None:
+    def delete_container(self, app: Dict, grace: Optional[float] = None) -> Dict:
         """
-        Delete an app container:
-          - stop & delete task
-          - delete container object
-          - remove active snapshot key
+        Delete an app container: TERM (KILL after grace), delete task + container object,
+        remove its active snapshot key.
         Expected app dict shape: {"cid": ..., "pid": ..., "snapshot_key": ...}
         """
-        cid = app.get("cid")
-        snap_key = app.get("snapshot_key")
-        if not cid:
+        if not app.get("cid"):
             print("[cleanup] app has no 'cid'; skipping task/container delete")
-        else:
-            print(f"[cleanup] stopping app container: {cid}")
-            self.runtime.stop_and_delete_task(cid)
-
-        if snap_key:
-            try:
-                self.snaps._snap_remove_active(self._snapshotter_name(), snap_key)
-                print(f"[cleanup] removed snapshot key: {snap_key}")
-            except Exception as e:
-                print(f"[cleanup] snapshot remove warning ({snap_key}): {e}")
+        return self._teardown(grace).teardown([(None, [app])])
 
     @log_to_file(logger)
-    def delete_pod(self, pod: Dict, apps: Optional[List[Dict]] = None) -> None:
+    def delete_pod(self, pod: Dict, apps: Optional[List[Dict]] = None, grace: Optional[float] = None) -> Dict:
         """
-        Delete a pod and release its Calico IP:
-          - delete app containers first (if provided)
+        Delete a pod and release its Calico IP (see teardown.py):
+          - TERM all app containers at once, KILL whatever outlives the grace deadline
           - CNI DEL on the pause netns (while it still exists)
           - stop & delete the pause task/container
-          - remove pause snapshot key (if stored), otherwise skip
+          - remove app + pause snapshot keys in one batch
 
         Expected pod dict shape (from create_pod):
           {
@@ -1138,46 +1593,17 @@ class PodManager:
             "snapshot_key": <pause_snapshot_key>
           }
         """
-        # 1) Delete app containers first (so they don’t keep file descriptors in the pod ns)
-        if apps:
-            for app in apps:
-                self.delete_container(app)
-
-        # 2) CNI DEL for the pod (pause) while netns still exists
-        pause = (pod or {}).get("pause", {})
-        pod_ns = (pod or {}).get("ns", {})
-        cni_cfg = (pod or {}).get("cni", {})
-
-        pause_cid = pause.get("cid")
-        netns_path = pod_ns.get("net")
-        network_name = cni_cfg.get("network", DEFAULT_CNI_NET_NAME)
-        ifname = cni_cfg.get("ifname", DEFAULT_IFNAME)
-
-        if pause_cid and network_name:
-            # Best-effort: if /proc/<pid>/ns/net is gone, try empty NETNS (some plugins accept it)
-            netns_for_del = netns_path if (netns_path and os.path.exists(netns_path)) else ""
-            try:
-                print(f"[cleanup] CNI DEL network={network_name}, ifname={ifname}, netns={'present' if netns_for_del else 'missing'}")
-                self.cni.delete(network_name=network_name, container_id=pause_cid, netns_path=netns_for_del, ifname=ifname)
-                print("[cleanup] CNI released")
-            except Exception as e:
-                print(f"[cleanup] CNI DEL warning: {e}")
-        else:
-            print("[cleanup] skip CNI DEL (missing pause cid or network name)")
+        return self._teardown(grace).teardown([(pod, apps)])
 
-        # 3) Stop & delete the pause task/container
-        if pause_cid:
-            print(f"[cleanup] stopping pause container: {pause_cid}")
-            self.runtime.stop_and_delete_task(pause_cid)
+    @log_to_file(logger)
+    def delete_pods(self, targets: List[Tuple[Dict, Optional[List[Dict]]]], grace: Optional[float] = None) -> Dict:
+        """Delete many (pod, apps) at once under one shared grace deadline."""
+        return self._teardown(grace).teardown(targets)
 
-        # 4) Remove the pause snapshot key (stored as pod['snapshot_key'])
-        snap_key = pod.get("snapshot_key")
-        if snap_key:
-            try:
-                self.snaps._snap_remove_active(self._snapshotter_name(), snap_key)
-                print(f"[cleanup] removed pause snapshot key: {snap_key}")
-            except Exception as e:
-                print(f"[cleanup] pause snapshot remove warning ({snap_key}): {e}")
+    @log_to_file(logger)
+    def delete_by_labels(self, labels: Dict[str, str], grace: Optional[float] = None) -> Dict:
+        """Bulk delete every pod/container in this namespace matching all labels."""
+        return self._teardown(grace).delete_by_labels(labels)
 
 
 # -------------------- Demo / Example --------------------
@@ -2,7 +2,8 @@
 import grpc
 
 class _AddNamespaceInterceptor(grpc.UnaryUnaryClientInterceptor,
-                               grpc.UnaryStreamClientInterceptor):
+                               grpc.UnaryStreamClientInterceptor,
+                               grpc.StreamStreamClientInterceptor):
     def __init__(self, namespace: str, extra_md=None):
         self.namespace = namespace
         self.extra_md = extra_md or []
@@ -27,6 +28,36 @@ class _AddNamespaceInterceptor(grpc.UnaryUnaryClientInterceptor,
     def intercept_unary_stream(self, continuation, client_call_details, request):
         return continuation(self._inject(client_call_details), request)
 
+    # bidi streams (Streaming.Stream, used for Transfer progress)
+    def intercept_stream_stream(self, continuation, client_call_details, request_iterator):
+        return continuation(self._inject(client_call_details), request_iterator)
+
+
+class _AioAddNamespaceInterceptor(grpc.aio.UnaryUnaryClientInterceptor,
+                                  grpc.aio.UnaryStreamClientInterceptor,
+                                  grpc.aio.StreamStreamClientInterceptor):
+    """grpc.aio flavour of _AddNamespaceInterceptor (aio channels take interceptors at creation)."""
+
+    def __init__(self, namespace: str, extra_md=None):
+        self.namespace = namespace
+        self.extra_md = extra_md or []
+
+    def _inject(self, client_call_details):
+        md = grpc.aio.Metadata(*(client_call_details.metadata or ()))
+        md.add("containerd-namespace", self.namespace)
+        for k, v in self.extra_md:
+            md.add(k, v)
+        return client_call_details._replace(metadata=md)
+
+    async def intercept_unary_unary(self, continuation, client_call_details, request):
+        return await continuation(self._inject(client_call_details), request)
+
+    async def intercept_unary_stream(self, continuation, client_call_details, request):
+        return await continuation(self._inject(client_call_details), request)
+
+    async def intercept_stream_stream(self, continuation, client_call_details, request_iterator):
+        return await continuation(self._inject(client_call_details), request_iterator)
+
 
 def _with_namespace_md(details, md_to_add):
     metadata = []
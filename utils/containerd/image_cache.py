@@ -0,0 +1,169 @@
+"""
+image_cache.py
+Digest-keyed cache for parsed OCI image metadata (index, manifest and config blobs,
+plus the platform-selected manifest descriptor of an index).
+
+Content digests are immutable, so entries never need invalidation; the in-memory
+tier is a bounded LRU shared by every ImageResolver in the worker process and the
+optional on-disk tier lets new worker processes start warm. Values are copied in and
+out, so a caller mutating what it got (or put) can't corrupt the shared entry.
+
+Env:
+  CONTAINERD_IMAGE_CACHE_SIZE  max in-memory entries (default: 512)
+  CONTAINERD_IMAGE_CACHE_DIR   directory for the persistent tier (default: disabled)
+"""
+
+import os
+import json
+import threading
+import tempfile
+from collections import OrderedDict
+from typing import Optional, Dict
+
+from logpkg.log_kcld import LogKCld, log_to_file
+
+logger = LogKCld()
+
+IMAGE_CACHE_SIZE = int(os.environ.get("CONTAINERD_IMAGE_CACHE_SIZE", "512"))
+IMAGE_CACHE_DIR = os.environ.get("CONTAINERD_IMAGE_CACHE_DIR", "")
+
+
+def _clone(value):
+    """Deep copy of parsed JSON (dicts/lists of scalars); much cheaper than copy.deepcopy."""
+    if isinstance(value, dict):
+        return {k: _clone(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_clone(v) for v in value]
+    return value
+
+
+class ImageMetadataCache:
+    """
+    Thread-safe LRU of parsed JSON blobs keyed by digest.
+    Platform selections are keyed by (index digest, os, arch) and stored as plain
+    descriptor dicts ({"media_type", "digest", "size"}) so they can be persisted too.
+    """
+
+    @log_to_file(logger)
+    def __init__(self, max_entries: int = IMAGE_CACHE_SIZE, cache_dir: Optional[str] = IMAGE_CACHE_DIR or None):
+        self.max_entries = max(1, max_entries)
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    # ----- keys -----
+    @staticmethod
+    def _blob_key(digest: str) -> str:
+        return f"blob/{digest}"
+
+    @staticmethod
+    def _platform_key(index_digest: str, os_name: str, arch: str) -> str:
+        return f"platform/{index_digest}/{os_name}/{arch}"
+
+    # ----- in-memory tier -----
+    def _get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            val = self._entries.get(key)
+            if val is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return _clone(val)
+        val = self._disk_get(key)
+        with self._lock:
+            if val is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._put_locked(key, val)
+        return _clone(val)
+
+    def _put(self, key: str, value: dict) -> None:
+        value = _clone(value)
+        with self._lock:
+            self._put_locked(key, value)
+        self._disk_put(key, value)
+
+    def _put_locked(self, key: str, value: dict) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    # ----- persistent tier -----
+    def _disk_path(self, key: str) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        # 'blob/sha256:abc' -> <dir>/blob/sha256/abc.json
+        return os.path.join(self.cache_dir, *key.replace(":", "/").split("/")) + ".json"
+
+    def _disk_get(self, key: str) -> Optional[dict]:
+        path = self._disk_path(key)
+        if not path:
+            return None
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _disk_put(self, key: str, value: dict) -> None:
+        path = self._disk_path(key)
+        if not path or os.path.exists(path):
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # write-then-rename so concurrent workers never read a partial file
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(value, f)
+                os.replace(tmp, path)
+            except BaseException:
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+                raise
+        except (OSError, TypeError, ValueError) as e:
+            print(f"[image-cache] persist warning ({key}): {e}")
+
+    # ---------- Public API ----------
+    def get_blob(self, digest: str) -> Optional[dict]:
+        return self._get(self._blob_key(digest))
+
+    def put_blob(self, digest: str, doc: dict) -> None:
+        self._put(self._blob_key(digest), doc)
+
+    def get_platform_descriptor(self, index_digest: str, os_name: str, arch: str) -> Optional[dict]:
+        return self._get(self._platform_key(index_digest, os_name, arch))
+
+    def put_platform_descriptor(self, index_digest: str, os_name: str, arch: str, desc: dict) -> None:
+        self._put(self._platform_key(index_digest, os_name, arch), desc)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "max_entries": self.max_entries,
+                    "hits": self.hits, "misses": self.misses}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+_shared_cache: Optional[ImageMetadataCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_image_cache() -> ImageMetadataCache:
+    """Process-wide cache shared by all ImageResolver instances (and Celery tasks) in this worker."""
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_lock:
+            if _shared_cache is None:
+                _shared_cache = ImageMetadataCache()
+    return _shared_cache
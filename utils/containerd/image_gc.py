@@ -0,0 +1,244 @@
+"""
+image_gc.py
+Disk-budgeted LRU eviction of images and their committed chain snapshots.
+
+grpc_unpack labels every committed chain containerd.io/gc.root, so containerd's own GC
+never reclaims unpacked images; this module does it explicitly, per node:
+
+  - last use: PodManager touches an image every time a pod uses it, by stamping the
+    dibba.io/last-used label on the containerd image record (throttled per process),
+    so every worker process on the node sees the same LRU order
+  - pressure: statvfs of the snapshotter's root directory; when used space crosses the
+    high watermark, unreferenced images are evicted oldest-use first until the low
+    watermark is projected to be reached
+  - projection: each eviction frees the chain snapshots no remaining image shares,
+    measured with the Snapshots Usage API (statvfs lags until containerd finishes
+    removing them)
+  - referenced: an image used by any container (running or not) is never evicted;
+    neither is one touched within IMAGE_GC_MIN_AGE_SEC (pods being created right now)
+
+Only one process per node collects at a time (node lock). Content blobs are released
+with the image record and reclaimed by containerd's regular GC. The record is deleted
+only after all of its removable chains are gone, so a chain that can't be removed yet
+(busy, timeout) is still found through its image on the next run.
+
+Env:
+  IMAGE_GC_HIGH_PCT        start evicting above this disk usage percent (default: 85, 0 disables)
+  IMAGE_GC_LOW_PCT         evict down to this percent (default: 75)
+  IMAGE_GC_MIN_AGE_SEC     never evict images used more recently than this (default: 600)
+  IMAGE_GC_CHECK_SEC       min interval between watermark checks per process (default: 60)
+  CONTAINERD_ROOT          containerd root dir, for the snapshotter path (default: /var/lib/containerd)
+"""
+
+import os
+import time
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import grpc
+
+from generated.api.services.images.v1 import images_pb2
+from generated.api.services.snapshots.v1 import snapshots_pb2
+from google.protobuf import field_mask_pb2
+from utils.containerd.node_lock import node_lock
+from logpkg.log_kcld import LogKCld, log_to_file
+
+logger = LogKCld()
+
+IMAGE_GC_HIGH_PCT = float(os.environ.get("IMAGE_GC_HIGH_PCT", "85"))
+IMAGE_GC_LOW_PCT = float(os.environ.get("IMAGE_GC_LOW_PCT", "75"))
+IMAGE_GC_MIN_AGE_SEC = float(os.environ.get("IMAGE_GC_MIN_AGE_SEC", "600"))
+IMAGE_GC_CHECK_SEC = float(os.environ.get("IMAGE_GC_CHECK_SEC", "60"))
+CONTAINERD_ROOT = os.environ.get("CONTAINERD_ROOT", "/var/lib/containerd")
+
+LAST_USED_LABEL = "dibba.io/last-used"
+TOUCH_INTERVAL_SEC = 60.0
+
+
+@dataclass
+class ImageEntry:
+    name: str
+    last_used: float
+    chains: List[str] = field(default_factory=list)   # bottom -> top chain IDs
+    referenced: bool = False
+
+
+class ImageGC:
+    @log_to_file(logger)
+    def __init__(self, pods, high_pct: float = IMAGE_GC_HIGH_PCT, low_pct: float = IMAGE_GC_LOW_PCT,
+                 min_age: float = IMAGE_GC_MIN_AGE_SEC, root: Optional[str] = None):
+        self.pods = pods
+        self.c = pods.c
+        self.high_pct = high_pct
+        self.low_pct = min(low_pct, high_pct)
+        self.min_age = min_age
+        self.root = root
+        self._lock = threading.Lock()
+        self._touched: Dict[str, float] = {}
+        self._checked_at = 0.0
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.high_pct > 0
+
+    # ---------- last use ----------
+    def touch(self, image_ref: str) -> None:
+        """Record that a pod just used image_ref (best-effort, at most once a minute per image)."""
+        now = time.time()
+        with self._lock:
+            if now - self._touched.get(image_ref, 0.0) < TOUCH_INTERVAL_SEC:
+                return
+            self._touched[image_ref] = now
+        try:
+            name = self.pods.images.resolve_image_name(image_ref)
+            self.c.images.Update(images_pb2.UpdateImageRequest(
+                image=images_pb2.Image(name=name, labels={LAST_USED_LABEL: str(int(now))}),
+                update_mask=field_mask_pb2.FieldMask(paths=[f"labels.{LAST_USED_LABEL}"]),
+            ), timeout=5.0)
+        except (grpc.RpcError, RuntimeError) as e:
+            print(f"[image-gc] touch {image_ref} skipped: {e}")
+
+    # ---------- disk ----------
+    def _snapshotter_root(self, snapshotter: str) -> str:
+        return self.root or os.path.join(CONTAINERD_ROOT, f"io.containerd.snapshotter.v1.{snapshotter}")
+
+    def disk_usage(self, snapshotter: str) -> Tuple[int, int]:
+        """(used bytes, total bytes) of the filesystem holding the snapshotter."""
+        st = os.statvfs(self._snapshotter_root(snapshotter))
+        total = st.f_blocks * st.f_frsize
+        return total - st.f_bavail * st.f_frsize, total
+
+    def snapshot_usage(self, snapshotter: str, key: str) -> int:
+        try:
+            return self.c.snapshots.Usage(
+                snapshots_pb2.UsageRequest(snapshotter=snapshotter, key=key), timeout=10.0).size
+        except grpc.RpcError:
+            return 0
+
+    # ---------- inventory ----------
+    def _chains_for(self, name: str) -> List[str]:
+        from utils.containerd.containerd_interface import _compute_chain_id  # circular at module level
+        manifest_desc = self.pods.images.resolve_manifest(name)
+        _, cfg = self.pods.images.load_manifest_and_config(manifest_desc)
+        diff_ids = (cfg.get("rootfs") or {}).get("diff_ids", [])
+        return [_compute_chain_id(diff_ids[:i + 1]) for i in range(len(diff_ids))]
+
+    @log_to_file(logger)
+    def images(self) -> List[ImageEntry]:
+        """Every image in the namespace with its chains, last use and whether a container uses it."""
+        from utils.containerd.containerd_interface import _candidates_for_ref
+        # containers keep the ref they were created with; match every normalized form of it
+        in_use = {name for c in self.pods.runtime.list_containers() for name in _candidates_for_ref(c.image)}
+        out: List[ImageEntry] = []
+        for img in self.c.images.List(images_pb2.ListImagesRequest()).images:
+            label = img.labels.get(LAST_USED_LABEL, "")
+            last = float(label) if label.isdigit() else float(img.updated_at.seconds or img.created_at.seconds)
+            try:
+                chains = self._chains_for(img.name)
+            except Exception as e:
+                # content missing / foreign platform: nothing of ours unpacked, leave it alone
+                print(f"[image-gc] skipping {img.name}: {e}")
+                continue
+            out.append(ImageEntry(name=img.name, last_used=last, chains=chains, referenced=img.name in in_use))
+        return out
+
+    # ---------- eviction ----------
+    def _remove_chains(self, snapshotter: str, chains: List[str]) -> List[str]:
+        """Remove committed chains top-down; stops at the first one still in use (has children)."""
+        removed = []
+        for chain in reversed(chains):
+            try:
+                self.c.snapshots.Remove(snapshots_pb2.RemoveSnapshotRequest(snapshotter=snapshotter, key=chain),
+                                        timeout=10.0)
+            except grpc.RpcError as e:
+                if e.code() != grpc.StatusCode.NOT_FOUND:
+                    print(f"[image-gc] keep chain {chain[:19]}: {e.code().name}")
+                    break
+            self.pods.snaps.chains.discard(self.c.namespace, snapshotter, chain)
+            removed.append(chain)
+        return removed
+
+    @log_to_file(logger)
+    def collect(self, force: bool = False) -> Dict:
+        """
+        Evict LRU unreferenced images while disk usage is above the high watermark
+        (or unconditionally down to the low watermark with force=True).
+        """
+        snapshotter = self.pods._snapshotter_name()
+        used, total = self.disk_usage(snapshotter)
+        pct = 100.0 * used / total if total else 0.0
+        report = {"namespace": self.c.namespace, "snapshotter": snapshotter, "used_pct": round(pct, 2),
+                  "evicted": [], "freed_bytes": 0}
+        if not force and (not self.enabled or pct < self.high_pct):
+            return report
+
+        with node_lock(f"image-gc-{self.c.namespace}.lock", blocking=False) as got:
+            if not got:
+                report["skipped"] = "another process is collecting"
+                return report
+
+            entries = self.images()
+            now = time.time()
+            candidates = sorted((e for e in entries if not e.referenced and now - e.last_used >= self.min_age),
+                                key=lambda e: e.last_used)
+            refs: Dict[str, int] = {}
+            for e in entries:
+                for chain in set(e.chains):
+                    refs[chain] = refs.get(chain, 0) + 1
+            target = self.low_pct / 100.0 * total
+
+            for e in candidates:
+                if used <= target:
+                    break
+                # only the top run of chains no other image shares is removable
+                tail: List[str] = []
+                for chain in reversed(e.chains):
+                    if refs.get(chain, 0) > 1:
+                        break
+                    tail.insert(0, chain)
+                if not tail:
+                    continue  # every chain is shared: deleting the record would free nothing
+                sizes = {ch: self.snapshot_usage(snapshotter, ch) for ch in tail}
+                # chains first: the image record is what keeps them findable here, so it
+                # is only deleted once they are gone (a failed remove is retried next run)
+                removed = self._remove_chains(snapshotter, tail)
+                freed = sum(sizes[ch] for ch in removed)
+                used -= freed
+                if len(removed) < len(tail):
+                    print(f"[image-gc] kept {e.name}: {len(tail) - len(removed)} chain(s) not removed")
+                    continue
+                try:
+                    self.c.images.Delete(images_pb2.DeleteImageRequest(name=e.name), timeout=10.0)
+                except grpc.RpcError as err:
+                    if err.code() != grpc.StatusCode.NOT_FOUND:
+                        print(f"[image-gc] delete {e.name} failed: {err.code().name}")
+                        continue
+                for chain in set(e.chains):
+                    refs[chain] = refs.get(chain, 1) - 1
+                report["evicted"].append({"image": e.name, "chains": len(removed), "bytes": freed})
+                report["freed_bytes"] += freed
+                print(f"🧹 evicted {e.name} ({freed / 1e6:.1f} MB, {len(removed)} chain(s))")
+
+        used_now, _ = self.disk_usage(snapshotter)
+        report["used_pct_after"] = round(100.0 * used_now / total, 2) if total else 0.0
+        return report
+
+    def maybe_collect_async(self) -> None:
+        """Cheap watermark check (at most every IMAGE_GC_CHECK_SEC); collects in a background thread."""
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked_at < IMAGE_GC_CHECK_SEC or (self._thread is not None and self._thread.is_alive()):
+                return
+            self._checked_at = now
+        try:
+            used, total = self.disk_usage(self.pods._snapshotter_name())
+        except OSError as e:
+            print(f"[image-gc] disk check skipped: {e}")
+            return
+        if total and 100.0 * used / total >= self.high_pct:
+            self._thread = threading.Thread(target=self.collect, name=f"image-gc-{self.c.namespace}", daemon=True)
+            self._thread.start()
@@ -0,0 +1,201 @@
+"""
+janitor.py
+Background reclaim of objects left behind by failed or interrupted pod creation.
+
+Pod creation runs under an expiring containerd lease (SnapshotManager.lease), so a
+crashed worker's half-made snapshots are reclaimed by containerd's GC on its own.
+The janitor catches what leases can't:
+
+  - dead pods:       pause container whose task is gone or stopped (torn down with
+                     its apps, including CNI DEL so the pod IP is released)
+  - loose apps:      app containers whose pod has no pause container
+
+Only containers dibba created (dibba.io/managed=true) are ever considered: the
+namespace may be k8s.io, where kubelet/CRI containers carry pod labels like app=nginx.
+  - orphan rootfs:   active "<pod>[-<app>|-pause]-rootfs-xxxxxxxx" snapshots that no
+                     container references and whose owning container doesn't exist
+  - stale unpacks:   active "unpack-xxxxxxxx-N" snapshots (pre-lease leftovers)
+
+Only objects older than JANITOR_MIN_AGE_SEC are touched, so in-flight creations are
+never raced. Each pass is incremental (at most JANITOR_BATCH objects) and deletions
+are rate-limited (JANITOR_RATE per second), so a node with a large backlog is cleaned
+up gradually instead of stalling containerd. One process per node runs a pass at a
+time (node lock).
+
+Env:
+  JANITOR_INTERVAL_SEC  seconds between background passes (default: 300, 0 disables)
+  JANITOR_MIN_AGE_SEC   minimum object age before it is considered orphaned (default: 900)
+  JANITOR_BATCH         max objects removed per pass (default: 50)
+  JANITOR_RATE          max deletions per second (default: 5)
+"""
+
+import os
+import re
+import time
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+import grpc
+
+from generated.api.services.snapshots.v1 import snapshots_pb2
+from utils.containerd.containerd_interface import PodManager, MANAGED_LABEL
+from utils.containerd.teardown import TeardownEngine
+from utils.containerd.node_lock import node_lock
+from logpkg.log_kcld import LogKCld, log_to_file
+
+logger = LogKCld()
+
+JANITOR_INTERVAL_SEC = float(os.environ.get("JANITOR_INTERVAL_SEC", "300"))
+JANITOR_MIN_AGE_SEC = float(os.environ.get("JANITOR_MIN_AGE_SEC", "900"))
+JANITOR_BATCH = int(os.environ.get("JANITOR_BATCH", "50"))
+JANITOR_RATE = float(os.environ.get("JANITOR_RATE", "5"))
+
+JANITOR_GRACE_SEC = 5.0
+_ROOTFS_KEY = re.compile(r"^(?P<owner>.+)-rootfs-[0-9a-f]{8}$")
+_UNPACK_KEY = re.compile(r"^unpack-[0-9a-f]{8}-\d+$")
+_POOL_SNAPSHOT_LABEL = "dibba.pool.snapshot"
+
+
+class _RateLimiter:
+    """Token bucket: take() blocks until a token is available."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = max(rate, 0.01)
+        self.capacity = burst or max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._at = time.monotonic()
+
+    def take(self, n: float = 1.0) -> None:
+        n = min(n, self.capacity)
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._at) * self.rate)
+            self._at = now
+            if self._tokens >= n:
+                self._tokens -= n
+                return
+            time.sleep((n - self._tokens) / self.rate)
+
+
+class Janitor:
+    @log_to_file(logger)
+    def __init__(self, pods: PodManager,
+                 interval: float = JANITOR_INTERVAL_SEC,
+                 min_age: float = JANITOR_MIN_AGE_SEC,
+                 batch: int = JANITOR_BATCH,
+                 rate: float = JANITOR_RATE):
+        self.pods = pods
+        self.c = pods.c
+        self.interval = interval
+        self.min_age = min_age
+        self.batch = batch
+        self.limiter = _RateLimiter(rate)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _old(self, ts) -> bool:
+        return ts.seconds > 0 and time.time() - ts.seconds >= self.min_age
+
+    # ---------- scans ----------
+    @log_to_file(logger)
+    def scan_containers(self, containers: List, tasks: Dict[str, Dict]) -> List[Tuple[Optional[Dict], List[Dict]]]:
+        """Teardown targets for dead pods and loose app containers (dibba-managed only)."""
+        containers = [c for c in containers if c.labels.get(MANAGED_LABEL) == "true"]
+        pause_by_pod = {c.labels.get("pod", c.id): c for c in containers if c.labels.get("role") == "pause"}
+        dead = {pod for pod, c in pause_by_pod.items()
+                if self._old(c.created_at) and (tasks.get(c.id) or {}).get("status", "stopped") == "stopped"}
+        loose = [c for c in containers
+                 if "app" in c.labels and c.labels.get("pod") and c.labels["pod"] not in pause_by_pod
+                 and self._old(c.created_at)]
+
+        targets: List[Tuple[Optional[Dict], List[Dict]]] = []
+        engine = TeardownEngine(self.pods)
+        for pod in sorted(dead):
+            targets += engine.targets_for({"pod": pod})
+        if loose:
+            targets.append((None, [{"cid": c.id, "snapshot_key": c.snapshot_key, "snapshotter": c.snapshotter}
+                                   for c in loose]))
+        return targets
+
+    @log_to_file(logger)
+    def scan_snapshots(self, snapshotter: str, containers: List, limit: int) -> List[str]:
+        """Active rootfs/unpack snapshot keys nothing owns (at most `limit`)."""
+        cids: Set[str] = {c.id for c in containers}
+        referenced: Set[str] = {c.snapshot_key for c in containers if c.snapshot_key}
+        referenced |= {c.labels[_POOL_SNAPSHOT_LABEL] for c in containers if _POOL_SNAPSHOT_LABEL in c.labels}
+        orphans: List[str] = []
+        try:
+            for resp in self.c.snapshots.List(snapshots_pb2.ListSnapshotsRequest(snapshotter=snapshotter)):
+                for info in resp.info:
+                    if info.kind != snapshots_pb2.ACTIVE or info.name in referenced or not self._old(info.created_at):
+                        continue
+                    m = _ROOTFS_KEY.match(info.name)
+                    if m:
+                        owner = m.group("owner")
+                        owners = {owner, owner[:-len("-pause")]} if owner.endswith("-pause") else {owner}
+                        if owners & cids:
+                            continue
+                    elif not _UNPACK_KEY.match(info.name):
+                        continue  # not ours
+                    orphans.append(info.name)
+                    if len(orphans) >= limit:
+                        return orphans
+        except grpc.RpcError as e:
+            print(f"[janitor] snapshot scan stopped: {e.code().name}")
+        return orphans
+
+    # ---------- pass ----------
+    @log_to_file(logger)
+    def run_once(self) -> Dict:
+        """One incremental, rate-limited cleanup pass for this namespace."""
+        report = {"namespace": self.c.namespace, "pods": 0, "containers": 0, "snapshots": 0}
+        with node_lock(f"janitor-{self.c.namespace}.lock", blocking=False) as got:
+            if not got:
+                report["skipped"] = "another process is cleaning"
+                return report
+
+            containers = self.pods.runtime.list_containers()
+            tasks = self.pods.runtime.list_tasks()
+            budget = self.batch
+            engine = TeardownEngine(self.pods, grace=JANITOR_GRACE_SEC)
+            for pod, apps in self.scan_containers(containers, tasks):
+                if budget <= 0:
+                    break
+                apps = apps[:budget]
+                n = len(apps) + (1 if pod else 0)
+                self.limiter.take(n)
+                print(f"🧽 [janitor] removing {'pod ' + pod['name'] if pod else f'{n} loose app(s)'}")
+                engine.teardown([(pod, apps)])
+                report["pods"] += 1 if pod else 0
+                report["containers"] += n
+                budget -= n
+
+            if budget > 0:
+                snapshotter = self.pods._snapshotter_name()
+                if report["containers"]:
+                    containers = self.pods.runtime.list_containers()
+                for key in self.scan_snapshots(snapshotter, containers, budget):
+                    self.limiter.take()
+                    self.pods.snaps._snap_remove_active(snapshotter, key)
+                    report["snapshots"] += 1
+        if report["containers"] or report["snapshots"]:
+            print(f"[janitor] {report}")
+        return report
+
+    # ---------- background ----------
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"[janitor] pass failed: {e}")
+
+    def start(self) -> None:
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name=f"janitor-{self.c.namespace}", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
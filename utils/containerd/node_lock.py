@@ -0,0 +1,123 @@
+"""
+node_lock.py
+Node-wide coordination between worker processes on one host.
+
+  node_lock(name)        flock-based mutex shared by every process on the node
+  SingleFlight.do(k, fn) run fn once per key: threads in this process wait for the
+                         leader's result; other processes wait on the node lock and then
+                         run fn, which is expected to find the work already done
+
+Env:
+  NODE_LOCK_DIR  lock file directory (default: WARM_POOL_LOCK_DIR or /run/dibba,
+                 falls back to the temp dir when not writable)
+"""
+
+import os
+import re
+import time
+import fcntl
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+from logpkg.log_kcld import LogKCld, log_to_file
+
+logger = LogKCld()
+
+NODE_LOCK_DIR = os.environ.get("NODE_LOCK_DIR", os.environ.get("WARM_POOL_LOCK_DIR", "/run/dibba"))
+
+
+def _lock_path(name: str) -> str:
+    name = re.sub(r"[^A-Za-z0-9_.-]", "_", name)
+    for d in (NODE_LOCK_DIR, tempfile.gettempdir()):
+        try:
+            os.makedirs(d, exist_ok=True)
+            if os.access(d, os.W_OK):
+                return os.path.join(d, name)
+        except OSError:
+            continue
+    return os.path.join(tempfile.gettempdir(), name)
+
+
+@contextmanager
+def node_lock(name: str, blocking: bool = True, timeout: Optional[float] = None):
+    """
+    Exclusive lock shared by all processes on the node. Yields True once held; yields
+    False if non-blocking and busy. Raises TimeoutError if `timeout` expires first.
+    """
+    fd = os.open(_lock_path(name), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | (fcntl.LOCK_NB if (not blocking or deadline) else 0))
+                break
+            except BlockingIOError:
+                if not blocking:
+                    yield False
+                    return
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"node lock {name} not acquired within {timeout}s")
+                time.sleep(0.1)
+        try:
+            yield True
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    @log_to_file(logger)
+    def __init__(self, prefix: str = "flight"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+
+    def do(self, key: str, fn: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            # same process: share the leader's outcome
+            if not call.done.wait(timeout):
+                raise TimeoutError(f"waited {timeout}s for in-flight {key}")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            with node_lock(f"{self.prefix}-{key}", timeout=timeout):
+                call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+
+_shared_flight: Optional[SingleFlight] = None
+_shared_lock = threading.Lock()
+
+
+def get_single_flight() -> SingleFlight:
+    global _shared_flight
+    if _shared_flight is None:
+        with _shared_lock:
+            if _shared_flight is None:
+                _shared_flight = SingleFlight(prefix="image")
+    return _shared_flight
@@ -0,0 +1,190 @@
+"""
+phase_metrics.py
+Latency spans for the pod lifecycle phases (resolve, blob check, pull, unpack per layer,
+snapshot prepare, container create, task start, CNI ADD/DEL, ...).
+
+  with span("cni_add"): ...          time a phase
+  @timed("task_start")               same, as a decorator
+  with phase_trace() as t: ...       collect every span run inside the block
+                                     (t.summary() goes into task results)
+
+Every span is also observed into a process-wide histogram per phase. Tasks call
+flush_phase_metrics() when they finish; it adds the deltas to this node's histogram hash in
+Redis (HINCRBY), so all worker processes on a node aggregate into one set of counters.
+The API renders them in Prometheus text format on GET /metrics.
+
+The active trace is a contextvar: asyncio tasks and asyncio.to_thread inherit it, and
+thread pools do too when work is submitted through contextvars.copy_context().run
+(PodDag does this).
+
+Env:
+  PHASE_METRICS_FLUSH_SEC  min seconds between Redis flushes per process (default: 10)
+"""
+
+import os
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, List, Optional, Tuple
+
+PHASE_METRICS_FLUSH_SEC = float(os.environ.get("PHASE_METRICS_FLUSH_SEC", "10"))
+
+# seconds; +Inf is implicit (the count)
+BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+METRIC_NAME = "dibba_pod_phase_seconds"
+
+
+class PhaseTrace:
+    """Spans recorded during one operation (e.g. one pod create), safe across threads."""
+
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self._lock = threading.Lock()
+        self.spans: List[Dict] = []
+
+    def add(self, phase: str, start: float, duration: float) -> None:
+        with self._lock:
+            self.spans.append({"phase": phase, "start": round(start - self.t0, 4), "duration": round(duration, 4)})
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """phase -> {"count", "total", "max"} in seconds (phases overlap when run in parallel)."""
+        out: Dict[str, Dict[str, float]] = {}
+        with self._lock:
+            for s in self.spans:
+                p = out.setdefault(s["phase"], {"count": 0, "total": 0.0, "max": 0.0})
+                p["count"] += 1
+                p["total"] = round(p["total"] + s["duration"], 4)
+                p["max"] = max(p["max"], s["duration"])
+        return out
+
+
+class PhaseHistograms:
+    """Cumulative per-phase histograms for this process, plus deltas not yet flushed."""
+
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._pending: Dict[str, List[float]] = {}   # phase -> [bucket counts..., count, sum]
+        self._flushed_at = 0.0
+
+    def observe(self, phase: str, seconds: float) -> None:
+        with self._lock:
+            h = self._pending.get(phase)
+            if h is None:
+                h = self._pending[phase] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, le in enumerate(self.buckets):
+                if seconds <= le:
+                    h[i] += 1
+            h[-2] += 1
+            h[-1] += seconds
+
+    def drain(self) -> Dict[str, Dict[str, float]]:
+        """Take the unflushed deltas as {phase: {"<le>": n, ..., "count": n, "sum": s}}."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flushed_at = time.monotonic()
+        out = {}
+        for phase, h in pending.items():
+            fields = {repr(le): h[i] for i, le in enumerate(self.buckets)}
+            fields.update({"count": h[-2], "sum": h[-1]})
+            out[phase] = fields
+        return out
+
+    def due(self, interval: float) -> bool:
+        with self._lock:
+            return bool(self._pending) and time.monotonic() - self._flushed_at >= interval
+
+    def restore(self, deltas: Dict[str, Dict[str, float]]) -> None:
+        """Put back deltas whose flush failed, so counts aren't lost."""
+        for phase, fields in deltas.items():
+            with self._lock:
+                h = self._pending.setdefault(phase, [0] * (len(self.buckets) + 1) + [0.0])
+                for i, le in enumerate(self.buckets):
+                    h[i] += fields.get(repr(le), 0)
+                h[-2] += fields.get("count", 0)
+                h[-1] += fields.get("sum", 0.0)
+
+
+_histograms = PhaseHistograms()
+_current: "contextvars.ContextVar[Optional[PhaseTrace]]" = contextvars.ContextVar("phase_trace", default=None)
+
+
+def get_phase_histograms() -> PhaseHistograms:
+    return _histograms
+
+
+@contextmanager
+def span(phase: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        _histograms.observe(phase, duration)
+        trace = _current.get()
+        if trace is not None:
+            trace.add(phase, start, duration)
+
+
+def timed(phase: str):
+    """Decorator form of span()."""
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(phase):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+@contextmanager
+def phase_trace():
+    trace = PhaseTrace()
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+def flush_phase_metrics(rd=None, node_name: Optional[str] = None, force: bool = False) -> bool:
+    """
+    Add this process's unflushed histogram deltas to the node's Redis hash (at most every
+    PHASE_METRICS_FLUSH_SEC unless force). Best-effort: a failed flush keeps the deltas.
+    """
+    if not (force or _histograms.due(PHASE_METRICS_FLUSH_SEC)):
+        return False
+    deltas = _histograms.drain()
+    if not deltas:
+        return False
+    try:
+        if rd is None:
+            from utils.redis.redis_interface import RedisInterface
+            rd = RedisInterface()
+        if node_name is None:
+            from socket import gethostname
+            node_name = gethostname()
+        rd.add_phase_histograms(node_name, deltas)
+        return True
+    except Exception as e:
+        _histograms.restore(deltas)
+        print(f"[metrics] flush skipped: {e}")
+        return False
+
+
+def render_prometheus(per_node: Dict[str, Dict[str, Dict[str, float]]]) -> str:
+    """Prometheus text exposition for {node: {phase: {"<le>": n, "count": n, "sum": s}}}."""
+    lines = [f"# HELP {METRIC_NAME} Pod lifecycle phase latency.",
+             f"# TYPE {METRIC_NAME} histogram"]
+    for node in sorted(per_node):
+        for phase in sorted(per_node[node]):
+            h = per_node[node][phase]
+            labels = f'node="{node}",phase="{phase}"'
+            for le in BUCKETS:
+                lines.append(f'{METRIC_NAME}_bucket{{{labels},le="{le}"}} {int(h.get(repr(le), 0))}')
+            lines.append(f'{METRIC_NAME}_bucket{{{labels},le="+Inf"}} {int(h.get("count", 0))}')
+            lines.append(f"{METRIC_NAME}_sum{{{labels}}} {h.get('sum', 0.0)}")
+            lines.append(f"{METRIC_NAME}_count{{{labels}}} {int(h.get('count', 0))}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,102 @@
+"""
+snapshotter_discovery.py
+Which snapshotters does this node's containerd actually have?
+
+Asked once per process (per socket) through the Introspection Plugins API
+(type io.containerd.snapshotter.v1, skipping plugins that failed to init) and cached.
+The cache is only dropped when containerd rejects the chosen snapshotter
+(invalidate()), so normal pod starts never probe.
+
+If Introspection itself is unavailable the caller's candidate list is returned
+unverified, which keeps the old trial-and-error behaviour as a last resort.
+"""
+
+import threading
+from typing import Dict, List, Optional, Set
+
+import grpc
+
+from generated.api.services.introspection.v1 import introspection_pb2
+from logpkg.log_kcld import LogKCld, log_to_file
+
+logger = LogKCld()
+
+SNAPSHOTTER_PLUGIN_TYPE = "io.containerd.snapshotter.v1"
+PREFERRED_ORDER = ["overlayfs", "native", "btrfs", "zfs", "stargz"]
+
+
+class SnapshotterRegistry:
+    @log_to_file(logger)
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._available: Dict[str, List[str]] = {}   # socket target -> plugin ids
+        self._selected: Dict[str, str] = {}          # socket target -> chosen id
+        self._no_introspection: Set[str] = set()     # targets where Plugins isn't served
+
+    @log_to_file(logger)
+    def discover(self, client) -> Optional[List[str]]:
+        """Loaded snapshotter plugin ids, or None when Introspection can't be used."""
+        try:
+            resp = client.introspection.Plugins(introspection_pb2.PluginsRequest(
+                filters=[f'type=="{SNAPSHOTTER_PLUGIN_TYPE}"']), timeout=5.0)
+        except grpc.RpcError as e:
+            print(f"[snapshotter] introspection unavailable ({e.code().name}); falling back to probing")
+            return None
+        ids = [p.id for p in resp.plugins
+               if p.type == SNAPSHOTTER_PLUGIN_TYPE and not (p.HasField("init_err") and p.init_err.code)]
+        print(f"[snapshotter] available on {client.socket}: {ids}")
+        return ids
+
+    def cached(self, target: str) -> Optional[str]:
+        with self._lock:
+            return self._selected.get(target)
+
+    @log_to_file(logger)
+    def select(self, client, preferred: Optional[str] = None) -> Optional[str]:
+        """
+        Snapshotter to use on client.socket: preferred if loaded, else the first loaded one
+        in PREFERRED_ORDER. Returns None if Introspection is unavailable (caller probes).
+        """
+        target = client.socket
+        with self._lock:
+            if target in self._selected:
+                return self._selected[target]
+            if target in self._no_introspection:
+                return None
+        ids = self.discover(client)
+        if ids is None:
+            with self._lock:
+                self._no_introspection.add(target)
+            return None
+        if not ids:
+            raise RuntimeError(f"containerd at {target} reports no usable snapshotter plugins")
+        order = ([preferred] if preferred else []) + PREFERRED_ORDER
+        chosen = next((name for name in order if name in ids), ids[0])
+        with self._lock:
+            self._available[target] = ids
+            self._selected[target] = chosen
+        return chosen
+
+    def available(self, target: str) -> List[str]:
+        with self._lock:
+            return list(self._available.get(target, []))
+
+    @log_to_file(logger)
+    def invalidate(self, target: str) -> None:
+        with self._lock:
+            self._available.pop(target, None)
+            self._selected.pop(target, None)
+            self._no_introspection.discard(target)
+
+
+_shared_registry: Optional[SnapshotterRegistry] = None
+_shared_lock = threading.Lock()
+
+
+def get_snapshotter_registry() -> SnapshotterRegistry:
+    global _shared_registry
+    if _shared_registry is None:
+        with _shared_lock:
+            if _shared_registry is None:
+                _shared_registry = SnapshotterRegistry()
+    return _shared_registry
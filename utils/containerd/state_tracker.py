@@ -0,0 +1,273 @@
+"""
+state_tracker.py
+Event-driven container state for a node, fed by containerd's Events.Subscribe stream.
+
+One subscription per node replaces per-container polling (Containers.Get + Tasks.State):
+  - task create/start/exit/oom/delete/paused/resumed and container delete events update
+    an in-memory view as they arrive, and are written through to Redis
+    (hash container_state:<node>:<namespace>, field = container id)
+  - on (re)connect the view is re-seeded from Tasks.List, so nothing is lost while the
+    stream was down; the Redis hash is swapped in one transaction
+  - wait_for(cid, statuses) lets in-process callers block on a transition (e.g. exit)
+    instead of sleeping between polls
+
+Run one agent per node:  python -m utils.containerd.state_tracker
+Readers on the same node (Celery tasks) use RedisInterface.get_container_state(s).
+
+Env:
+  CONTAINERD_EVENTS_RETRY_MAX_SEC  cap for the reconnect backoff in seconds (default: 30)
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field, asdict
+from socket import gethostname
+from typing import Optional, Dict, Iterable
+
+import grpc
+
+from generated.api.services.events.v1 import events_pb2
+from generated.api.services.tasks.v1 import tasks_pb2
+from generated.api.events import task_pb2 as task_events_pb2
+from generated.api.events import container_pb2 as container_events_pb2
+from generated.api.types.task import task_pb2 as task_types_pb2
+from utils.containerd.containerd_interface import ContainerdClient, CONTAINERD_SOCKET, NAMESPACE
+from utils.redis.lifecycle_events import emit
+from logpkg.log_kcld import LogKCld, log_to_file
+
+logger = LogKCld()
+
+EVENTS_RETRY_MAX_SEC = float(os.environ.get("CONTAINERD_EVENTS_RETRY_MAX_SEC", "30"))
+
+_TASK_STATUS = {
+    task_types_pb2.CREATED: "created",
+    task_types_pb2.RUNNING: "running",
+    task_types_pb2.STOPPED: "stopped",
+    task_types_pb2.PAUSED: "paused",
+    task_types_pb2.PAUSING: "paused",
+}
+
+_EVENT_TYPES = {
+    "/tasks/create": task_events_pb2.TaskCreate,
+    "/tasks/start": task_events_pb2.TaskStart,
+    "/tasks/exit": task_events_pb2.TaskExit,
+    "/tasks/oom": task_events_pb2.TaskOOM,
+    "/tasks/delete": task_events_pb2.TaskDelete,
+    "/tasks/paused": task_events_pb2.TaskPaused,
+    "/tasks/resumed": task_events_pb2.TaskResumed,
+    "/containers/delete": container_events_pb2.ContainerDelete,
+}
+
+
+def _ts(t) -> Optional[float]:
+    if t is None or (not t.seconds and not t.nanos):
+        return None
+    return t.seconds + t.nanos / 1e9
+
+
+@dataclass
+class ContainerState:
+    container_id: str
+    namespace: str
+    status: str = "unknown"          # created | running | paused | stopped | deleted
+    pid: int = 0
+    exit_status: Optional[int] = None
+    exited_at: Optional[float] = None
+    oom_killed: bool = False
+    updated_at: float = field(default_factory=time.time)
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+class ContainerStateTracker:
+    @log_to_file(logger)
+    def __init__(self, socket: str = CONTAINERD_SOCKET, namespace: str = NAMESPACE,
+                 node_name: Optional[str] = None, redis_interface=None):
+        self.socket = socket
+        self.namespace = namespace
+        self.node_name = node_name or gethostname()
+        self.rd = redis_interface
+        self._states: Dict[str, ContainerState] = {}
+        self._deleted: "OrderedDict[str, ContainerState]" = OrderedDict()  # recent tombstones for wait_for
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._call = None
+
+    # ---- reads ----
+    def get(self, container_id: str) -> Optional[Dict]:
+        with self._cond:
+            st = self._states.get(container_id)
+            return st.to_dict() if st else None
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._cond:
+            return {cid: st.to_dict() for cid, st in self._states.items()}
+
+    def wait_for(self, container_id: str, statuses: Iterable[str] = ("stopped", "deleted"),
+                 timeout: Optional[float] = None) -> Optional[Dict]:
+        """Block until the container reaches one of statuses; returns its state or None on timeout."""
+        wanted = set(statuses)
+
+        def _current() -> Optional[ContainerState]:
+            st = self._states.get(container_id)
+            if st is None and "deleted" in wanted:
+                st = self._deleted.get(container_id)
+            return st if st is not None and st.status in wanted else None
+
+        with self._cond:
+            if not self._cond.wait_for(lambda: _current() is not None, timeout=timeout):
+                return None
+            return _current().to_dict()
+
+    # ---- writes ----
+    def _publish(self, st: ContainerState) -> None:
+        if self.rd is None:
+            return
+        try:
+            if st.status == "deleted":
+                self.rd.delete_container_state(self.node_name, self.namespace, st.container_id)
+            else:
+                self.rd.save_container_state(self.node_name, self.namespace, st.container_id, st.to_dict())
+        except Exception as e:
+            print(f"[state-tracker] redis write warning for {st.container_id}: {e}")
+
+    def apply(self, envelope) -> Optional[ContainerState]:
+        """Fold one events Envelope into the view. Unknown topics are ignored."""
+        cls = _EVENT_TYPES.get(envelope.topic)
+        if cls is None or envelope.namespace != self.namespace:
+            return None
+        ev = cls()
+        if not envelope.event.Unpack(ev):
+            return None
+        cid = getattr(ev, "container_id", "") or getattr(ev, "id", "")
+        if not cid:
+            return None
+        # exec'd processes report their own exits; only the init process (id == cid or empty) counts
+        if envelope.topic in ("/tasks/exit", "/tasks/delete") and ev.id and ev.id != cid:
+            return None
+
+        with self._cond:
+            st = self._states.get(cid) or ContainerState(container_id=cid, namespace=self.namespace)
+            topic = envelope.topic
+            if topic == "/tasks/create":
+                st.status, st.pid = "created", ev.pid
+                st.exit_status = st.exited_at = None
+                st.oom_killed = False
+            elif topic == "/tasks/start":
+                st.status, st.pid = "running", ev.pid
+            elif topic in ("/tasks/exit", "/tasks/delete"):
+                st.status = "stopped"
+                st.exit_status = ev.exit_status
+                st.exited_at = _ts(ev.exited_at) or st.exited_at
+            elif topic == "/tasks/oom":
+                st.oom_killed = True
+            elif topic == "/tasks/paused":
+                st.status = "paused"
+            elif topic == "/tasks/resumed":
+                st.status = "running"
+            elif topic == "/containers/delete":
+                st.status = "deleted"
+            st.updated_at = _ts(envelope.timestamp) or time.time()
+            if st.status == "deleted":
+                self._states.pop(cid, None)
+                self._deleted[cid] = st
+                while len(self._deleted) > 1024:
+                    self._deleted.popitem(last=False)
+            else:
+                self._deleted.pop(cid, None)
+                self._states[cid] = st
+            self._cond.notify_all()
+        self._publish(st)
+        if envelope.topic == "/tasks/exit":
+            emit(self.namespace, "container_exited", cid=cid, exit_status=st.exit_status,
+                 oom_killed=int(st.oom_killed))
+        return st
+
+    @log_to_file(logger)
+    def seed(self, client: ContainerdClient) -> int:
+        """Rebuild the view from Tasks.List (authoritative after a reconnect)."""
+        resp = client.tasks.List(tasks_pb2.ListTasksRequest())
+        fresh: Dict[str, ContainerState] = {}
+        for p in resp.tasks:
+            fresh[p.container_id] = ContainerState(
+                container_id=p.container_id,
+                namespace=self.namespace,
+                status=_TASK_STATUS.get(p.status, "unknown"),
+                pid=p.pid,
+                exit_status=p.exit_status if p.status == task_types_pb2.STOPPED else None,
+                exited_at=_ts(p.exited_at),
+            )
+        with self._cond:
+            # keep OOM flags across a resync; containerd doesn't report them in List
+            for cid, st in fresh.items():
+                old = self._states.get(cid)
+                if old is not None and old.pid == st.pid:
+                    st.oom_killed = old.oom_killed
+            self._states = fresh
+            self._cond.notify_all()
+        if self.rd is not None:
+            try:
+                self.rd.replace_container_states(self.node_name, self.namespace, {c: s.to_dict() for c, s in fresh.items()})
+            except Exception as e:
+                print(f"[state-tracker] redis resync warning: {e}")
+        return len(fresh)
+
+    # ---- subscription loop ----
+    def run(self) -> None:
+        backoff = 0.5
+        while not self._stop.is_set():
+            try:
+                client = ContainerdClient.shared(socket=self.socket, namespace=self.namespace)
+                # subscribe before seeding so no event falls between the List and the stream
+                self._call = client.events.Subscribe(events_pb2.SubscribeRequest(filters=[
+                    f'namespace=={self.namespace},topic~="^/tasks/"',
+                    f'namespace=={self.namespace},topic=="/containers/delete"',
+                ]))
+                n = self.seed(client)
+                print(f"[state-tracker] subscribed ({self.namespace}); seeded {n} tasks")
+                backoff = 0.5
+                for envelope in self._call:
+                    self.apply(envelope)
+            except grpc.RpcError as e:
+                if self._stop.is_set():
+                    break
+                print(f"[state-tracker] event stream lost: {e.code().name}; retrying in {backoff:.1f}s")
+            except Exception as e:
+                print(f"[state-tracker] unexpected error: {e}; retrying in {backoff:.1f}s")
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, EVENTS_RETRY_MAX_SEC)
+
+    @log_to_file(logger)
+    def start(self) -> "ContainerStateTracker":
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, name="containerd-events", daemon=True)
+            self._thread.start()
+        return self
+
+    @log_to_file(logger)
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._call is not None:
+            self._call.cancel()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+if __name__ == "__main__":
+    from utils.redis.redis_interface import RedisInterface
+
+    tracker = ContainerStateTracker(
+        socket=os.environ.get("CONTAINERD_SOCKET", CONTAINERD_SOCKET),
+        redis_interface=RedisInterface(),
+    )
+    tracker.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        tracker.stop()
@@ -0,0 +1,277 @@
+"""
+teardown.py
+Parallel pod teardown with one shared grace deadline.
+
+Instead of stopping containers one at a time (each with its own kill/delete timeouts),
+TeardownEngine works on a whole set of pods at once:
+
+  1. SIGTERM every app container of every pod concurrently
+  2. wait until they have all stopped or the shared grace deadline passes
+     (one Tasks.List per poll, not one RPC per container)
+  3. SIGKILL whatever is still running
+  4. CNI DEL for every pod (pause netns still alive), concurrently
+  5. SIGKILL the pause containers (nothing to drain)
+  6. delete tasks, then container objects, concurrently
+  7. remove all rootfs snapshots in one concurrent batch at the end
+
+Draining N pods therefore costs roughly one grace period plus a few RPC rounds,
+not N x (grace + RPCs).
+
+delete_by_labels() / delete_namespace() rebuild the pod dicts from containerd labels
+(pod / role / app, see PodManager) so callers don't need to have kept them. Every
+selection (drain, label selector, pod names) only matches containers dibba created
+(dibba.io/managed=true): the default k8s.io namespace is shared with kubelet/CRI, whose
+containers carry their own pod/app/role labels and are left alone unless
+include_unlabelled=True.
+
+Env:
+  TEARDOWN_GRACE_SEC  shared SIGTERM grace period in seconds (default: 10)
+  TEARDOWN_WORKERS    concurrent RPCs during teardown (default: 16)
+"""
+
+import os
+import time
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import grpc
+
+from generated.api.services.containers.v1 import containers_pb2
+from generated.api.services.snapshots.v1 import snapshots_pb2
+from generated.api.services.tasks.v1 import tasks_pb2
+from utils.containerd.containerd_interface import (
+    PodManager, DEFAULT_CNI_NET_NAME, DEFAULT_IFNAME, MANAGED_LABEL, MANAGED_FILTER,
+)
+from utils.containerd.phase_metrics import timed
+from utils.redis.lifecycle_events import emit
+from logpkg.log_kcld import LogKCld, log_to_file
+
+logger = LogKCld()
+
+TEARDOWN_GRACE_SEC = float(os.environ.get("TEARDOWN_GRACE_SEC", "10"))
+TEARDOWN_WORKERS = int(os.environ.get("TEARDOWN_WORKERS", "16"))
+
+KILL_WAIT_SEC = 3.0        # how long to wait for SIGKILLed tasks to be reaped
+RPC_TIMEOUT = 5.0
+POLL_MIN, POLL_MAX = 0.05, 0.5
+
+# pool labels (warm_pool.py) carry the CNI attachment of pooled sandboxes
+_POOL_NET_LABEL = "dibba.pool.network"
+_POOL_IFNAME_LABEL = "dibba.pool.ifname"
+_POOL_SNAPSHOT_LABEL = "dibba.pool.snapshot"
+
+
+def label_filter(labels: Dict[str, str], managed: bool = True) -> List[str]:
+    """
+    Containers.List filter matching every label (AND), restricted to containers dibba
+    created unless managed=False; [] (no labels, managed=False) matches everything.
+    """
+    terms = [f'labels."{k}"=="{v}"' for k, v in labels.items()] + ([MANAGED_FILTER] if managed else [])
+    return [",".join(terms)] if terms else []
+
+
+def _is_pause(c) -> bool:
+    # a user pod labelled role=pause (include_unlabelled) is not one of our sandboxes
+    return c.labels.get("role") == "pause" and c.labels.get(MANAGED_LABEL) == "true"
+
+
+class TeardownEngine:
+    @log_to_file(logger)
+    def __init__(self, pods: PodManager, grace: Optional[float] = None, max_workers: Optional[int] = None):
+        self.pods = pods
+        self.c = pods.c
+        self.grace = TEARDOWN_GRACE_SEC if grace is None else grace
+        self.max_workers = max_workers or TEARDOWN_WORKERS
+
+    # ---------- fan-out helpers ----------
+    def _each(self, ex: ThreadPoolExecutor, fn: Callable, items: Iterable) -> List:
+        return list(ex.map(fn, list(items)))
+
+    def _kill(self, cid: str, sig: int) -> None:
+        try:
+            self.c.tasks.Kill(tasks_pb2.KillRequest(container_id=cid, signal=sig, all=True), timeout=RPC_TIMEOUT)
+        except grpc.RpcError:
+            pass  # no task / already gone
+
+    def _running(self, cids: Iterable[str]) -> List[str]:
+        """cids whose task still exists and hasn't stopped (one Tasks.List)."""
+        tasks = self.pods.runtime.list_tasks()
+        return [cid for cid in cids if cid in tasks and tasks[cid]["status"] != "stopped"]
+
+    def _wait_stopped(self, cids: List[str], deadline: float) -> List[str]:
+        """Poll until every task in cids has stopped or the deadline passes; returns stragglers."""
+        remaining = list(cids)
+        delay = POLL_MIN
+        while remaining:
+            try:
+                remaining = self._running(remaining)
+            except grpc.RpcError as e:
+                print(f"[teardown] Tasks.List warning: {e.code().name}")
+            if not remaining or time.monotonic() >= deadline:
+                break
+            time.sleep(min(delay, max(0.0, deadline - time.monotonic())))
+            delay = min(delay * 2, POLL_MAX)
+        return remaining
+
+    def _stop(self, ex: ThreadPoolExecutor, cids: List[str], deadline: float) -> List[str]:
+        """TERM all, wait for the shared deadline, KILL stragglers. Returns the cids that needed KILL."""
+        if not cids:
+            return []
+        self._each(ex, lambda cid: self._kill(cid, signal.SIGTERM), cids)
+        stragglers = self._wait_stopped(cids, deadline)
+        if stragglers:
+            print(f"[teardown] grace expired; SIGKILL {len(stragglers)} container(s)")
+            self._each(ex, lambda cid: self._kill(cid, signal.SIGKILL), stragglers)
+            self._wait_stopped(stragglers, time.monotonic() + KILL_WAIT_SEC)
+        return stragglers
+
+    def _delete_task_and_container(self, cid: str) -> Optional[str]:
+        try:
+            self.c.tasks.Delete(tasks_pb2.DeleteTaskRequest(container_id=cid), timeout=RPC_TIMEOUT)
+        except grpc.RpcError as e:
+            if e.code() != grpc.StatusCode.NOT_FOUND:
+                # still running after KILL: one more hard kill before giving up on the task
+                self._kill(cid, signal.SIGKILL)
+                try:
+                    self.c.tasks.Delete(tasks_pb2.DeleteTaskRequest(container_id=cid), timeout=RPC_TIMEOUT)
+                except grpc.RpcError:
+                    pass
+        try:
+            self.c.containers.Delete(containers_pb2.DeleteContainerRequest(id=cid), timeout=RPC_TIMEOUT)
+        except grpc.RpcError as e:
+            if e.code() != grpc.StatusCode.NOT_FOUND:
+                return f"{cid}: container delete {e.code().name}"
+        return None
+
+    def _cni_del(self, pod: Dict) -> Optional[str]:
+        pause_cid = (pod.get("pause") or {}).get("cid")
+        cni_cfg = pod.get("cni") or {}
+        network_name = cni_cfg.get("network", DEFAULT_CNI_NET_NAME)
+        ifname = cni_cfg.get("ifname", DEFAULT_IFNAME)
+        if not pause_cid or not network_name:
+            return None
+        netns_path = (pod.get("ns") or {}).get("net")
+        netns_for_del = netns_path if (netns_path and os.path.exists(netns_path)) else ""
+        try:
+            self.pods.cni.delete(network_name=network_name, container_id=pause_cid,
+                                 netns_path=netns_for_del, ifname=ifname)
+        except Exception as e:
+            return f"{pause_cid}: CNI DEL {e}"
+        return None
+
+    def _remove_snapshot(self, item: Tuple[str, str]) -> Optional[str]:
+        snapshotter, key = item
+        try:
+            self.c.snapshots.Remove(snapshots_pb2.RemoveSnapshotRequest(snapshotter=snapshotter, key=key),
+                                    timeout=RPC_TIMEOUT)
+        except grpc.RpcError as e:
+            if e.code() != grpc.StatusCode.NOT_FOUND:
+                return f"snapshot {key}: {e.code().name}"
+        return None
+
+    # ---------- public ----------
+    @log_to_file(logger)
+    @timed("teardown")
+    def teardown(self, targets: List[Tuple[Optional[Dict], Optional[List[Dict]]]],
+                 grace: Optional[float] = None) -> Dict:
+        """
+        Tear down many pods at once. targets is [(pod, apps)], with the pod/app dicts returned
+        by create_pod / add_container; pod may be None to delete just the apps.
+        Apps may carry "snapshotter" to override the default for their snapshot key.
+        """
+        t0 = time.monotonic()
+        deadline = t0 + (self.grace if grace is None else grace)
+        default_snapshotter = self.pods._snapshotter_name()
+
+        pods = [p for p, _ in targets if p]
+        apps = [a for _, group in targets for a in (group or []) if a]
+        app_cids = list(dict.fromkeys(a["cid"] for a in apps if a.get("cid")))
+        pause_cids = list(dict.fromkeys(p["pause"]["cid"] for p in pods if (p.get("pause") or {}).get("cid")))
+        snaps = list(dict.fromkeys(
+            [(a.get("snapshotter") or default_snapshotter, a["snapshot_key"]) for a in apps if a.get("snapshot_key")]
+            + [(p.get("snapshotter") or default_snapshotter, p["snapshot_key"]) for p in pods if p.get("snapshot_key")]))
+
+        print(f"[teardown] {len(pods)} pod(s), {len(app_cids)} app container(s), grace={deadline - t0:.1f}s")
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="teardown") as ex:
+            killed = self._stop(ex, app_cids, deadline)
+            errors = [e for e in self._each(ex, self._cni_del, pods) if e]
+            self._each(ex, lambda cid: self._kill(cid, signal.SIGKILL), pause_cids)
+            self._wait_stopped(pause_cids, time.monotonic() + KILL_WAIT_SEC)
+            errors += [e for e in self._each(ex, self._delete_task_and_container, app_cids + pause_cids) if e]
+            errors += [e for e in self._each(ex, self._remove_snapshot, snaps) if e]
+
+        for e in errors:
+            print(f"[teardown] warning: {e}")
+        duration = round(time.monotonic() - t0, 3)
+        print(f"[teardown] done in {duration}s ({len(killed)} needed SIGKILL)")
+        for p in pods:
+            emit(self.c.namespace, "pod_deleted", pod=p.get("name"))
+        return {"namespace": self.c.namespace, "pods": [p.get("name") for p in pods],
+                "containers": len(app_cids) + len(pause_cids), "killed": killed,
+                "snapshots": len(snaps), "errors": errors, "duration": duration}
+
+    @log_to_file(logger)
+    def targets_for(self, labels: Dict[str, str],
+                    include_unlabelled: bool = False) -> List[Tuple[Optional[Dict], List[Dict]]]:
+        """
+        Rebuild (pod, apps) targets for every container matching labels. A selected pause
+        container brings all of its pod's apps along; apps selected without their pause are
+        deleted on their own. Only dibba-managed containers are selected (empty labels: all
+        of them) unless include_unlabelled=True, which also selects containers dibba didn't
+        create (treated as loose apps).
+        """
+        selected = self.pods.runtime.list_containers(label_filter(labels, managed=not include_unlabelled))
+        tasks = self.pods.runtime.list_tasks()
+        pauses = [c for c in selected if _is_pause(c)]
+        if pauses and labels:
+            wanted = {c.labels.get("pod", c.id) for c in pauses}
+            extra = [c for c in self.pods.runtime.list_containers([f"{MANAGED_FILTER},labels.app"])
+                     if c.labels.get("pod") in wanted]
+            selected = list({c.id: c for c in list(selected) + extra}.values())
+
+        def _app(c) -> Dict:
+            return {"cid": c.id, "pid": (tasks.get(c.id) or {}).get("pid"),
+                    "snapshot_key": c.snapshot_key, "snapshotter": c.snapshotter}
+
+        by_pod: Dict[str, Tuple[Optional[Dict], List[Dict]]] = {}
+        for c in pauses:
+            pid = (tasks.get(c.id) or {}).get("pid")
+            pod = {"name": c.labels.get("pod", c.id),
+                   "pause": {"cid": c.id, "pid": pid},
+                   "ns": {k: f"/proc/{pid}/ns/{k}" for k in ["pid", "net", "ipc", "uts"]} if pid else {},
+                   "cni": {"network": c.labels.get(_POOL_NET_LABEL, DEFAULT_CNI_NET_NAME),
+                           "ifname": c.labels.get(_POOL_IFNAME_LABEL, DEFAULT_IFNAME)},
+                   "snapshot_key": c.labels.get(_POOL_SNAPSHOT_LABEL) or c.snapshot_key,
+                   "snapshotter": c.snapshotter}
+            by_pod[pod["name"]] = (pod, [])
+        loose: List[Dict] = []
+        for c in selected:
+            if _is_pause(c):
+                continue
+            owner = by_pod.get(c.labels.get("pod", ""))
+            (owner[1] if owner else loose).append(_app(c))
+        return list(by_pod.values()) + ([(None, loose)] if loose else [])
+
+    @log_to_file(logger)
+    def delete_by_labels(self, labels: Dict[str, str], grace: Optional[float] = None) -> Dict:
+        """Bulk delete every pod/container matching labels, e.g. {"pod": "web-1"} or {"tier": "batch"}."""
+        if not labels:
+            raise ValueError("delete_by_labels needs at least one label; use delete_namespace() to drain")
+        return self.teardown(self.targets_for(labels), grace=grace)
+
+    @log_to_file(logger)
+    def delete_pods(self, names: List[str], grace: Optional[float] = None) -> Dict:
+        """Bulk delete pods by name (pod label), all under one grace deadline."""
+        targets: List[Tuple[Optional[Dict], List[Dict]]] = []
+        for name in dict.fromkeys(names):
+            targets += self.targets_for({"pod": name})
+        return self.teardown(targets, grace=grace)
+
+    @log_to_file(logger)
+    def delete_namespace(self, grace: Optional[float] = None, include_unlabelled: bool = False) -> Dict:
+        """
+        Drain: delete every dibba pod/container in the client's containerd namespace;
+        include_unlabelled=True also deletes containers dibba didn't create.
+        """
+        return self.teardown(self.targets_for({}, include_unlabelled=include_unlabelled), grace=grace)
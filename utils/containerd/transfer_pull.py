@@ -0,0 +1,212 @@
+"""
+transfer_pull.py
+Image pull engine on containerd's Transfer service (containerd >= 2.0).
+
+- source: OCIRegistry(reference), destination: ImageStore with an UnpackConfiguration,
+  so containerd unpacks layers into the snapshotter while the rest are still downloading
+- per-layer progress is streamed back over the Streaming service and handed to a callback
+- the Transfer RPC runs as a future: it honours a deadline and can be cancelled
+  (cancel_event, or a progress callback raising PullCancelled)
+
+Env:
+  CONTAINERD_REGISTRY_HOST_DIR  hosts dir for the registry resolver (e.g. /etc/containerd/certs.d)
+  CONTAINERD_PULL_TIMEOUT       default pull deadline in seconds (default: 900)
+"""
+
+import os
+import time
+import uuid
+import queue
+import threading
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Callable
+
+import grpc
+from google.protobuf import any_pb2
+
+from generated.api.services.transfer.v1 import transfer_pb2
+from generated.api.services.streaming.v1 import streaming_pb2
+from generated.api.types import platform_pb2
+from generated.api.types.transfer import registry_pb2, imagestore_pb2, progress_pb2
+from logpkg.log_kcld import LogKCld, log_to_file
+
+logger = LogKCld()
+
+REGISTRY_HOST_DIR = os.environ.get("CONTAINERD_REGISTRY_HOST_DIR", "")
+PULL_TIMEOUT = float(os.environ.get("CONTAINERD_PULL_TIMEOUT", "900"))
+
+
+class PullCancelled(RuntimeError):
+    pass
+
+
+class TransferUnavailable(RuntimeError):
+    """containerd has no Transfer service (older daemon / plugin disabled); callers fall back to CRI."""
+
+
+@dataclass
+class LayerProgress:
+    name: str
+    event: str = ""
+    progress: int = 0
+    total: int = 0
+
+
+@dataclass
+class PullProgress:
+    image: str
+    started_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    layers: Dict[str, LayerProgress] = field(default_factory=dict)
+    last_event: str = ""
+
+    def update(self, p) -> None:
+        self.last_event = p.event
+        if not p.name:
+            return
+        layer = self.layers.setdefault(p.name, LayerProgress(name=p.name))
+        layer.event = p.event or layer.event
+        if p.progress:
+            layer.progress = p.progress
+        if p.total:
+            layer.total = p.total
+
+    def to_dict(self) -> Dict:
+        done = sum(l.progress for l in self.layers.values())
+        total = sum(l.total for l in self.layers.values())
+        return {
+            "image": self.image,
+            "event": self.last_event,
+            "bytes_done": done,
+            "bytes_total": total,
+            "elapsed": round((self.finished_at or time.time()) - self.started_at, 3),
+            "layers": {n: {"event": l.event, "progress": l.progress, "total": l.total}
+                       for n, l in self.layers.items()},
+        }
+
+
+def normalize_image_ref(ref: str) -> str:
+    """
+    'nginx' -> 'docker.io/library/nginx:latest', 'me/app:1' -> 'docker.io/me/app:1'.
+    The Transfer service (unlike CRI) wants fully qualified references.
+    """
+    last = ref.split("/")[-1]
+    if "@" not in last and ":" not in last:
+        ref = ref + ":latest"
+    parts = ref.split("/")
+    if len(parts) == 1:
+        return f"docker.io/library/{ref}"
+    if "." not in parts[0] and ":" not in parts[0] and parts[0] != "localhost":
+        return f"docker.io/{ref}"
+    return ref
+
+
+def _pack(msg) -> any_pb2.Any:
+    a = any_pb2.Any()
+    a.Pack(msg)
+    return a
+
+
+class TransferPuller:
+    @log_to_file(logger)
+    def __init__(self, client, snapshotter: str, platform_os: str, platform_arch: str):
+        self.c = client
+        self.snapshotter = snapshotter
+        self.platform = platform_pb2.Platform(os=platform_os, architecture=platform_arch)
+
+    def _open_progress_stream(self, stream_id: str, timeout: Optional[float]):
+        """
+        Streaming.Stream handshake: send StreamInit(id), wait for the ack; containerd then
+        writes Progress messages into the stream named by TransferOptions.progress_stream.
+        """
+        outbox: "queue.Queue[Optional[any_pb2.Any]]" = queue.Queue()
+
+        def _requests():
+            yield _pack(streaming_pb2.StreamInit(id=stream_id))
+            while True:
+                item = outbox.get()
+                if item is None:
+                    return
+                yield item
+
+        call = self.c.streaming.Stream(_requests(), timeout=timeout)
+        next(call)  # ack
+        return call, outbox
+
+    @log_to_file(logger)
+    def pull(self, image_ref: str,
+             progress_cb: Optional[Callable[[PullProgress], None]] = None,
+             timeout: Optional[float] = PULL_TIMEOUT,
+             cancel_event: Optional[threading.Event] = None) -> PullProgress:
+        ref = normalize_image_ref(image_ref)
+        state = PullProgress(image=ref)
+        stream_id = f"pull-{uuid.uuid4().hex[:12]}"
+
+        try:
+            stream_call, outbox = self._open_progress_stream(stream_id, timeout)
+        except grpc.RpcError as e:
+            if e.code() == grpc.StatusCode.UNIMPLEMENTED:
+                raise TransferUnavailable(f"Streaming service unavailable: {e.details()}") from e
+            raise
+
+        cancelled = threading.Event()
+
+        def _consume():
+            try:
+                for a in stream_call:
+                    if not a.Is(progress_pb2.Progress.DESCRIPTOR):
+                        continue
+                    p = progress_pb2.Progress()
+                    a.Unpack(p)
+                    state.update(p)
+                    if progress_cb:
+                        try:
+                            progress_cb(state)
+                        except PullCancelled:
+                            cancelled.set()
+                            return
+            except grpc.RpcError:
+                pass  # stream is torn down when the transfer finishes or is cancelled
+
+        reader = threading.Thread(target=_consume, name=f"{stream_id}-progress", daemon=True)
+        reader.start()
+
+        req = transfer_pb2.TransferRequest(
+            source=_pack(registry_pb2.OCIRegistry(
+                reference=ref,
+                resolver=registry_pb2.RegistryResolver(host_dir=REGISTRY_HOST_DIR) if REGISTRY_HOST_DIR else None,
+            )),
+            destination=_pack(imagestore_pb2.ImageStore(
+                name=ref,
+                platforms=[self.platform],
+                unpacks=[imagestore_pb2.UnpackConfiguration(platform=self.platform,
+                                                            snapshotter=self.snapshotter)],
+            )),
+            options=transfer_pb2.TransferOptions(progress_stream=stream_id),
+        )
+
+        done = threading.Event()
+        fut = self.c.transfer.Transfer.future(req, timeout=timeout)
+        fut.add_done_callback(lambda _f: done.set())
+        try:
+            while not done.wait(0.25):
+                if cancelled.is_set() or (cancel_event is not None and cancel_event.is_set()):
+                    fut.cancel()
+                    raise PullCancelled(f"pull of {ref} cancelled")
+            try:
+                fut.result()
+            except grpc.RpcError as e:
+                if e.code() == grpc.StatusCode.UNIMPLEMENTED:
+                    raise TransferUnavailable(f"Transfer service unavailable: {e.details()}") from e
+                if e.code() == grpc.StatusCode.DEADLINE_EXCEEDED:
+                    raise TimeoutError(f"pull of {ref} exceeded {timeout}s") from e
+                raise
+        finally:
+            state.finished_at = time.time()
+            outbox.put(None)
+            stream_call.cancel()
+            reader.join(timeout=1.0)
+
+        print(f"[transfer] pulled {ref} in {state.finished_at - state.started_at:.1f}s "
+              f"({len(state.layers)} progress entries)")
+        return state
@@ -0,0 +1,175 @@
+"""
+warm_pool.py
+Per-node pool of ready pause sandboxes (pause task running, CNI attached).
+
+create_pod_task claims one instead of building a sandbox, so a pod start only pays for
+its app containers. A claimed sandbox is "renamed" by relabelling it (pod=<name>);
+containerd IDs are immutable, so pod["pause"]["cid"] stays the pool ID. The app
+containers set the pod hostname in the shared UTS namespace when they start.
+
+containerd labels are the pool's only state, so every prefork worker process on the
+node sees the same pool. Claims and refills are serialized per namespace with a
+node lock (see node_lock.py).
+
+Env:
+  WARM_POOL_SIZE      default ready sandboxes per namespace (default: 0 = disabled)
+  WARM_POOL_SIZES     per-namespace overrides, e.g. "k8s.io=8,tenant-a=2"
+"""
+
+import os
+import uuid
+import threading
+from typing import Optional, Dict, List
+
+import grpc
+from google.protobuf import field_mask_pb2
+
+from generated.api.services.containers.v1 import containers_pb2
+from generated.api.services.tasks.v1 import tasks_pb2
+from generated.api.types.task import task_pb2 as task_types_pb2
+from utils.containerd.containerd_interface import PodManager, DEFAULT_CNI_NET_NAME, DEFAULT_IFNAME
+from utils.containerd.schemas import ResourceSpec
+from utils.containerd.node_lock import node_lock
+from utils.containerd.phase_metrics import timed
+from utils.redis.lifecycle_events import emit
+from logpkg.log_kcld import LogKCld, log_to_file
+
+logger = LogKCld()
+
+WARM_POOL_SIZE = int(os.environ.get("WARM_POOL_SIZE", "0"))
+WARM_POOL_SIZES = os.environ.get("WARM_POOL_SIZES", "")
+
+POOL_LABEL = "dibba.pool"                # warm | claimed
+POOL_NET_LABEL = "dibba.pool.network"
+POOL_IFNAME_LABEL = "dibba.pool.ifname"
+POOL_SNAPSHOT_LABEL = "dibba.pool.snapshot"
+DEFAULT_PAUSE_IMAGE = "registry.k8s.io/pause:3.9"
+
+
+def pool_size_for(namespace: str) -> int:
+    for item in WARM_POOL_SIZES.split(","):
+        ns, _, size = item.partition("=")
+        if ns.strip() == namespace and size.strip().isdigit():
+            return int(size)
+    return WARM_POOL_SIZE
+
+
+class WarmPool:
+    @log_to_file(logger)
+    def __init__(self, pods: PodManager, size: Optional[int] = None,
+                 pause_image: str = DEFAULT_PAUSE_IMAGE,
+                 resources: Optional[ResourceSpec] = None,
+                 cni_network: str = DEFAULT_CNI_NET_NAME,
+                 cni_ifname: str = DEFAULT_IFNAME):
+        self.pods = pods
+        self.namespace = pods.c.namespace
+        self.size = pool_size_for(self.namespace) if size is None else size
+        self.pause_image = pause_image
+        self.resources = resources or ResourceSpec(cpu_millicores=100, memory="64Mi")
+        self.cni_network = cni_network
+        self.cni_ifname = cni_ifname
+        self._refill_thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    def _filters(self, state: str) -> List[str]:
+        return [f'labels."{POOL_LABEL}"=="{state}",labels.role=="pause",'
+                f'labels."{POOL_NET_LABEL}"=="{self.cni_network}",'
+                f'labels."{POOL_IFNAME_LABEL}"=="{self.cni_ifname}"']
+
+    def ready(self) -> List:
+        return self.pods.runtime.list_containers(self._filters("warm"))
+
+    def _running_pid(self, cid: str) -> Optional[int]:
+        try:
+            p = self.pods.c.tasks.Get(tasks_pb2.GetRequest(container_id=cid)).process
+        except grpc.RpcError:
+            return None
+        return p.pid if p.status == task_types_pb2.RUNNING and p.pid else None
+
+    def _pod_dict(self, name: str, c, pid: int) -> Dict:
+        return {"name": name,
+                "pause": {"cid": c.id, "pid": pid},
+                "ns": {k: f"/proc/{pid}/ns/{k}" for k in ["pid", "net", "ipc", "uts"]},
+                # only sandboxes whose CNI ADD succeeded are pooled (_create_one)
+                "cni": {"network": self.cni_network, "ifname": self.cni_ifname, "attached": True},
+                "snapshot_key": c.labels.get(POOL_SNAPSHOT_LABEL, ""),
+                "warm": True}
+
+    @log_to_file(logger)
+    @timed("warm_claim")
+    def claim(self, name: str) -> Optional[Dict]:
+        """Take a ready sandbox and relabel it as pod `name`; None if the pool is empty."""
+        if not self.enabled:
+            return None
+        dead: List[Dict] = []
+        claimed = None
+        with node_lock(f"warm-pool-{self.namespace}.lock"):
+            for c in self.ready():
+                pid = self._running_pid(c.id)
+                labels = dict(c.labels)
+                if pid is None:
+                    labels[POOL_LABEL] = "dead"
+                    dead.append(self._pod_dict(c.id, c, 0))
+                else:
+                    labels.update({POOL_LABEL: "claimed", "pod": name})
+                self.pods.c.containers.Update(containers_pb2.UpdateContainerRequest(
+                    container=containers_pb2.Container(id=c.id, labels=labels),
+                    update_mask=field_mask_pb2.FieldMask(paths=["labels"]),
+                ))
+                if pid is not None:
+                    claimed = self._pod_dict(name, c, pid)
+                    break
+        if dead:
+            print(f"[warm-pool] discarding {len(dead)} dead sandbox(es)")
+            self.pods.delete_pods([(pod, None) for pod in dead])
+        if claimed:
+            print(f"♨️  Claimed warm sandbox {claimed['pause']['cid']} for pod {name}")
+            emit(self.namespace, "sandbox_claimed", pod=name, cid=claimed["pause"]["cid"])
+        self.refill_async()
+        return claimed
+
+    def _create_one(self) -> None:
+        cid = f"warm-{uuid.uuid4().hex[:12]}"
+        pod = self.pods.create_pod(name=cid, pause_image=self.pause_image, resources=self.resources,
+                                   cni_network=self.cni_network, cni_ifname=self.cni_ifname)
+        if not pod["cni"].get("attached"):
+            self.pods.delete_pod(pod)
+            raise RuntimeError(f"CNI attach failed for warm sandbox {cid}")
+        c = self.pods.c.containers.Get(containers_pb2.GetContainerRequest(id=cid)).container
+        labels = dict(c.labels)
+        labels.update({POOL_LABEL: "warm", POOL_NET_LABEL: self.cni_network,
+                       POOL_IFNAME_LABEL: self.cni_ifname, POOL_SNAPSHOT_LABEL: pod["snapshot_key"]})
+        self.pods.c.containers.Update(containers_pb2.UpdateContainerRequest(
+            container=containers_pb2.Container(id=cid, labels=labels),
+            update_mask=field_mask_pb2.FieldMask(paths=["labels"]),
+        ))
+
+    @log_to_file(logger)
+    def fill(self) -> int:
+        """Top the pool up to size; only one process per node refills at a time. Returns sandboxes added."""
+        if not self.enabled:
+            return 0
+        added = 0
+        with node_lock(f"warm-pool-{self.namespace}.refill.lock", blocking=False) as got:
+            if not got:
+                return 0
+            missing = self.size - len(self.ready())
+            for _ in range(max(0, missing)):
+                try:
+                    self._create_one()
+                    added += 1
+                except Exception as e:
+                    print(f"[warm-pool] refill failed: {e}")
+                    break
+        if added:
+            print(f"[warm-pool] {self.namespace}: added {added} sandbox(es)")
+        return added
+
+    def refill_async(self) -> None:
+        if not self.enabled or (self._refill_thread is not None and self._refill_thread.is_alive()):
+            return
+        self._refill_thread = threading.Thread(target=self.fill, name=f"warm-pool-{self.namespace}", daemon=True)
+        self._refill_thread.start()
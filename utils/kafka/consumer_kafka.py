@@ -11,7 +11,6 @@ import multiprocessing
 stop_event = multiprocessing.Event()
 
 
-@log_to_file(logger)
 def json_serializer(data):
     return json.dumps(data).encode("utf-8")
 
@@ -16,7 +16,6 @@ def get_faker_data():
             "by": fake.year()}
 
 
-@log_to_file(logger)
 def json_serializer(data):
     return json.dumps(data).encode("utf-8")
 
@@ -0,0 +1,100 @@
+"""
+bench_record_codec.py
+Record codecs on a synthetic 10k-node dataset (nodes, node_config, containers): encoded
+size and encode/decode throughput per codec, in process. With --redis it also writes the
+dataset to scratch hashes on the redis_db server and reports HSET/HGETALL+decode time and
+MEMORY USAGE per codec (the scratch keys are deleted afterwards).
+
+  python -m utils.redis.bench_record_codec [nodes] [--redis]
+"""
+
+import sys
+import time
+import random
+from typing import Dict, List
+
+from utils.redis.record_codec import RecordCodec, get_record_codec, encode_record, decode_record
+
+CONTAINERS_PER_NODE = 10
+
+
+def dataset(n: int) -> Dict[str, Dict[str, Dict]]:
+    rnd = random.Random(42)
+    nodes, configs, containers = {}, {}, {}
+    for i in range(n):
+        name = f"ip-10-{i // 65536 % 256}-{i // 256 % 256}-{i % 256}.ec2.internal"
+        nodes[name] = {"IpAddress": f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}",
+                       "InstanceId": f"i-{rnd.getrandbits(68):017x}",
+                       "NameSpace": f"tenant-{i % 50}",
+                       "InstanceType": rnd.choice(["m5.large", "m5.xlarge", "c6i.2xlarge"])}
+        configs[name] = {"cpu": rnd.choice([2, 4, 8, 16]), "memory": rnd.choice([4096, 8192, 16384, 32768])}
+        for j in range(CONTAINERS_PER_NODE):
+            containers[f"pod-{i}-{j}"] = {"ipaddress": f"192.168.{i % 256}.{j}", "node": name}
+    return {"nodes": nodes, "node_config": configs, "containers": containers}
+
+
+def _codecs() -> List[RecordCodec]:
+    out = [get_record_codec("json")]
+    try:
+        out.append(get_record_codec("msgpack"))
+    except ValueError as e:
+        print(f"skipping msgpack: {e}")
+    return out
+
+
+def bench_codec(codec: RecordCodec, data: Dict[str, Dict[str, Dict]]) -> Dict[str, float]:
+    records = [r for table in data.values() for r in table.values()]
+    t0 = time.perf_counter()
+    encoded = [encode_record(r, codec) for r in records]
+    enc = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for e in encoded:
+        decode_record(e)
+    dec = time.perf_counter() - t0
+    return {"records": len(records), "bytes": sum(map(len, encoded)),
+            "encode_per_sec": len(records) / enc, "decode_per_sec": len(records) / dec}
+
+
+def bench_redis(codec: RecordCodec, data: Dict[str, Dict[str, Dict]]) -> Dict[str, float]:
+    from utils.redis.redis_pool import get_redis_client
+
+    r = get_redis_client("db")
+    keys = {table: f"bench_record_codec:{codec.name}:{table}" for table in data}
+    try:
+        t0 = time.perf_counter()
+        pipe = r.pipeline(transaction=False)
+        for table, rows in data.items():
+            items = list(rows.items())
+            for i in range(0, len(items), 1000):
+                pipe.hset(keys[table], mapping={k: encode_record(v, codec) for k, v in items[i:i + 1000]})
+        pipe.execute()
+        write = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for key in keys.values():
+            for raw in r.hgetall(key).values():
+                decode_record(raw)
+        read = time.perf_counter() - t0
+        memory = sum(r.memory_usage(key, samples=0) or 0 for key in keys.values())
+    finally:
+        r.delete(*keys.values())
+    return {"write_sec": write, "read_sec": read, "memory": memory}
+
+
+def main(n: int = 10000, redis: bool = False) -> None:
+    data = dataset(n)
+    print(f"nodes: {n}  containers: {len(data['containers'])}  (current codec: {get_record_codec().name})")
+    base = None
+    for codec in _codecs():
+        b = bench_codec(codec, data)
+        base = base or b
+        print(f"{codec.name:8s} {b['bytes'] / 1e6:7.2f} MB ({b['bytes'] / base['bytes']:.2f}x)  "
+              f"encode {b['encode_per_sec'] / 1e3:7.1f}k rec/s  decode {b['decode_per_sec'] / 1e3:7.1f}k rec/s")
+        if redis:
+            rb = bench_redis(codec, data)
+            print(f"{'':8s} redis: HSET {rb['write_sec']:.2f}s  HGETALL+decode {rb['read_sec']:.2f}s  "
+                  f"MEMORY USAGE {rb['memory'] / 1e6:.2f} MB")
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    main(int(args[0]) if args else 10000, redis="--redis" in sys.argv)
@@ -0,0 +1,374 @@
+"""
+hc_engine.py
+Long-running health checker for the URLs registered per cluster (hash url_to_cluster).
+
+Replaces the beat-fired one-shot health_check_task, which paid for a new event loop,
+HTTP session (fresh TCP/TLS to every target), and Redis connections every 5 seconds:
+  - one event loop and one aiohttp session live as long as the engine: connections are
+    kept alive between checks and DNS answers are cached (HC_DNS_TTL_SEC)
+  - every target has its own schedule: the first check lands at a random offset inside
+    its interval, later ones every interval +/- HC_JITTER_PCT, anchored to monotonic
+    deadlines so slow checks don't make the cadence drift (missed slots are skipped,
+    not burst)
+  - the target list (url_to_cluster or the cluster_urls:<cluster> sets, per-cluster
+    "interval" from cluster_health) is re-read from Redis when health_targets:version
+    changed, polled every HC_RELOAD_SEC: new URLs start, removed ones stop, changed
+    intervals apply from the next check
+  - at most HC_MAX_CONCURRENCY checks are in flight
+  - results are buffered and written with redis.asyncio (AsyncHcTrack) every
+    HC_FLUSH_SEC or HC_FLUSH_BATCH results: one pipelined Lua call per cluster updates
+    failure counts, healthy_urls:<cluster> and TTLs, so checks never wait on Redis
+
+One engine checks for the whole cluster, so failure counts grow once per interval no
+matter how many hosts run a health_check worker: every worker process starts an engine,
+a node lock lets one process per host compete, and the winner of the Redis lease
+health_check_engine:leader (SET NX PX, HC_LEADER_TTL_SEC) runs. It renews the lease
+every third of its TTL and stops checking as soon as a renewal fails; the others stand
+by and the first to see the lease expire takes over. Standalone:  python -m utils.redis.hc_engine
+
+Env:
+  HC_INTERVAL_SEC      default check interval when the cluster sets none (default: 5)
+  HC_TIMEOUT_SEC       per-check HTTP timeout (default: 5)
+  HC_MAX_CONCURRENCY   max checks in flight (default: 500)
+  HC_RELOAD_SEC        seconds between checks of the target list version in Redis (default: 10)
+  HC_JITTER_PCT        +/- percent of the interval added to each schedule (default: 10)
+  HC_DNS_TTL_SEC       DNS cache TTL of the shared session (default: 300)
+  HC_KEEPALIVE_SEC     idle keepalive of pooled connections (default: 30)
+  HC_CLUSTERS          comma-separated clusters to check (default: unset, every cluster)
+  HC_FLUSH_SEC         max seconds a result waits before being written to Redis (default: 0.5)
+  HC_FLUSH_BATCH       results that trigger an early write (default: 500)
+  HC_LEADER_TTL_SEC    lease TTL of the running engine; takeover time if it dies (default: 15)
+"""
+
+import os
+import math
+import time
+import uuid
+import random
+import asyncio
+import threading
+from socket import gethostname
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import aiohttp
+
+from utils.containerd.node_lock import node_lock
+from logpkg.log_kcld import LogKCld, log_to_file
+
+logger = LogKCld()
+
+HC_INTERVAL_SEC = float(os.environ.get("HC_INTERVAL_SEC", "5"))
+HC_TIMEOUT_SEC = float(os.environ.get("HC_TIMEOUT_SEC", "5"))
+HC_MAX_CONCURRENCY = int(os.environ.get("HC_MAX_CONCURRENCY", "500"))
+HC_RELOAD_SEC = float(os.environ.get("HC_RELOAD_SEC", "10"))
+HC_JITTER_PCT = float(os.environ.get("HC_JITTER_PCT", "10"))
+HC_DNS_TTL_SEC = int(os.environ.get("HC_DNS_TTL_SEC", "300"))
+HC_KEEPALIVE_SEC = float(os.environ.get("HC_KEEPALIVE_SEC", "30"))
+HC_CLUSTERS = os.environ.get("HC_CLUSTERS", "")
+HC_FLUSH_SEC = float(os.environ.get("HC_FLUSH_SEC", "0.5"))
+HC_FLUSH_BATCH = int(os.environ.get("HC_FLUSH_BATCH", "500"))
+HC_LEADER_TTL_SEC = float(os.environ.get("HC_LEADER_TTL_SEC", "15"))
+
+MIN_INTERVAL_SEC = 0.5
+
+
+@dataclass
+class HcTarget:
+    cluster: str
+    url: str
+    interval: float
+    task: Optional[asyncio.Task] = None
+
+
+class HealthCheckEngine:
+    @log_to_file(logger)
+    def __init__(self, clusters: Optional[Iterable[str]] = None,
+                 interval: float = HC_INTERVAL_SEC,
+                 timeout: float = HC_TIMEOUT_SEC,
+                 max_concurrency: int = HC_MAX_CONCURRENCY,
+                 reload_sec: float = HC_RELOAD_SEC,
+                 jitter_pct: float = HC_JITTER_PCT,
+                 leader_ttl: float = HC_LEADER_TTL_SEC,
+                 rd=None, tracker_factory=None):
+        if clusters is None and HC_CLUSTERS:
+            clusters = [c.strip() for c in HC_CLUSTERS.split(",") if c.strip()]
+        self.clusters = set(clusters) if clusters else None   # None: every cluster
+        self.interval = interval
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.reload_sec = reload_sec
+        self.jitter = max(0.0, min(jitter_pct, 50.0)) / 100.0
+        self.leader_ttl = max(leader_ttl, 1.0)
+        self.owner = f"{gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._rd = rd
+        self._tracker_factory = tracker_factory
+        self._tracker = None
+        self._pending: List[Tuple[str, str, str]] = []
+        self._flush_now: Optional[asyncio.Event] = None
+        self.targets: Dict[Tuple[str, str], HcTarget] = {}
+        self._version: Optional[int] = None
+        self._http: Optional[aiohttp.ClientSession] = None
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop_event: Optional[asyncio.Event] = None
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------- redis ----------
+    @property
+    def rd(self):
+        if self._rd is None:
+            from utils.redis.redis_interface import RedisInterface
+            self._rd = RedisInterface()
+        return self._rd
+
+    def _new_tracker(self):
+        # redis.asyncio connections belong to the loop that made them: one tracker per run
+        if self._tracker_factory is not None:
+            return self._tracker_factory()
+        from utils.redis.hc_track import AsyncHcTrack
+        return AsyncHcTrack()
+
+    def _interval_for(self, cfg: Optional[Dict]) -> float:
+        try:
+            return max(MIN_INTERVAL_SEC, float((cfg or {}).get("interval") or self.interval))
+        except (TypeError, ValueError):
+            return self.interval
+
+    def desired_targets(self) -> Dict[Tuple[str, str], float]:
+        """(cluster, url) -> interval for everything this engine should be checking."""
+        health = self.rd.get_cluster_health()
+        return {(cluster, url): self._interval_for(health.get(cluster))
+                for url, cluster in self.rd.get_url_clusters(self.clusters).items()}
+
+    def _reload_if_changed(self) -> Optional[Dict[Tuple[str, str], float]]:
+        # None when the version is unchanged; an unset version always reloads
+        version = self.rd.get_health_targets_version()
+        if version is not None and version == self._version:
+            return None
+        desired = self.desired_targets()
+        self._version = version
+        return desired
+
+    # ---------- checks ----------
+    def _session(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency, use_dns_cache=True,
+                                         ttl_dns_cache=HC_DNS_TTL_SEC, keepalive_timeout=HC_KEEPALIVE_SEC,
+                                         ssl=False)
+        return aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout))
+
+    async def check(self, cluster: str, url: str) -> Dict:
+        ct = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        async with self._sem:
+            try:
+                async with self._http.get(url, allow_redirects=False) as response:
+                    await response.read()  # drain so the connection goes back to the pool
+                    status = 'healthy' if response.status == 200 else 'unhealthy'
+                    result = {'current time': ct, 'url': url, 'status': status, 'status_code': response.status}
+            except Exception as exc:
+                status = 'unhealthy'
+                result = {'current time': ct, 'url': url, 'status': status, 'status_code': None, 'error': str(exc)}
+        await self.record(cluster, url, status)
+        return result
+
+    async def record(self, cluster: str, url: str, status: str) -> None:
+        self._pending.append((cluster, url, status))
+        if len(self._pending) >= HC_FLUSH_BATCH and self._flush_now is not None:
+            self._flush_now.set()
+
+    async def flush(self) -> None:
+        """Write the buffered results in one pipeline; a failed write is dropped (next checks rewrite)."""
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        try:
+            await self._tracker.track_batch(batch)
+        except Exception as e:
+            print(f"[hc] dropped {len(batch)} results, redis write failed: {e}")
+
+    async def _flusher(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_now.wait(), HC_FLUSH_SEC)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_now.clear()
+            await self.flush()
+
+    async def _open(self) -> aiohttp.ClientSession:
+        self._sem = asyncio.Semaphore(self.max_concurrency)
+        self._flush_now = asyncio.Event()
+        self._pending = []
+        self._tracker = self._new_tracker()
+        self._http = self._session()
+        return self._http
+
+    async def _close(self) -> None:
+        try:
+            await self.flush()
+        finally:
+            await self._http.close()
+            await self._tracker.close()
+
+    async def _run_target(self, t: HcTarget) -> None:
+        loop = asyncio.get_running_loop()
+        next_at = loop.time() + random.uniform(0, t.interval)   # spread first checks over the interval
+        while True:
+            await asyncio.sleep(max(0.0, next_at - loop.time()))
+            await self.check(t.cluster, t.url)
+            next_at += t.interval * (1.0 + random.uniform(-self.jitter, self.jitter))
+            behind = loop.time() - next_at
+            if behind > 0:
+                next_at += math.ceil(behind / t.interval) * t.interval
+
+    async def check_all(self) -> List[Dict]:
+        """One check of every target, now (the one-shot health_check_task path)."""
+        targets = await asyncio.to_thread(self.desired_targets)
+        await self._open()
+        try:
+            return list(await asyncio.gather(*(self.check(c, u) for c, u in targets)))
+        finally:
+            await self._close()
+
+    # ---------- leadership ----------
+    def _acquire_lease(self) -> bool:
+        from utils.redis.redis_interface import HEALTH_ENGINE_LEASE
+        try:
+            return self.rd.acquire_lease(HEALTH_ENGINE_LEASE, self.owner, int(self.leader_ttl * 1000))
+        except Exception as e:
+            print(f"[hc] lease check failed: {e}")
+            return False
+
+    def _release_lease(self) -> None:
+        from utils.redis.redis_interface import HEALTH_ENGINE_LEASE
+        try:
+            self.rd.release_lease(HEALTH_ENGINE_LEASE, self.owner)
+        except Exception as e:
+            print(f"[hc] lease release failed (expires in {self.leader_ttl:.0f}s): {e}")
+
+    async def _keep_lease(self) -> None:
+        """Renew every third of the TTL; stop the engine once the lease is (or may be) lost."""
+        from utils.redis.redis_interface import HEALTH_ENGINE_LEASE
+        loop = asyncio.get_running_loop()
+        renewed_at = loop.time()
+        while True:
+            await asyncio.sleep(self.leader_ttl / 3)
+            try:
+                held = await asyncio.to_thread(self.rd.renew_lease, HEALTH_ENGINE_LEASE, self.owner,
+                                               int(self.leader_ttl * 1000))
+            except Exception as e:
+                print(f"[hc] lease renewal failed: {e}")
+                held = None
+            if held:
+                renewed_at = loop.time()
+            elif held is False or loop.time() - renewed_at >= self.leader_ttl:
+                print("[hc] engine lease lost, standing by")
+                self._stop_event.set()
+                return
+
+    # ---------- schedule ----------
+    async def reload(self) -> None:
+        try:
+            desired = await asyncio.to_thread(self._reload_if_changed)
+        except Exception as e:
+            print(f"[hc] target reload skipped, keeping {len(self.targets)} targets: {e}")
+            return
+        if desired is None:
+            return
+        removed = [k for k in self.targets if k not in desired]
+        for key in removed:
+            self.targets.pop(key).task.cancel()
+        added = 0
+        for key, interval in desired.items():
+            t = self.targets.get(key)
+            if t is None:
+                t = self.targets[key] = HcTarget(cluster=key[0], url=key[1], interval=interval)
+                t.task = asyncio.create_task(self._run_target(t), name=f"hc:{key[1]}")
+                added += 1
+            else:
+                t.interval = interval
+        if added or removed:
+            print(f"[hc] {len(self.targets)} targets (+{added} -{len(removed)})")
+
+    async def run(self, leased: bool = False) -> None:
+        """
+        Check until stop(): persistent session, per-target schedules, periodic reload.
+        leased: the caller holds the engine lease; keep renewing it and stop if it is lost.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        self._version = None
+        await self._open()
+        background = [asyncio.create_task(self._flusher(), name="hc:flush")]
+        if leased:
+            background.append(asyncio.create_task(self._keep_lease(), name="hc:lease"))
+        try:
+            while not self._stop_event.is_set():
+                await self.reload()
+                try:
+                    await asyncio.wait_for(self._stop_event.wait(), self.reload_sec)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            tasks = [t.task for t in self.targets.values()] + background
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.targets.clear()
+            await self._close()
+
+    # ---------- background ----------
+    def _serve(self) -> None:
+        # one process per host competes for the cluster-wide lease; standbys keep
+        # retrying so one takes over if the running engine dies
+        while not self._stopped.is_set():
+            with node_lock("health-check-engine.lock", blocking=False) as got:
+                if got and self._acquire_lease():
+                    print(f"[hc] engine started ({self.owner})")
+                    try:
+                        asyncio.run(self.run(leased=True))
+                    except Exception as e:
+                        print(f"[hc] engine stopped: {e}")
+                    finally:
+                        self._release_lease()
+            self._stopped.wait(min(self.reload_sec, self.leader_ttl / 3))
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._serve, name="health-check-engine", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._loop is not None and self._stop_event is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._stop_event.set)
+            except RuntimeError:
+                pass  # loop already closed
+
+
+_shared_engine: Optional[HealthCheckEngine] = None
+_shared_lock = threading.Lock()
+
+
+def get_health_check_engine() -> HealthCheckEngine:
+    global _shared_engine
+    if _shared_engine is None:
+        with _shared_lock:
+            if _shared_engine is None:
+                _shared_engine = HealthCheckEngine()
+    return _shared_engine
+
+
+if __name__ == "__main__":
+    engine = get_health_check_engine()
+    engine.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        engine.stop()
@@ -1,9 +1,9 @@
-import redis
+from utils.redis.redis_pool import get_redis_client
 class HcFailureTracker:
 
     def __init__(self):
     # Connect to Redis
-        self.redis_client = redis.StrictRedis(host='localhost', port=6379, db=1, decode_responses=True)
+        self.redis_client = get_redis_client("db")
 
 
     def hc_failure_tracker(self,hash_name, field, status,current_time, expiration_time=None,increment_by=1,):
@@ -1,4 +1,6 @@
-import redis
+from utils.redis.redis_pool import get_redis_client, new_async_redis_client
+import os
+from typing import Dict, Iterable, List, Tuple
 from utils.ReadConfig import ReadConfig as rc
 from logpkg.log_kcld import LogKCld, log_to_file
 logger = LogKCld()
@@ -6,14 +8,33 @@ logger = LogKCld()
 read_config = rc('/Users/krishnareddy/PycharmProjects/dibba/')
 redis_config = read_config.redis_queue_config
 
+HC_TRACK_TTL_SEC = int(os.environ.get("HC_TRACK_TTL_SEC", "60"))
+
+# KEYS[1] failure count hash (url -> consecutive failures), KEYS[2] healthy url set
+# ARGV[1] ttl, then url/status pairs; returns how many of the urls are failing
+_TRACK_BATCH_LUA = """
+local failing = 0
+for i = 2, #ARGV, 2 do
+  local url = ARGV[i]
+  if ARGV[i + 1] == 'healthy' then
+    redis.call('HSET', KEYS[1], url, 0)
+    redis.call('SADD', KEYS[2], url)
+  else
+    redis.call('HINCRBY', KEYS[1], url, 1)
+    redis.call('SREM', KEYS[2], url)
+    failing = failing + 1
+  end
+end
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+redis.call('EXPIRE', KEYS[2], ARGV[1])
+return failing
+"""
+
 class HcTrack:
     @log_to_file(logger)
     def __init__(self):
         # Connect to Redis
-        self.redis_client = redis.StrictRedis(host=redis_config['redis_host'], port=redis_config['redis_port'], db=redis_config['redis_db'], decode_responses=True, ssl=True,
-                                        ssl_ca_certs=redis_config['ssl_ca_certs'],
-                                        ssl_certfile=redis_config['ssl_certfile'],
-                                        ssl_keyfile=redis_config['ssl_keyfile'])
+        self.redis_client = get_redis_client("queue")
     @log_to_file(logger)
     def track_consecutive_failures(self, key:str,status:str,cluster_name:str,time:int=60):
         failure_count_key = f"{cluster_name}:::{key}:::failure_count"
@@ -38,3 +59,38 @@ class HcTrack:
             print(f"Health check failed. Consecutive failures: {current_count}")
         self.redis_client.expire(failure_count_key,60)
 
+
+class AsyncHcTrack:
+    """
+    redis.asyncio counterpart of HcTrack for the health check engine: a batch of results
+    is applied with one Lua script per cluster (failure counts, healthy_urls:<cluster>
+    membership and TTLs updated atomically), all clusters sent in one pipeline.
+    Create it inside the event loop that uses it.
+    """
+
+    @log_to_file(logger)
+    def __init__(self, ttl: int = HC_TRACK_TTL_SEC):
+        self.ttl = ttl
+        self.redis_client = new_async_redis_client("queue")
+        self._track_batch = self.redis_client.register_script(_TRACK_BATCH_LUA)
+
+    @staticmethod
+    def healthy_key(cluster_name: str) -> str:
+        return f"healthy_urls:{cluster_name}"
+
+    async def track_batch(self, results: Iterable[Tuple[str, str, str]]) -> Dict[str, int]:
+        """Apply (cluster, url, status) results; returns failing url count per cluster."""
+        by_cluster: Dict[str, List[str]] = {}
+        for cluster_name, url, status in results:
+            by_cluster.setdefault(cluster_name, []).extend((url, status))
+        if not by_cluster:
+            return {}
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            for cluster_name, pairs in by_cluster.items():
+                await self._track_batch(keys=[cluster_name, self.healthy_key(cluster_name)],
+                                        args=[self.ttl, *pairs], client=pipe)
+            failing = await pipe.execute()
+        return dict(zip(by_cluster, failing))
+
+    async def close(self) -> None:
+        await self.redis_client.aclose()
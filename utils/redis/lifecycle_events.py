@@ -0,0 +1,126 @@
+"""
+lifecycle_events.py
+Pod lifecycle event log: one Redis Stream per containerd namespace (lifecycle:<namespace>),
+trimmed to about LIFECYCLE_STREAM_MAXLEN entries.
+
+Events (field "event"; every entry also has "node" and "ts"):
+  sandbox_up          pod, cid, pid            pause container started
+  sandbox_claimed     pod, cid                 warm sandbox taken for pod
+  cni_attached        pod, cid, network, ip    (cni_failed on a failed ADD, with error)
+  container_started   pod, container, cid, pid, image
+  container_exited    cid, exit_status         init process exited (state tracker)
+  pod_deleted         pod                      pod torn down
+
+Producers call emit(); entries are queued and written by a background thread in
+pipelined XADD batches, so pod creation never waits on Redis (best-effort: events are
+dropped, with a message, if Redis is unreachable or LIFECYCLE_QUEUE_MAX is exceeded).
+
+Followers read incrementally instead of polling task results:
+  RedisInterface.read_lifecycle_events(ns, after_id)         plain tail (XREAD), e.g. GET /events/{ns}
+  RedisInterface.ensure_lifecycle_group(ns, group)            consumer group per service
+  RedisInterface.read_lifecycle_group(ns, group, consumer)    XREADGROUP, then ack_lifecycle_events
+  RedisInterface.claim_lifecycle_events(...)                  take over a dead consumer's pending entries
+
+Env:
+  LIFECYCLE_EVENTS         1 = publish events (default), 0 = off
+  LIFECYCLE_STREAM_MAXLEN  approximate max entries kept per namespace stream (default: 100000)
+  LIFECYCLE_QUEUE_MAX      max events waiting to be written per process (default: 10000)
+"""
+
+import os
+import time
+import queue
+import atexit
+import threading
+from socket import gethostname
+from typing import Dict, List, Optional, Tuple
+
+LIFECYCLE_EVENTS = os.environ.get("LIFECYCLE_EVENTS", "1") != "0"
+LIFECYCLE_STREAM_MAXLEN = int(os.environ.get("LIFECYCLE_STREAM_MAXLEN", "100000"))
+LIFECYCLE_QUEUE_MAX = int(os.environ.get("LIFECYCLE_QUEUE_MAX", "10000"))
+
+STREAM_PREFIX = "lifecycle"
+BATCH_MAX = 500
+_NODE = gethostname()
+
+
+def stream_key(namespace: str) -> str:
+    return f"{STREAM_PREFIX}:{namespace}"
+
+
+class _Publisher:
+    """Per-process queue + writer thread; a forked child starts its own on first emit."""
+
+    def __init__(self):
+        self._queue: "queue.Queue[Optional[Tuple[str, Dict[str, str]]]]" = queue.Queue(LIFECYCLE_QUEUE_MAX)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._dropped = 0
+        self._rd = None
+
+    def put(self, namespace: str, fields: Dict[str, str]) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="lifecycle-events", daemon=True)
+                    self._thread.start()
+        try:
+            self._queue.put_nowait((namespace, fields))
+        except queue.Full:
+            self._dropped += 1
+            if self._dropped % 1000 == 1:
+                print(f"[lifecycle] queue full, dropped {self._dropped} event(s)")
+
+    def _write(self, batch: List[Tuple[str, Dict[str, str]]]) -> None:
+        try:
+            if self._rd is None:
+                from utils.redis.redis_interface import RedisInterface
+                self._rd = RedisInterface()
+            self._rd.add_lifecycle_events(batch, maxlen=LIFECYCLE_STREAM_MAXLEN)
+        except Exception as e:
+            print(f"[lifecycle] dropped {len(batch)} event(s): {e}")
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            batch = []
+            while item is not None:
+                batch.append(item)
+                if len(batch) >= BATCH_MAX:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    item = None
+            if batch:
+                self._write(batch)
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self, timeout: float = 2.0) -> None:
+        """Best-effort wait for queued events to be written (used at exit)."""
+        deadline = time.monotonic() + timeout
+        while self._thread is not None and self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+
+_publisher = _Publisher()
+
+
+def _reset_after_fork() -> None:
+    global _publisher
+    _publisher = _Publisher()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+atexit.register(lambda: _publisher.flush())
+
+
+def emit(namespace: str, event: str, **fields) -> None:
+    """Queue a lifecycle event for lifecycle:<namespace>; None-valued fields are left out."""
+    if not LIFECYCLE_EVENTS:
+        return
+    entry = {"event": event, "node": _NODE, "ts": f"{time.time():.3f}"}
+    entry.update({k: str(v) for k, v in fields.items() if v is not None})
+    _publisher.put(namespace, entry)
@@ -0,0 +1,151 @@
+"""
+record_codec.py
+Encoding of the dict records RedisInterface keeps in hashes (nodes, containers,
+node_config, cluster_health).
+
+Stored value formats:
+  legacy   JSON text, untagged (everything written before this module, and what the json
+           codec still writes, so a rollback can read it)
+  tagged   0xC1 <codec id> <payload>; 0xC1 is never produced by msgpack and can't start
+           JSON or valid UTF-8, so tagged and legacy values can't be confused
+
+  codec id 1   msgpack
+
+Readers accept every format; writers use REDIS_RECORD_CODEC. A value not in the current
+format is rewritten when it is read (RedisInterface, compare-and-set so a concurrent
+write wins), so existing data migrates as it is used, without a bulk rewrite.
+register_codec() adds formats (ids 2..255).
+
+Redis clients are created with decode_responses=True and encoding_errors="surrogateescape"
+(redis_pool), so binary values arrive as str; decode_record() turns them back into the
+exact stored bytes.
+
+The CRI messages in apis/api.proto describe runtime objects, not these records, so
+protobuf is not used here.
+
+  python -m utils.redis.bench_record_codec     size/speed on a 10k-node dataset
+
+Env:
+  REDIS_RECORD_CODEC    msgpack (default when installed) or json
+  REDIS_RECORD_MIGRATE  1 = rewrite values in an old format when read (default), 0 = leave them
+"""
+
+import os
+import json
+from typing import Dict, Optional, Union
+
+try:
+    import msgpack
+except ImportError:  # optional: without it records stay JSON
+    msgpack = None
+
+REDIS_RECORD_CODEC = os.environ.get("REDIS_RECORD_CODEC", "msgpack" if msgpack is not None else "json")
+REDIS_RECORD_MIGRATE = os.environ.get("REDIS_RECORD_MIGRATE", "1") != "0"
+
+TAG = 0xC1
+Raw = Union[str, bytes]
+
+
+class RecordCodec:
+    name = ""
+    codec_id: Optional[int] = None   # None: untagged (legacy JSON)
+
+    def dumps(self, record: Dict) -> bytes:
+        raise NotImplementedError
+
+    def loads(self, payload: bytes) -> Dict:
+        raise NotImplementedError
+
+
+class JsonCodec(RecordCodec):
+    name = "json"
+
+    def dumps(self, record: Dict) -> bytes:
+        return json.dumps(record, separators=(",", ":")).encode("utf-8")
+
+    def loads(self, payload: bytes) -> Dict:
+        return json.loads(payload)
+
+
+class MsgpackCodec(RecordCodec):
+    name = "msgpack"
+    codec_id = 1
+
+    def dumps(self, record: Dict) -> bytes:
+        return msgpack.packb(record, use_bin_type=True)
+
+    def loads(self, payload: bytes) -> Dict:
+        return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+
+
+_json = JsonCodec()
+_by_id: Dict[int, RecordCodec] = {}
+_by_name: Dict[str, RecordCodec] = {"json": _json}
+
+
+def register_codec(codec: RecordCodec) -> None:
+    if codec.codec_id is not None:
+        if not 0 < codec.codec_id < 256:
+            raise ValueError(f"codec id must be 1..255, got {codec.codec_id}")
+        _by_id[codec.codec_id] = codec
+    _by_name[codec.name] = codec
+
+
+if msgpack is not None:
+    register_codec(MsgpackCodec())
+
+
+_current: Optional[RecordCodec] = None
+
+
+def get_record_codec(name: Optional[str] = None) -> RecordCodec:
+    """The named codec, or the one records are written with (REDIS_RECORD_CODEC)."""
+    global _current
+    if name is None and _current is not None:
+        return _current
+    if name is not None:
+        if name not in _by_name:
+            raise ValueError(f"record codec {name!r} is not available")
+        return _by_name[name]
+    codec = _by_name.get(REDIS_RECORD_CODEC)
+    if codec is None:
+        from logpkg.log_kcld import LogKCld  # lazy: the codec itself needs no config
+        LogKCld().warning("record codec %r unavailable, writing json", REDIS_RECORD_CODEC)
+        codec = _json
+    _current = codec
+    return codec
+
+
+def _as_bytes(raw: Raw) -> bytes:
+    return raw.encode("utf-8", "surrogateescape") if isinstance(raw, str) else raw
+
+
+def encode_record(record: Dict, codec: Optional[RecordCodec] = None) -> bytes:
+    codec = codec or get_record_codec()
+    payload = codec.dumps(record)
+    return payload if codec.codec_id is None else bytes((TAG, codec.codec_id)) + payload
+
+
+def _codec_of(data: bytes) -> RecordCodec:
+    if data[:1] != bytes((TAG,)):
+        return _json
+    codec = _by_id.get(data[1]) if len(data) > 1 else None
+    if codec is None:
+        raise ValueError(f"record encoded with unknown codec id {data[1:2].hex() or '?'}")
+    return codec
+
+
+def decode_record(raw: Raw) -> Dict:
+    data = _as_bytes(raw)
+    codec = _codec_of(data)
+    return codec.loads(data if codec.codec_id is None else data[2:])
+
+
+def needs_migration(raw: Raw) -> bool:
+    """True when raw is readable but not in the current write format."""
+    if not REDIS_RECORD_MIGRATE:
+        return False
+    try:
+        return _codec_of(_as_bytes(raw)) is not get_record_codec()
+    except ValueError:
+        return False
@@ -1,22 +1,82 @@
-import redis,ssl
+import redis
 import json
 from utils.ReadConfig import ReadConfig as rc
+from utils.redis.redis_pool import get_redis_client
+from utils.redis.record_codec import encode_record, decode_record, needs_migration
+from utils.redis.lifecycle_events import stream_key as lifecycle_stream_key
 from logpkg.log_kcld import LogKCld, log_to_file
 logger = LogKCld()
 
 read_conf = rc()
 redis_config = read_conf.redis_db_config
 
+NODE_IP_INDEX = "node_ip_index"
+INSTANCE_NODE_INDEX = "instance_node_index"
+NAMESPACE_INSTANCES = "namespace_instances"
+NODE_CONTAINERS = "node_containers"
+NODE_CAPACITY = "node_capacity"
+CLUSTER_URLS = "cluster_urls"
+HEALTH_TARGETS_VERSION = "health_targets:version"
+HEALTH_ENGINE_LEASE = "health_check_engine:leader"
+INDEX_VERSION_KEY = "redis_indexes:version"
+INDEX_VERSION = "2"
+
+# rewrite field ARGV[1] with ARGV[3] only if it still holds ARGV[2]
+_MIGRATE_RECORD_LUA = """
+if redis.call('HGET', KEYS[1], ARGV[1]) == ARGV[2] then
+  return redis.call('HSET', KEYS[1], ARGV[1], ARGV[3])
+end
+return 0
+"""
+
+# lease KEYS[1] held by ARGV[1]: extend it to ARGV[2] ms / delete it, only if still ours
+_RENEW_LEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_LEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
 
 class RedisInterface:
     @log_to_file(logger)
     def __init__(self, host: str = 'localhost', port: int = 6379, db: int = 1):
-        print(f"{redis_config['ssl_ca_certs'], redis_config['ssl_certfile'], redis_config['ssl_keyfile']}")
-        self.redis_client = redis.Redis(host=redis_config['redis_host'], port=redis_config['redis_port'], db=redis_config['redis_db'], decode_responses=True, ssl=True,
-                                        ssl_ca_certs=redis_config['ssl_ca_certs'],
-                                        ssl_certfile=redis_config['ssl_certfile'],
-                                        ssl_keyfile=redis_config['ssl_keyfile'],
-                                        ssl_cert_reqs=ssl.CERT_REQUIRED)
+        # a view on the process-wide pool for redis_db: no new connection per instance
+        self.redis_client = get_redis_client("db")
+        self._migrate_record = self.redis_client.register_script(_MIGRATE_RECORD_LUA)
+        self._renew_lease = self.redis_client.register_script(_RENEW_LEASE_LUA)
+        self._release_lease = self.redis_client.register_script(_RELEASE_LEASE_LUA)
+
+    # Records in the nodes/containers/node_config/cluster_health hashes go through record_codec;
+    # values still in an older format are rewritten in the current one as they are read.
+    def _decode_records(self, key, raw: dict) -> dict:
+        out = {field: decode_record(data) for field, data in raw.items()}
+        self._migrate(key, {field: data for field, data in raw.items() if needs_migration(data)})
+        return out
+
+    def _decode_record(self, key, field, data):
+        if not data:
+            return None
+        if needs_migration(data):
+            self._migrate(key, {field: data})
+        return decode_record(data)
+
+    def _migrate(self, key, stale: dict):
+        if not stale:
+            return
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for field, data in stale.items():
+                self._migrate_record(keys=[key], args=[field, data, encode_record(decode_record(data))], client=pipe)
+            pipe.execute()
+        except Exception as e:
+            logger.warning("record migration in %s skipped: %s", key, e)
 
     @log_to_file(logger)
     def save_user_pass(self, user, password):
@@ -27,124 +87,322 @@ class RedisInterface:
         password = self.redis_client.hget("authentication", user)
         return password or None
 
+    # Secondary indexes, maintained in the same MULTI/EXEC as the primary hash writes:
+    #   node_ip_index                 hash  IpAddress -> node name
+    #   instance_node_index           hash  InstanceId -> node name
+    #   namespace_instances:<ns>      set   InstanceIds of the namespace's nodes
+    #   node_containers:<node>        set   container names on the node
+    #   node_capacity:cpu / :memory   zset  node name scored by its node_config value
+    #   cluster_urls:<cluster>        set   health-check URLs of the cluster (url_to_cluster reversed)
+    # Data written before the indexes existed is indexed once by rebuild_indexes().
+    _indexes_ready = False
+
+    @staticmethod
+    def _index_node(pipe, name, data: dict, add: bool = True):
+        ip, iid, ns = data.get("IpAddress"), data.get("InstanceId"), data.get("NameSpace")
+        if add:
+            if ip:
+                pipe.hset(NODE_IP_INDEX, ip, name)
+            if iid:
+                pipe.hset(INSTANCE_NODE_INDEX, iid, name)
+                if ns:
+                    pipe.sadd(f"{NAMESPACE_INSTANCES}:{ns}", iid)
+        else:
+            # ip: caller only unindexes it when the index still points at this node
+            if ip:
+                pipe.hdel(NODE_IP_INDEX, ip)
+            if iid:
+                pipe.hdel(INSTANCE_NODE_INDEX, iid)
+                if ns:
+                    pipe.srem(f"{NAMESPACE_INSTANCES}:{ns}", iid)
+
+    @staticmethod
+    def _index_node_config(pipe, name, config: dict):
+        for field in ("cpu", "memory"):
+            try:
+                pipe.zadd(f"{NODE_CAPACITY}:{field}", {name: float(config[field])})
+            except (KeyError, TypeError, ValueError):
+                pipe.zrem(f"{NODE_CAPACITY}:{field}", name)
+
+    def _owned_index_fields(self, pipe, name, old: dict):
+        """Fields of an old node record whose index entries still belong to it (pipe in watch mode)."""
+        ip = old.get("IpAddress")
+        if ip and pipe.hget(NODE_IP_INDEX, ip) != name:
+            old = {k: v for k, v in old.items() if k != "IpAddress"}  # ip was taken over by another node
+        return old
+
+    @log_to_file(logger)
+    def rebuild_indexes(self):
+        """Re-derive every secondary index from the primary hashes (one transaction)."""
+        def rebuild(pipe):
+            nodes = pipe.hgetall("nodes")
+            containers = pipe.hgetall("containers")
+            configs = pipe.hgetall("node_config")
+            urls = pipe.hgetall("url_to_cluster")
+            stale = [*pipe.scan_iter(f"{NAMESPACE_INSTANCES}:*"), *pipe.scan_iter(f"{NODE_CONTAINERS}:*"),
+                     *pipe.scan_iter(f"{CLUSTER_URLS}:*")]
+            pipe.multi()
+            pipe.delete(NODE_IP_INDEX, INSTANCE_NODE_INDEX, f"{NODE_CAPACITY}:cpu", f"{NODE_CAPACITY}:memory", *stale)
+            for name, data in nodes.items():
+                self._index_node(pipe, name, decode_record(data))
+            for cname, data in containers.items():
+                node = decode_record(data).get("node")
+                if node:
+                    pipe.sadd(f"{NODE_CONTAINERS}:{node}", cname)
+            for name, data in configs.items():
+                self._index_node_config(pipe, name, decode_record(data))
+            for url, cluster in urls.items():
+                pipe.sadd(f"{CLUSTER_URLS}:{cluster}", url)
+            pipe.incr(HEALTH_TARGETS_VERSION)
+            pipe.set(INDEX_VERSION_KEY, INDEX_VERSION)
+
+        self.redis_client.transaction(rebuild, "nodes", "containers", "node_config", "url_to_cluster")
+        RedisInterface._indexes_ready = True
+
+    def _ensure_indexes(self):
+        if not RedisInterface._indexes_ready:
+            if self.redis_client.get(INDEX_VERSION_KEY) == INDEX_VERSION:
+                RedisInterface._indexes_ready = True
+            else:
+                self.rebuild_indexes()
+
     # Nodes Storage
     @log_to_file(logger)
     def save_node(self, name, data: dict):
-        logger.info(f"save_node {name} {data}")
-        self.redis_client.hset("nodes", name, json.dumps(data))
+        logger.info(f"save_node {name}")
+        self._ensure_indexes()
+
+        def save(pipe):
+            old = pipe.hget("nodes", name)
+            old = self._owned_index_fields(pipe, name, decode_record(old)) if old else {}
+            pipe.multi()
+            self._index_node(pipe, name, old, add=False)
+            pipe.hset("nodes", name, encode_record(data))
+            self._index_node(pipe, name, data)
+
+        self.redis_client.transaction(save, "nodes", NODE_IP_INDEX)
 
     @log_to_file(logger)
     def get_nodes(self):
-        nodes = self.redis_client.hgetall("nodes")
-        return {name: json.loads(data) for name, data in nodes.items()}
+        return self._decode_records("nodes", self.redis_client.hgetall("nodes"))
 
     @log_to_file(logger)
     def get_instance_ids(self):
         """Retrieves a list of instance IDs from Redis-stored node data."""
-        if nodes := self.redis_client.hgetall("nodes"):
-            return [json.loads(data).get("InstanceId") for data in nodes.values() if "InstanceId" in json.loads(data)]
-        else:
-            return None
+        self._ensure_indexes()
+        return self.redis_client.hkeys(INSTANCE_NODE_INDEX) or None
 
     @log_to_file(logger)
     def get_instance_ids_namespace(self, namespace):
-        """Retrieves a list of instance IDs from Redis-stored node data."""
-        nodes = self.redis_client.hgetall("nodes")
-        print(nodes)
-        instance_ids = []
-        if not nodes:
-            return None
-        for data in nodes.values():
-            node_data = json.loads(data)
-            if node_data.get("NameSpace") == namespace:
-                instance_ids.append(node_data.get("InstanceId"))
-        return instance_ids or None
+        """Instance IDs of the namespace's nodes (namespace_instances index)."""
+        self._ensure_indexes()
+        return sorted(self.redis_client.smembers(f"{NAMESPACE_INSTANCES}:{namespace}")) or None
 
     @log_to_file(logger)
     def delete_instance_ids(self, instance_ids: list):
-        """Retrieves a list of instance IDs from Redis-stored node data and deletes the corresponding keys."""
-        nodes = self.redis_client.hgetall("nodes")
-        instances_results = {}
-        if not nodes:
+        """Deletes the node records of the given instance IDs, and their index entries."""
+        if not instance_ids:
             return None
-        for name, data in nodes.items():
-            node_data = json.loads(data)
-            if node_data.get("InstanceId") in instance_ids:
-                self.redis_client.hdel("nodes", name)
+        self._ensure_indexes()
+
+        def delete(pipe):
+            names = [n for n in pipe.hmget(INSTANCE_NODE_INDEX, instance_ids) if n]
+            records = {}
+            for name, data in zip(names, pipe.hmget("nodes", names) if names else []):
+                if data:
+                    records[name] = self._owned_index_fields(pipe, name, decode_record(data))
+            pipe.multi()
+            for name, old in records.items():
+                self._index_node(pipe, name, old, add=False)
+            pipe.hdel(INSTANCE_NODE_INDEX, *instance_ids)
+            if names:
+                pipe.hdel("nodes", *names)
+
+        self.redis_client.transaction(delete, "nodes", NODE_IP_INDEX, INSTANCE_NODE_INDEX)
         return True
 
     # Get a Node by Name
     @log_to_file(logger)
     def get_node_by_name(self, name):
-        data = self.redis_client.hget("nodes", name)
-        return json.loads(data) if data else None
+        return self._decode_record("nodes", name, self.redis_client.hget("nodes", name))
 
-    # Get a Node by IP Address (Search All Nodes)
-    import json
+    # Get a Node by IP Address
     @log_to_file(logger)
     def get_node_by_ip(self, ip_address):
-        """Retrieves node details by IP address from Redis-stored node data."""
-        nodes = self.redis_client.hgetall("nodes")
-
-        for name, data in nodes.items():
-            node_data = json.loads(data)
-            if node_data.get("IpAddress") == ip_address:
-                return {"name": name, "IpAddress": node_data["IpAddress"]}
-
-        return None
-
-
+        """Node name for an IP address (node_ip_index)."""
+        self._ensure_indexes()
+        name = self.redis_client.hget(NODE_IP_INDEX, ip_address)
+        return {"name": name, "IpAddress": ip_address} if name else None
 
     @log_to_file(logger)
     def save_node_config(self, name, cpu, memory):
-        self.redis_client.hset("node_config", name, json.dumps({"cpu": cpu, "memory": memory}))
+        self._ensure_indexes()
+        config = {"cpu": cpu, "memory": memory}
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.hset("node_config", name, encode_record(config))
+        self._index_node_config(pipe, name, config)
+        pipe.execute()
 
     @log_to_file(logger)
     def get_node_config_more_cpu(self, cpu):
-        return self._extracted_from_get_node_config_more_mem_2("cpu", cpu)
+        return self._node_config_above("cpu", cpu)
 
     @log_to_file(logger)
     def get_node_config_more_mem(self, memory):
-        return self._extracted_from_get_node_config_more_mem_2("memory", memory)
-
-
+        return self._node_config_above("memory", memory)
+
+    def _node_config_above(self, field, value):
+        """First node whose configured `field` is strictly greater than value (node_capacity zset)."""
+        self._ensure_indexes()
+        found = self.redis_client.zrangebyscore(f"{NODE_CAPACITY}:{field}", f"({value}", "+inf",
+                                                start=0, num=1, withscores=True)
+        if not found:
+            return None
+        name, score = found[0]
+        return {"name": name, field: int(score) if score.is_integer() else score}
 
-    # TODO Rename this here and in `get_node_config_more_cpu` and `get_node_config_more_mem`
     @log_to_file(logger)
-    def _extracted_from_get_node_config_more_mem_2(self, arg0, arg1):
-        nodes = self.redis_client.hgetall("node_config")
-        for name, data in nodes.items():
-            node_data = json.loads(data)
-            if node_data[arg0] > arg1:
-                return {"name": name, arg0: node_data[arg0]}
-        return None
+    def get_nodes_with_capacity(self, cpu=None, memory=None, limit: int = 100):
+        """Names of nodes with at least `cpu` and `memory` configured, smallest fit first."""
+        self._ensure_indexes()
+        wanted = [(f, v) for f, v in (("cpu", cpu), ("memory", memory)) if v is not None]
+        if not wanted:
+            return self.redis_client.zrange(f"{NODE_CAPACITY}:cpu", 0, limit - 1)
+        field, value = wanted[0]
+        names = self.redis_client.zrangebyscore(f"{NODE_CAPACITY}:{field}", value, "+inf")
+        for field, value in wanted[1:]:
+            fits = set(self.redis_client.zrangebyscore(f"{NODE_CAPACITY}:{field}", value, "+inf"))
+            names = [n for n in names if n in fits]
+        return names[:limit]
 
     # Container Storage
     @log_to_file(logger)
     def save_container(self, container_name, ipaddress, node):
-        self.redis_client.hset("containers", container_name, json.dumps({"ipaddress": ipaddress, "node": node}))
+        self._ensure_indexes()
+
+        def save(pipe):
+            old = pipe.hget("containers", container_name)
+            old_node = decode_record(old).get("node") if old else None
+            pipe.multi()
+            if old_node and old_node != node:
+                pipe.srem(f"{NODE_CONTAINERS}:{old_node}", container_name)
+            pipe.hset("containers", container_name, encode_record({"ipaddress": ipaddress, "node": node}))
+            pipe.sadd(f"{NODE_CONTAINERS}:{node}", container_name)
+
+        self.redis_client.transaction(save, "containers")
 
     @log_to_file(logger)
     def get_containers(self):
-        containers = self.redis_client.hgetall("containers")
-        return {cid: json.loads(data) for cid, data in containers.items()}
+        return self._decode_records("containers", self.redis_client.hgetall("containers"))
 
     # Get a Container by Name
     @log_to_file(logger)
     def get_container_by_name(self, name):
-        data = self.redis_client.hget("containers", name)
-        return json.loads(data) if data else None
+        return self._decode_record("containers", name, self.redis_client.hget("containers", name))
 
     @log_to_file(logger)
     def get_containers_node(self, node_name):
-        containers_on_node = []
-        containers = self.redis_client.hgetall("containers")
-        for name, data in containers.items():
-            containers_data = json.loads(data)
-            if containers_data["node"] == node_name:
-                containers_on_node.append(name)
-                return containers_on_node
-        return None
+        """Names of the containers on a node (node_containers index)."""
+        self._ensure_indexes()
+        return sorted(self.redis_client.smembers(f"{NODE_CONTAINERS}:{node_name}")) or None
+
+    # Container runtime state, per node and containerd namespace (written by the containerd event tracker)
+    @log_to_file(logger)
+    def save_container_state(self, node_name, namespace, container_id, state: dict):
+        self.redis_client.hset(f"container_state:{node_name}:{namespace}", container_id, json.dumps(state))
+
+    @log_to_file(logger)
+    def delete_container_state(self, node_name, namespace, container_id):
+        self.redis_client.hdel(f"container_state:{node_name}:{namespace}", container_id)
+
+    @log_to_file(logger)
+    def replace_container_states(self, node_name, namespace, states: dict):
+        """Swap the namespace's whole state hash on the node in one transaction (used after a resync)."""
+        key = f"container_state:{node_name}:{namespace}"
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.delete(key)
+        if states:
+            pipe.hset(key, mapping={cid: json.dumps(s) for cid, s in states.items()})
+        pipe.execute()
+
+    @log_to_file(logger)
+    def get_container_state(self, node_name, namespace, container_id):
+        data = self.redis_client.hget(f"container_state:{node_name}:{namespace}", container_id)
+        return json.loads(data) if data else None
+
+    @log_to_file(logger)
+    def get_container_states_node(self, node_name, namespace):
+        states = self.redis_client.hgetall(f"container_state:{node_name}:{namespace}")
+        return {cid: json.loads(data) for cid, data in states.items()}
+
+    # Pod lifecycle phase histograms, per node (cumulative counters, see phase_metrics.py)
+    @log_to_file(logger)
+    def add_phase_histograms(self, node_name, deltas: dict):
+        """deltas: {phase: {"<le>": n, ..., "count": n, "sum": seconds}}; added atomically."""
+        key = f"phase_hist:{node_name}"
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.sadd("phase_hist_nodes", node_name)
+        for phase, fields in deltas.items():
+            for field, value in fields.items():
+                if field == "sum":
+                    pipe.hincrbyfloat(key, f"{phase}|sum", value)
+                elif value:
+                    pipe.hincrby(key, f"{phase}|{field}", int(value))
+        pipe.execute()
+
+    @log_to_file(logger)
+    def get_phase_histograms(self):
+        """{node: {phase: {"<le>": n, ..., "count": n, "sum": seconds}}} for every node."""
+        out = {}
+        for node in self.redis_client.smembers("phase_hist_nodes"):
+            phases = {}
+            for field, value in self.redis_client.hgetall(f"phase_hist:{node}").items():
+                phase, _, name = field.rpartition("|")
+                phases.setdefault(phase, {})[name] = float(value) if name == "sum" else int(value)
+            out[node] = phases
+        return out
+
+    # Pod lifecycle event streams, one per namespace (see lifecycle_events.py)
+    @log_to_file(logger)
+    def add_lifecycle_events(self, events, maxlen: int = 100000):
+        """events: [(namespace, {field: str})]; appended in one pipeline, trimmed to ~maxlen."""
+        pipe = self.redis_client.pipeline(transaction=False)
+        for namespace, fields in events:
+            pipe.xadd(lifecycle_stream_key(namespace), fields, maxlen=maxlen, approximate=True)
+        return pipe.execute()
+
+    @log_to_file(logger)
+    def read_lifecycle_events(self, namespace, after_id="0", count: int = 100, block_ms=None):
+        """Entries after after_id ("$" = only new ones), waiting up to block_ms; [(id, fields)]."""
+        resp = self.redis_client.xread({lifecycle_stream_key(namespace): after_id}, count=count, block=block_ms)
+        return resp[0][1] if resp else []
+
+    @log_to_file(logger)
+    def ensure_lifecycle_group(self, namespace, group, start_id="$"):
+        """Create the consumer group (and the stream) if missing; start_id "0" replays retained history."""
+        try:
+            self.redis_client.xgroup_create(lifecycle_stream_key(namespace), group, id=start_id, mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    @log_to_file(logger)
+    def read_lifecycle_group(self, namespace, group, consumer, count: int = 100, block_ms=None):
+        """New entries for this consumer of the group; ack them with ack_lifecycle_events."""
+        resp = self.redis_client.xreadgroup(group, consumer, {lifecycle_stream_key(namespace): ">"},
+                                            count=count, block=block_ms)
+        return resp[0][1] if resp else []
+
+    @log_to_file(logger)
+    def ack_lifecycle_events(self, namespace, group, ids):
+        return self.redis_client.xack(lifecycle_stream_key(namespace), group, *ids) if ids else 0
+
+    @log_to_file(logger)
+    def claim_lifecycle_events(self, namespace, group, consumer, min_idle_ms: int = 60000, count: int = 100):
+        """Take over entries other consumers read but didn't ack within min_idle_ms; [(id, fields)]."""
+        resp = self.redis_client.xautoclaim(lifecycle_stream_key(namespace), group, consumer,
+                                            min_idle_time=min_idle_ms, start_id="0-0", count=count)
+        return resp[1]
 
     # Namespace to Node Mapping
     @log_to_file(logger)
@@ -167,17 +425,19 @@ class RedisInterface:
     # Cluster Health Check Configuration
     @log_to_file(logger)
     def save_cluster_health(self, cluster, port, url, interval, checks):
-        self.redis_client.hset("cluster_health", cluster, json.dumps({
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.hset("cluster_health", cluster, encode_record({
             "port": port,
             "url": url,
             "interval": interval,
             "checks": checks
         }))
+        pipe.incr(HEALTH_TARGETS_VERSION)  # intervals are part of the health engine's targets
+        pipe.execute()
 
     @log_to_file(logger)
     def get_cluster_health(self):
-        clusters = self.redis_client.hgetall("cluster_health")
-        return {cluster: json.loads(data) for cluster, data in clusters.items()}
+        return self._decode_records("cluster_health", self.redis_client.hgetall("cluster_health"))
 
     # Healthy Containers in a Cluster
     @log_to_file(logger)
@@ -190,15 +450,76 @@ class RedisInterface:
 
     @log_to_file(logger)
     def save_url_cluster(self, url, cluster):
-        self.redis_client.hset("url_to_cluster", url, cluster)
+        """Register url under cluster, moving it out of its previous cluster atomically."""
+        self._ensure_indexes()
+
+        def save(pipe):
+            old = pipe.hget("url_to_cluster", url)
+            if old == cluster:
+                return
+            pipe.multi()
+            if old:
+                pipe.srem(f"{CLUSTER_URLS}:{old}", url)
+            pipe.hset("url_to_cluster", url, cluster)
+            pipe.sadd(f"{CLUSTER_URLS}:{cluster}", url)
+            pipe.incr(HEALTH_TARGETS_VERSION)
+
+        self.redis_client.transaction(save, "url_to_cluster")
+
+    @log_to_file(logger)
+    def delete_url_cluster(self, url):
+        self._ensure_indexes()
+
+        def delete(pipe):
+            old = pipe.hget("url_to_cluster", url)
+            if not old:
+                return
+            pipe.multi()
+            pipe.srem(f"{CLUSTER_URLS}:{old}", url)
+            pipe.hdel("url_to_cluster", url)
+            pipe.incr(HEALTH_TARGETS_VERSION)
+
+        self.redis_client.transaction(delete, "url_to_cluster")
+
+    @log_to_file(logger)
+    def get_url_clusters(self, clusters=None):
+        """Registered health-check URLs mapped to their cluster (only `clusters` if given)."""
+        if clusters is None:
+            return self.redis_client.hgetall("url_to_cluster")
+        self._ensure_indexes()
+        clusters = list(clusters)
+        pipe = self.redis_client.pipeline(transaction=False)
+        for cluster in clusters:
+            pipe.smembers(f"{CLUSTER_URLS}:{cluster}")
+        return {url: cluster for cluster, urls in zip(clusters, pipe.execute()) for url in urls}
 
     @log_to_file(logger)
     def get_url_cluster(self,cluster):
         url_list=[]
         try:
-            url_data=self.redis_client.hgetall("url_to_cluster")
-            url_list.extend(name for name, data in url_data.items() if data == cluster)
+            self._ensure_indexes()
+            url_list.extend(sorted(self.redis_client.smembers(f"{CLUSTER_URLS}:{cluster}")))
         except Exception as e:
             print(f"Error: {e}")
         return url_list
 
+    @log_to_file(logger)
+    def get_health_targets_version(self):
+        """Bumped on every change to url_to_cluster or cluster_health; None if never written."""
+        version = self.redis_client.get(HEALTH_TARGETS_VERSION)
+        return int(version) if version is not None else None
+
+    # Leases: one holder cluster-wide (e.g. the health check engine); they expire unless renewed
+    @log_to_file(logger)
+    def acquire_lease(self, key: str, owner: str, ttl_ms: int) -> bool:
+        return bool(self.redis_client.set(key, owner, nx=True, px=ttl_ms))
+
+    @log_to_file(logger)
+    def renew_lease(self, key: str, owner: str, ttl_ms: int) -> bool:
+        """False if the lease expired or someone else holds it now."""
+        return bool(self._renew_lease(keys=[key], args=[owner, ttl_ms]))
+
+    @log_to_file(logger)
+    def release_lease(self, key: str, owner: str) -> bool:
+        return bool(self._release_lease(keys=[key], args=[owner]))
+
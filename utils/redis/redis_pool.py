@@ -0,0 +1,87 @@
+"""
+redis_pool.py
+One connection pool per Redis config per process, shared by every client.
+
+  get_redis_client("db")      redis.Redis on the shared pool for config redis_db
+  get_redis_client("queue")   same for redis_queue
+  new_async_redis_client(n)   redis.asyncio client for the running event loop (asyncio
+                              connections can't be shared across loops; close it when done)
+
+Clients are cheap views on the pool, so RedisInterface()/HcTrack() can be constructed per
+task without new connections or TLS handshakes. Pooled connections are kept alive
+(TCP keepalive + PING after REDIS_HEALTH_CHECK_SEC idle) instead of being re-opened.
+Pools are per process: a forked child (Celery prefork) drops the inherited registry and
+builds its own on first use, so no socket or TLS state is ever shared across processes.
+
+Env:
+  REDIS_MAX_CONNECTIONS    max connections per pool (default: 64)
+  REDIS_HEALTH_CHECK_SEC   idle seconds before a pooled connection is PINGed on checkout (default: 30)
+  REDIS_SOCKET_TIMEOUT     socket connect/read timeout in seconds (default: 10)
+"""
+
+import os
+import threading
+from typing import Dict, Tuple
+
+import redis
+import redis.asyncio as aioredis
+
+from utils.ReadConfig import ReadConfig as rc
+
+REDIS_MAX_CONNECTIONS = int(os.environ.get("REDIS_MAX_CONNECTIONS", "64"))
+REDIS_HEALTH_CHECK_SEC = int(os.environ.get("REDIS_HEALTH_CHECK_SEC", "30"))
+REDIS_SOCKET_TIMEOUT = float(os.environ.get("REDIS_SOCKET_TIMEOUT", "10"))
+
+_CONFIGS = {"db": "redis_db_config", "queue": "redis_queue_config"}
+
+_pools: Dict[Tuple[str, int], redis.ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def _reset_after_fork() -> None:
+    global _pools_lock
+    _pools.clear()
+    _pools_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def connection_kwargs(name: str = "db") -> Dict:
+    """Connection settings for a named config section (TLS when certificates are configured)."""
+    cfg = getattr(rc(), _CONFIGS[name])
+    # surrogateescape: binary values (record_codec) round-trip through str losslessly
+    kw = dict(host=cfg['redis_host'], port=cfg['redis_port'], db=cfg['redis_db'], decode_responses=True,
+              encoding_errors="surrogateescape",
+              max_connections=REDIS_MAX_CONNECTIONS, health_check_interval=REDIS_HEALTH_CHECK_SEC,
+              socket_keepalive=True, socket_timeout=REDIS_SOCKET_TIMEOUT,
+              socket_connect_timeout=REDIS_SOCKET_TIMEOUT)
+    if cfg.get('ssl_ca_certs'):
+        kw.update(ssl_ca_certs=cfg['ssl_ca_certs'], ssl_certfile=cfg.get('ssl_certfile'),
+                  ssl_keyfile=cfg.get('ssl_keyfile'), ssl_cert_reqs="required")
+    return kw
+
+
+def get_redis_pool(name: str = "db") -> redis.ConnectionPool:
+    key = (name, os.getpid())
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                kw = connection_kwargs(name)
+                if "ssl_ca_certs" in kw:
+                    kw["connection_class"] = redis.SSLConnection
+                pool = _pools[key] = redis.ConnectionPool(**kw)
+    return pool
+
+
+def get_redis_client(name: str = "db") -> redis.Redis:
+    return redis.Redis(connection_pool=get_redis_pool(name))
+
+
+def new_async_redis_client(name: str = "db") -> aioredis.Redis:
+    kw = connection_kwargs(name)
+    kw["ssl"] = "ssl_ca_certs" in kw
+    return aioredis.Redis(**kw)